@@ -0,0 +1,39 @@
+"""
+Общие помощники для бенчмарков: настройка Django и одноразовая тестовая БД.
+Бенчмарки никогда не пишут в рабочую базу — Django создаёт test_<NAME>
+и удаляет её по завершении.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "itemstats.settings")
+    django.setup()
+
+
+@contextmanager
+def test_database(keepdb: bool = False):
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+@contextmanager
+def timer():
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
@@ -0,0 +1,60 @@
+"""
+Сравнение синхронного (gunicorn, WSGI) и асинхронного (uvicorn, ASGI)
+развёртывания на одной и той же смеси запросов при разной конкурентности.
+
+Берутся группы из bench_http.MIX, у которых есть async-версия
+(/api/async/...): страницы, фильтры, статистика. Для каждого уровня
+конкурентности пишутся req/s и p50/p99 каждого развёртывания.
+
+Оба сервиса должны быть запущены (docker compose up web web-asgi):
+    python -m benchmarks.bench_async --sync-url http://localhost:8000 --async-url http://localhost:8001 \\
+        --concurrency 1 8 32 64 --requests 2000 --output var/bench/async.json
+"""
+import argparse
+
+from benchmarks import bench_http
+from benchmarks.results import Results, add_arguments, finish
+
+ASYNC_GROUPS = {"items.page", "items.category", "items.price_range", "stats.avg", "stats.prices"}
+
+
+def build_plan(count: int, seed: int) -> list[tuple[str, str]]:
+    plan = bench_http.build_requests(count * 2, seed)
+    return [(group, path) for group, path in plan if group in ASYNC_GROUPS][:count]
+
+
+def to_async(plan) -> list[tuple[str, str]]:
+    return [(group, path.replace("/api/", "/api/async/", 1)) for group, path in plan]
+
+
+def measure(results: Results, prefix: str, base_url: str, plan, concurrency: int):
+    latencies, total = bench_http.run_http(base_url, plan, concurrency)
+    values = [v for group in latencies.values() for v in group]
+    results.add(f"{prefix}.rps", len(values) / total, "req/s", better="higher")
+    results.add(f"{prefix}.p50_ms", bench_http.percentile(values, 0.5) * 1000, "ms")
+    results.add(f"{prefix}.p99_ms", bench_http.percentile(values, 0.99) * 1000, "ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync-url", default="http://localhost:8000", help="Сервис под gunicorn (WSGI)")
+    parser.add_argument("--async-url", default="http://localhost:8001", help="Сервис под uvicorn (ASGI)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    plan = build_plan(args.requests, args.seed)
+    results = Results("async", {"requests": len(plan), "concurrency": args.concurrency, "seed": args.seed})
+    # прогрев кэшей статистики и соединений, чтобы первый уровень не платил за холодный старт
+    bench_http.run_http(args.sync_url, plan[:50], 4)
+    bench_http.run_http(args.async_url, to_async(plan[:50]), 4)
+    for concurrency in args.concurrency:
+        measure(results, f"async.sync.c{concurrency}", args.sync_url, plan, concurrency)
+        measure(results, f"async.async.c{concurrency}", args.async_url, to_async(plan), concurrency)
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
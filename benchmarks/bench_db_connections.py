@@ -0,0 +1,110 @@
+"""
+Цена соединения с Postgres на запрос: /api/items/ и статистика с новым
+соединением на каждый запрос (CONN_MAX_AGE=0, как было), с постоянным
+соединением (CONN_MAX_AGE > 0) и, если указан --pgbouncer, с новым
+соединением к PgBouncer (пул соединений с базой держит он).
+
+Запросы идут в процессе через django.test.Client (сигналы начала/конца
+запроса закрывают соединение так же, как под gunicorn) во временную БД,
+наполненную импортом синтетического фида; кэши выключены, чтобы каждый
+запрос доходил до базы. Отдельно замеряется само подключение (connect).
+Для замера по HTTP запустите сервис с DB_CONN_MAX_AGE=0 и 60 и сравните
+benchmarks.bench_http.
+
+Запуск:
+    python -m benchmarks.bench_db_connections --rows 10000 --requests 2000
+    python -m benchmarks.bench_db_connections --pgbouncer localhost:6432 --output var/bench/db.json
+"""
+import argparse
+import time
+
+from benchmarks import _django, generate
+from benchmarks.bench_http import percentile
+from benchmarks.results import Results, add_arguments, finish
+
+PATHS = ["/api/items/?page={page}", "/api/stats/avg-price-by-category/"]
+
+
+def configure(connection, conn_max_age: int, host: str | None = None, port: int | None = None):
+    # close_at считается при подключении, поэтому сначала закрываем текущее соединение
+    connection.close()
+    connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+    if host is not None:
+        connection.settings_dict["HOST"] = host
+        connection.settings_dict["PORT"] = port
+        connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+
+def measure_connect(connection, count: int) -> list[float]:
+    timings = []
+    for _ in range(count):
+        connection.close()
+        start = time.perf_counter()
+        connection.ensure_connection()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure_requests(count: int) -> tuple[list[float], float]:
+    from django.test import Client
+
+    client = Client()
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        path = PATHS[i % len(PATHS)].format(page=i % 50 + 1)
+        t = time.perf_counter()
+        resp = client.get(path)
+        latencies.append(time.perf_counter() - t)
+        assert resp.status_code == 200, (path, resp.status_code)
+    return latencies, time.perf_counter() - started
+
+
+def report(results: Results, mode: str, connect: list[float], latencies: list[float], seconds: float):
+    results.add(f"db.{mode}.connect_ms", percentile(connect, 0.5) * 1000, "ms")
+    results.add(f"db.{mode}.rps", len(latencies) / seconds, "req/s", better="higher")
+    for q in (0.5, 0.95, 0.99):
+        results.add(f"db.{mode}.p{int(q * 100)}_ms", percentile(latencies, q) * 1000, "ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--connects", type=int, default=100, help="Сколько раз замерить само подключение")
+    parser.add_argument("--conn-max-age", type=int, default=60, help="CONN_MAX_AGE для режима persistent")
+    parser.add_argument("--pgbouncer", help="host:port PgBouncer перед той же базой (режим pgbouncer)")
+    parser.add_argument("--seed", type=int, default=42)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    _django.setup()
+    from django.test import override_settings
+    from items.services.etl import ItemETLService
+
+    results = Results("db_connections", {"rows": args.rows, "requests": args.requests,
+                                         "conn_max_age": args.conn_max_age, "pgbouncer": bool(args.pgbouncer)})
+    # Без кэшей: каждый запрос должен дойти до базы
+    no_cache = override_settings(
+        CACHEOPS_ENABLED=False, STATS_CACHE_TTL=0, STATS_L1_CACHE_TTL=0,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    )
+    with _django.test_database() as connection:
+        ItemETLService(str(generate.ensure_feed(args.rows, "csv", args.seed))).run()
+        direct = (connection.settings_dict["HOST"], connection.settings_dict["PORT"])
+        modes = [("new", 0, None), ("persistent", args.conn_max_age, None)]
+        if args.pgbouncer:
+            host, _, port = args.pgbouncer.partition(":")
+            modes.append(("pgbouncer", 0, (host, int(port or 6432))))
+        with no_cache:
+            for mode, conn_max_age, address in modes:
+                configure(connection, conn_max_age, *(address or direct))
+                connect = measure_connect(connection, args.connects)
+                latencies, seconds = measure_requests(args.requests)
+                report(results, mode, connect, latencies, seconds)
+        configure(connection, 0, *direct)
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
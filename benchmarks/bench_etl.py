@@ -0,0 +1,88 @@
+"""
+Бенчмарк импорта на синтетическом каталоге (benchmarks.generate).
+
+Для каждого размера и формата фида:
+  - first — импорт в пустую таблицу, с разбивкой по этапам
+    (fetch / parse / normalize / write из ItemETLService.timings);
+  - unchanged — повторный запуск по тому же файлу (срабатывает SourceState);
+  - reimport — тот же файл с force=True: полный разбор, но ни одной записи;
+  - revision — фид, где у 10% товаров новые цена и дата.
+
+Запуск (фиды кэшируются в var/bench/feeds):
+    python -m benchmarks.bench_etl --rows 10000 1000000 --formats csv ndjson \\
+        --output var/bench/etl.json --baseline benchmarks/baselines/etl.json
+    python -m benchmarks.bench_etl --rows 1000000 --workers 4   # параллельный разбор
+"""
+import argparse
+
+from benchmarks import _django, generate
+from benchmarks.results import Results, add_arguments, finish
+
+STAGES = ("fetch", "parse", "normalize", "write")
+
+
+def reset(connection):
+    from items.models import Category, CategoryStats, Item, PriceHistory, SourceState
+    from items.services import categories
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "TRUNCATE items_item, items_category, items_categorystats, items_sourcestate, items_pricehistory "
+                "RESTART IDENTITY"
+            )
+    else:
+        for model in (Item, Category, CategoryStats, SourceState, PriceHistory):
+            model.objects.all().delete()
+    categories.clear()
+
+
+def run_import(results: Results, prefix: str, path, chunk_size: int | None, force: bool = False,
+               workers: int = 1) -> dict:
+    from items.services.etl import ItemETLService
+
+    service = ItemETLService(str(path), chunk_size=chunk_size, force=force, workers=workers)
+    with _django.timer() as t:
+        result = service.run()
+    results.add(f"{prefix}.seconds", t["seconds"], "s")
+    if result["total"]:
+        results.add(f"{prefix}.rows_per_sec", result["total"] / t["seconds"], "rows/s", better="higher")
+    for stage in STAGES:
+        if stage in service.timings:
+            results.add(f"{prefix}.{stage}_seconds", service.timings[stage], "s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--formats", nargs="+", choices=generate.FORMATS, default=["csv"])
+    parser.add_argument("--chunk-size", type=int, default=0, help="Потоковый импорт блоками (0 — целиком)")
+    parser.add_argument("--workers", type=int, default=1, help="Процессов для разбора (ETL_WORKERS)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keepdb", action="store_true")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    _django.setup()
+    from django.test import override_settings
+
+    results = Results("etl", {"rows": args.rows, "formats": args.formats, "chunk_size": args.chunk_size,
+                              "workers": args.workers, "seed": args.seed})
+    chunk_size = args.chunk_size or None
+    with _django.test_database(keepdb=args.keepdb) as connection, override_settings(CACHEOPS_ENABLED=False):
+        for rows in args.rows:
+            for fmt in args.formats:
+                feed = generate.ensure_feed(rows, fmt, args.seed)
+                revision = generate.ensure_feed(rows, fmt, args.seed, revision=1)
+                prefix = f"etl.{fmt}.{rows}"
+                reset(connection)
+                run_import(results, f"{prefix}.first", feed, chunk_size, workers=args.workers)
+                run_import(results, f"{prefix}.unchanged", feed, chunk_size, workers=args.workers)
+                run_import(results, f"{prefix}.reimport", feed, chunk_size, force=True, workers=args.workers)
+                run_import(results, f"{prefix}.revision", revision, chunk_size, workers=args.workers)
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
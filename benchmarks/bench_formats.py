@@ -0,0 +1,48 @@
+"""
+Импорт одного и того же синтетического каталога в разных форматах фида:
+CSV/JSON/NDJSON без сжатия и в gzip/zstd, Parquet и Arrow IPC.
+
+Каждый формат импортируется в пустую таблицу (с разбивкой по этапам, как
+в benchmarks.bench_etl), дополнительно записывается размер файла.
+--extra-columns добавляет в фид колонки, которые импорт не использует
+(описания товаров): Parquet и Arrow их не читают, текстовые форматы
+разбирают целиком.
+
+Запуск (фиды кэшируются в var/bench/feeds):
+    python -m benchmarks.bench_formats --rows 1000000
+    python -m benchmarks.bench_formats --rows 100000 --formats csv csv.gz parquet --chunk-size 50000
+"""
+import argparse
+
+from benchmarks import _django, generate
+from benchmarks.bench_etl import reset, run_import
+from benchmarks.results import Results, add_arguments, finish
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--formats", nargs="+", choices=generate.FORMATS, default=list(generate.FORMATS))
+    parser.add_argument("--extra-columns", type=int, default=4, help="Неиспользуемых текстовых колонок в фиде")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Потоковый импорт блоками (0 — целиком)")
+    parser.add_argument("--seed", type=int, default=42)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    _django.setup()
+    from django.test import override_settings
+
+    results = Results("formats", {"rows": args.rows, "formats": args.formats, "extra_columns": args.extra_columns,
+                                  "chunk_size": args.chunk_size, "seed": args.seed})
+    chunk_size = args.chunk_size or None
+    with _django.test_database() as connection, override_settings(CACHEOPS_ENABLED=False):
+        for fmt in args.formats:
+            feed = generate.ensure_feed(args.rows, fmt, args.seed, extra_columns=args.extra_columns)
+            results.add(f"formats.{fmt}.file_mb", feed.stat().st_size / 2**20, "MB")
+            reset(connection)
+            run_import(results, f"formats.{fmt}", feed, chunk_size)
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Нагрузка на API: воспроизведение смеси запросов к /api/items/ и эндпоинтам
+статистики с замером латентности (p50/p95/p99) и пропускной способности.
+
+Смесь детерминирована (seed): страницы, фильтры по категории и цене,
+keyset-курсор, оценка количества, статистика. Можно подать свой список
+путей (--replay, по одному в строке, например из access-лога).
+
+С --base-url запросы идут по HTTP к запущенному сервису (потоки,
+requests.Session); без него — в процессе через django.test.Client
+во временную БД, наполненную импортом синтетического фида.
+
+Запуск:
+    python -m benchmarks.bench_http --base-url http://localhost:8000 --requests 5000 --concurrency 16
+    python -m benchmarks.bench_http --rows 100000 --requests 2000 --output var/bench/http.json
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks import _django, generate
+from benchmarks.results import Results, add_arguments, finish
+
+# (группа, вес, шаблон пути)
+MIX = [
+    ("items.page", 30, "/api/items/?page={page}"),
+    ("items.category", 20, "/api/items/?category=cat-{category}"),
+    ("items.price_range", 15, "/api/items/?price_min={low}&price_max={high}"),
+    ("items.cursor", 10, "/api/items/?cursor=&ordering=price"),
+    ("items.estimate", 5, "/api/items/?count=estimate&price_min={low}"),
+    ("stats.avg", 10, "/api/stats/avg-price-by-category/"),
+    ("stats.prices", 10, "/api/stats/prices-by-category/"),
+]
+
+
+def build_requests(count: int, seed: int) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    groups = [(group, template) for group, weight, template in MIX for _ in range(weight)]
+    plan = []
+    for _ in range(count):
+        group, template = rng.choice(groups)
+        low = rng.randint(1, 200)
+        plan.append((group, template.format(
+            page=rng.randint(1, 50), category=rng.randint(0, generate.CATEGORIES - 1),
+            low=low, high=low + rng.randint(10, 500),
+        )))
+    return plan
+
+
+def load_replay(path: str) -> list[tuple[str, str]]:
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [("replay", line.strip()) for line in lines if line.strip() and not line.startswith("#")]
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def run_http(base_url: str, plan, concurrency: int) -> tuple[dict[str, list[float]], float]:
+    import threading
+
+    import requests
+
+    local = threading.local()
+
+    def fetch(item):
+        group, path = item
+        session = getattr(local, "session", None) or requests.Session()
+        local.session = session
+        start = time.perf_counter()
+        resp = session.get(base_url.rstrip("/") + path, timeout=60)
+        elapsed = time.perf_counter() - start
+        resp.raise_for_status()
+        return group, elapsed
+
+    latencies: dict[str, list[float]] = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for group, elapsed in pool.map(fetch, plan):
+            latencies.setdefault(group, []).append(elapsed)
+    return latencies, time.perf_counter() - start
+
+
+def run_in_process(plan) -> tuple[dict[str, list[float]], float]:
+    from django.test import Client
+
+    client = Client()
+    latencies: dict[str, list[float]] = {}
+    start = time.perf_counter()
+    for group, path in plan:
+        t = time.perf_counter()
+        resp = client.get(path)
+        elapsed = time.perf_counter() - t
+        assert resp.status_code == 200, (path, resp.status_code)
+        latencies.setdefault(group, []).append(elapsed)
+    return latencies, time.perf_counter() - start
+
+
+def report(results: Results, latencies: dict[str, list[float]], total_seconds: float):
+    count = sum(len(v) for v in latencies.values())
+    results.add("http.all.rps", count / total_seconds, "req/s", better="higher")
+    for group in sorted(latencies):
+        values = latencies[group]
+        for q in (0.5, 0.95, 0.99):
+            results.add(f"http.{group}.p{int(q * 100)}_ms", percentile(values, q) * 1000, "ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Адрес запущенного сервиса; без него — в процессе")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--replay", help="Файл со списком путей вместо генерируемой смеси")
+    parser.add_argument("--rows", type=int, default=100_000, help="Размер каталога для режима в процессе")
+    parser.add_argument("--seed", type=int, default=42)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    plan = load_replay(args.replay) if args.replay else build_requests(args.requests, args.seed)
+    mode = "http" if args.base_url else "in_process"
+    results = Results("http", {"mode": mode, "requests": len(plan), "concurrency": args.concurrency,
+                               "rows": args.rows, "seed": args.seed})
+    if args.base_url:
+        latencies, total = run_http(args.base_url, plan, args.concurrency)
+        report(results, latencies, total)
+    else:
+        _django.setup()
+        from items.services.etl import ItemETLService
+
+        with _django.test_database():
+            ItemETLService(str(generate.ensure_feed(args.rows, "csv", args.seed))).run()
+            latencies, total = run_in_process(plan)
+            report(results, latencies, total)
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Запросы в секунду к /api/items/: быстрый путь (values_list + orjson)
+против ModelSerializer при разных размерах страницы. Запросы идут через
+django.test.Client в одном процессе, так что измеряется именно стоимость
+view/сериализации/рендеринга без сети; кэш cacheops выключен.
+
+Запуск:
+    python -m benchmarks.bench_items_api --items 20000 --page-sizes 10 100 1000
+"""
+import argparse
+
+from benchmarks import _django
+
+
+def seed(connection, count: int):
+    from django.utils import timezone
+    from items.models import Item
+    from items.services import categories
+
+    Item.objects.all().delete()
+    now = timezone.now()
+    ids = categories.resolve(f"cat-{i}" for i in range(20))
+    Item.objects.bulk_create(
+        [Item(name=f"item-{i}", category_id=ids[f"cat-{i % 20}"], price=(i % 10000) / 10, updated_at=now)
+         for i in range(count)],
+        batch_size=5000,
+    )
+
+
+def measure(client, url: str, seconds: float) -> float:
+    import time
+
+    done, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        resp = client.get(url)
+        assert resp.status_code == 200, resp.status_code
+        done += 1
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--seconds", type=float, default=5.0, help="Длительность замера на одну конфигурацию")
+    args = parser.parse_args()
+
+    _django.setup()
+    from django.conf import settings
+    from django.test import Client, override_settings
+
+    print(f"{'page_size':>9} {'serializer rps':>15} {'fast rps':>10} {'speedup':>8}")
+    with _django.test_database() as connection, override_settings(CACHEOPS_ENABLED=False):
+        seed(connection, args.items)
+        client = Client()
+        for page_size in args.page_sizes:
+            rest = {**settings.REST_FRAMEWORK, "PAGE_SIZE": page_size}
+            rps = {}
+            for fast in (False, True):
+                with override_settings(REST_FRAMEWORK=rest, ITEMS_FAST_SERIALIZATION=fast):
+                    rps[fast] = measure(client, "/api/items/?page=3", args.seconds)
+            print(f"{page_size:>9} {rps[False]:>15.1f} {rps[True]:>10.1f} {rps[True] / rps[False]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
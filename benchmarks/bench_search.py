@@ -0,0 +1,103 @@
+"""
+Поиск по имени (/api/items/?search=) на каталоге из миллионов строк:
+латентность с GIN-индексом триграмм и без него (seq scan).
+
+Имена — комбинации слов ("blue wireless speaker 123456"), запросы:
+префикс, подстрока, слово с опечаткой (нечёткое совпадение, нужен pg_trgm),
+поиск вместе с фильтрами категории и цены. Без индекса — тот же запрос
+с SET enable_bitmapscan = off: GIN читается только bitmap-сканом.
+
+Нужен PostgreSQL из docker compose (с pg_trgm):
+    python -m benchmarks.bench_search --rows 1000000 5000000 --repeat 20 --output var/bench/search.json
+"""
+import argparse
+import time
+
+from benchmarks import _django
+from benchmarks.bench_http import percentile
+from benchmarks.results import Results, add_arguments, finish
+
+COLORS = ["red", "blue", "green", "black", "white", "silver", "golden", "purple", "orange", "pink"]
+KINDS = ["wireless", "portable", "smart", "compact", "digital", "classic", "premium", "mini", "ultra", "eco"]
+NOUNS = ["speaker", "headphones", "bluetooth adapter", "keyboard", "mouse", "monitor", "charger",
+         "cable", "camera", "watch", "lamp", "router", "tablet", "phone case", "microphone"]
+
+QUERIES = {
+    "prefix": "search=purple",
+    "substring": "search=tooth",
+    "fuzzy": "search=hedphones",
+    "filtered": "search=keyboard&category=cat-7&price_min=100&price_max=300",
+    "rare": "search=4242424",
+}
+
+
+def seed(connection, rows: int):
+    from items.services import categories
+
+    with connection.cursor() as cursor:
+        cursor.execute("TRUNCATE items_item, items_category RESTART IDENTITY")
+        cursor.execute(
+            "INSERT INTO items_category (name, key) SELECT 'cat-' || g, 'cat-' || g FROM generate_series(0, 49) g"
+        )
+        cursor.execute(
+            """
+            INSERT INTO items_item (name, category_id, price, updated_at)
+            SELECT (%s::text[])[1 + g %% 10] || ' ' || (%s::text[])[1 + (g / 10) %% 10] || ' '
+                   || (%s::text[])[1 + (g / 100) %% 15] || ' ' || g,
+                   c.id, (g %% 10000) / 10.0, timestamptz '2024-01-01'
+            FROM generate_series(1, %s) AS g
+            JOIN items_category c ON c.key = 'cat-' || (g %% 50)
+            """,
+            [COLORS, KINDS, NOUNS, rows],
+        )
+        cursor.execute("ANALYZE items_item")
+    categories.clear()
+
+
+def measure(client, query: str, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        resp = client.get(f"/api/items/?{query}")
+        timings.append(time.perf_counter() - start)
+        assert resp.status_code == 200, (query, resp.status_code)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого запроса")
+    parser.add_argument("--keepdb", action="store_true")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    _django.setup()
+    from django.test import Client, override_settings
+    from items.services.search import trigram_available
+
+    results = Results("search", {"rows": args.rows, "repeat": args.repeat})
+    with _django.test_database(keepdb=args.keepdb) as connection, override_settings(CACHEOPS_ENABLED=False):
+        if connection.vendor != "postgresql":
+            raise SystemExit("bench_search needs PostgreSQL")
+        if not trigram_available(connection.alias):
+            print("pg_trgm is not installed: fuzzy matching and the trigram index are unavailable")
+        client = Client()
+        for rows in args.rows:
+            seed(connection, rows)
+            for kind, query in QUERIES.items():
+                for mode, bitmapscan in (("index", "on"), ("seqscan", "off")):
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"SET enable_bitmapscan = {bitmapscan}")
+                    client.get(f"/api/items/?{query}")  # прогрев
+                    timings = measure(client, query, args.repeat)
+                    prefix = f"search.{rows}.{kind}.{mode}"
+                    results.add(f"{prefix}.p50_ms", percentile(timings, 0.5) * 1000, "ms")
+                    results.add(f"{prefix}.p99_ms", percentile(timings, 0.99) * 1000, "ms")
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_bitmapscan")
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
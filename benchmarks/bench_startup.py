@@ -0,0 +1,158 @@
+"""
+Старт web-процесса: время импорта приложения, его RSS и память воркеров gunicorn.
+
+- Импорт: отдельный интерпретатор загружает WSGI-приложение и URLconf
+  (как воркер gunicorn), замеряются время и пиковый RSS (медиана по
+  --repeat запускам). Если при этом загрузился модуль, которому не место
+  на пути запроса (pandas, numpy, генератор схемы drf_yasg), бенчмарк
+  завершается с кодом 1 независимо от baseline.
+- gunicorn (--workers N, только Linux): сервис запускается с
+  gunicorn.conf.py с preload и без, у каждого воркера читаются PSS
+  (доля общих страниц делится между процессами) и USS (только свои
+  страницы) из /proc/<pid>/smaps_rollup.
+
+Базы данных не нужно: ни импорт, ни /metrics, который опрашивается до замера,
+к ней не обращаются.
+
+Запуск:
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --workers 4 --baseline var/bench/baseline-startup.json --save-baseline
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from benchmarks.results import Results, add_arguments, finish
+
+ROOT = Path(__file__).resolve().parent.parent
+# Модули, которые не должны загружаться при старте web-процесса
+FORBIDDEN = ("pandas", "numpy", "pyarrow", "drf_yasg.generators", "items.schema")
+
+PROBE = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "itemstats.settings")
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+seconds = time.perf_counter() - start
+print(json.dumps({
+    "seconds": seconds,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (FORBIDDEN,)
+
+
+def probe() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def smaps(pid: int) -> dict[str, float]:
+    """PSS и USS процесса в МБ."""
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        key, value = line.split(":", 1)
+        values[key] = int(value.split()[0]) / 1024
+    return {"pss_mb": values["Pss"], "uss_mb": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def children(pid: int) -> list[int]:
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    return [int(p) for p in path.read_text().split()] if path.exists() else []
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_gunicorn(workers: int, preload: bool, timeout: float = 60) -> dict:
+    port = free_port()
+    env = {**os.environ, "GUNICORN_PRELOAD": "1" if preload else "0"}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "itemstats.wsgi:application",
+         "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        ready = None
+        deadline = time.monotonic() + timeout
+        while ready is None:
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("gunicorn did not start")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read()
+                ready = time.perf_counter() - started
+            except OSError:
+                time.sleep(0.05)
+        # Все воркеры загрузили приложение: их память перестала расти
+        previous = None
+        while True:
+            pids = children(server.pid)
+            current = {pid: smaps(pid)["pss_mb"] for pid in pids}
+            if len(pids) == workers and current == previous:
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError("gunicorn workers did not settle")
+            previous = current
+            for _ in range(workers * 4):
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read()
+            time.sleep(1)
+        per_worker = [smaps(pid) for pid in pids]
+        return {
+            "ready_s": ready,
+            "pss_mb": statistics.mean(w["pss_mb"] for w in per_worker),
+            "uss_mb": statistics.mean(w["uss_mb"] for w in per_worker),
+            "total_pss_mb": smaps(server.pid)["pss_mb"] + sum(w["pss_mb"] for w in per_worker),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Сколько раз замерить импорт")
+    parser.add_argument("--workers", type=int, default=0, help="Воркеры gunicorn (0 — не запускать gunicorn)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = Results("startup", {"repeat": args.repeat, "workers": args.workers})
+    runs = [probe() for _ in range(args.repeat)]
+    results.add("startup.import_s", statistics.median(r["seconds"] for r in runs), "s")
+    results.add("startup.rss_mb", statistics.median(r["rss_mb"] for r in runs), "MB")
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+
+    if args.workers:
+        for preload in (True, False):
+            mode = "preload" if preload else "no_preload"
+            stats = measure_gunicorn(args.workers, preload)
+            results.add(f"startup.gunicorn.{mode}.ready_s", stats["ready_s"], "s")
+            results.add(f"startup.gunicorn.{mode}.worker_pss_mb", stats["pss_mb"], "MB")
+            results.add(f"startup.gunicorn.{mode}.worker_uss_mb", stats["uss_mb"], "MB")
+            results.add(f"startup.gunicorn.{mode}.total_pss_mb", stats["total_pss_mb"], "MB")
+
+    if loaded:
+        if args.output:
+            results.write(args.output)
+        print(f"\nLoaded at startup, keep them off the request path: {', '.join(loaded)}", file=sys.stderr)
+        sys.exit(1)
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Сравнение пропускной способности импорта: ORM-путь (_import_to_db_orm)
+против PostgreSQL-пути (COPY + INSERT ... ON CONFLICT) при разном
+количестве уже существующих строк в items_item.
+
+Запуск (нужен PostgreSQL из docker compose):
+    python -m benchmarks.bench_upsert --existing 10000 1000000 10000000 --feed 100000
+
+Фид наполовину состоит из обновлений существующих товаров (со свежим
+updated_at), наполовину — из новых.
+"""
+import argparse
+
+from benchmarks import _django
+
+
+def seed(connection, existing: int):
+    from items.services import categories
+
+    with connection.cursor() as cursor:
+        cursor.execute("TRUNCATE items_item, items_category RESTART IDENTITY")
+        cursor.execute(
+            "INSERT INTO items_category (name, key) SELECT 'cat-' || g, 'cat-' || g FROM generate_series(0, 99) g"
+        )
+        cursor.execute(
+            """
+            INSERT INTO items_item (name, category_id, price, updated_at)
+            SELECT 'item-' || g, c.id, (g %% 10000) / 10.0,
+                   timestamptz '2024-01-01' + (g %% 1000) * interval '1 minute'
+            FROM generate_series(1, %s) AS g
+            JOIN items_category c ON c.key = 'cat-' || (g %% 100)
+            """,
+            [existing],
+        )
+        cursor.execute("ANALYZE items_item")
+    categories.clear()
+
+
+def make_feed(existing: int, size: int):
+    import pandas as pd
+
+    half = size // 2
+    updated = range(1, min(half, existing) + 1)
+    created = range(existing + 1, existing + size - len(updated) + 1)
+    ids = list(updated) + list(created)
+    return pd.DataFrame({
+        "name": [f"item-{g}" for g in ids],
+        "category": [f"cat-{g % 100}" for g in ids],
+        "price": [(g % 10000) / 10.0 + 1 for g in ids],
+        "updated_at": pd.Timestamp("2025-01-01", tz="UTC"),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--feed", type=int, default=100_000, help="Размер импортируемого фида")
+    parser.add_argument("--keepdb", action="store_true")
+    args = parser.parse_args()
+
+    _django.setup()
+    from django.test import override_settings
+    from items.services.etl import ItemETLService
+
+    print(f"{'existing':>12} {'path':>6} {'seconds':>9} {'rows/sec':>10} {'created':>8} {'updated':>8}")
+    with _django.test_database(keepdb=args.keepdb) as connection:
+        for existing in args.existing:
+            for path, use_pg in (("orm", False), ("pg", True)):
+                seed(connection, existing)
+                feed = make_feed(existing, args.feed)
+                with override_settings(ETL_PG_UPSERT=use_pg), _django.timer() as t:
+                    result = ItemETLService("benchmark")._import_to_db(feed)
+                print(
+                    f"{existing:>12} {path:>6} {t['seconds']:>9.2f} {len(feed) / t['seconds']:>10.0f} "
+                    f"{result['created']:>8} {result['updated']:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Генератор синтетического каталога для бенчмарков.
+
+Фид детерминирован (seed) и «грязный» так же, как реальные источники:
+- имена колонок — случайные алиасы из карты переименования _normalize
+  (title/product/item_name, cat/group/type, cost/amount/value, ...) в разном регистре;
+- updated_at вперемешку: ISO с Z, со смещением, наивный, unix-время в секундах
+  и миллисекундах, немного мусора;
+- немного пустых цен и повторов одного товара с разными датами;
+- категории разного размера (от единиц до тысяч товаров на 10k строк).
+
+Текстовые форматы бывают сжатыми (csv.gz, ndjson.zst, ...). Колоночные
+(parquet, arrow) типизированы, как их публикуют поставщики: цена — float,
+updated_at — timestamp UTC (мусорные даты — null). ``extra_columns`` добавляет
+колонки, которые ETL не нужны (описания), — на них видна проекция колонок.
+
+Ревизия ``revision`` > 0 меняет цену и дату у ``change_percent`` процентов
+товаров — это фид для повторного импорта. Строки пишутся блоками, так что
+10M строк генерируются без заметной памяти.
+
+Запуск:
+    python -m benchmarks.generate --rows 1000000 --format csv --out var/bench/feed.csv
+"""
+import argparse
+import gzip
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FORMATS = {
+    "csv": ".csv", "json": ".json", "ndjson": ".ndjson",
+    "csv.gz": ".csv.gz", "ndjson.gz": ".ndjson.gz", "json.gz": ".json.gz",
+    "csv.zst": ".csv.zst", "ndjson.zst": ".ndjson.zst",
+    "parquet": ".parquet", "arrow": ".arrow",
+}
+COLUMNAR = ("parquet", "arrow")
+ALIASES = {
+    "name": ("title", "product", "item", "item_name", "name"),
+    "category": ("cat", "group", "type", "category"),
+    "price": ("cost", "amount", "value", "price"),
+    "updated_at": ("updated", "updatedAt", "last_update", "last_updated", "updated_at"),
+}
+CATEGORIES = 500
+BLOCK = 100_000
+BASE_EPOCH = 1_704_067_200  # 2024-01-01T00:00:00Z
+DUPLICATE_SHARE = 0.01
+EMPTY_PRICE_SHARE = 0.001
+GARBAGE_DATE_SHARE = 0.001
+DEFAULT_DIR = Path(__file__).resolve().parent.parent / "var" / "bench" / "feeds"
+
+
+def feed_path(rows: int, fmt: str, seed: int = 42, revision: int = 0, directory: Path = DEFAULT_DIR,
+              extra_columns: int = 0) -> Path:
+    extra = f"-x{extra_columns}" if extra_columns else ""
+    return Path(directory) / f"items-{rows}-s{seed}-r{revision}{extra}{FORMATS[fmt]}"
+
+
+def columns_for(seed: int) -> dict[str, str]:
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for field, aliases in ALIASES.items():
+        alias = aliases[rng.integers(len(aliases))]
+        columns[field] = alias.upper() if rng.random() < 0.2 else alias
+    return columns
+
+
+def _mix(ids: np.ndarray, salt: int) -> np.ndarray:
+    # Детерминированный хеш товара: одни и те же свойства в любом блоке и ревизии
+    x = (ids.astype(np.uint64) + np.uint64(salt)) * np.uint64(0x9E3779B97F4A7C15)
+    return (x ^ (x >> np.uint64(29))) % np.uint64(1_000_003)
+
+
+def make_block(start: int, size: int, seed: int, revision: int, change_percent: int,
+               typed: bool = False, extra_columns: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, revision, start])
+    ids = np.arange(start, start + size, dtype=np.int64)
+    # Часть строк повторяет более ранний товар (с другой датой)
+    dup = rng.random(size) < DUPLICATE_SHARE
+    ids[dup] = rng.integers(0, start + size, dup.sum())
+
+    # Минимум двух равномерных: категории с маленькими номерами крупнее
+    category = np.minimum(_mix(ids, seed) % CATEGORIES, _mix(ids, seed + 1) % CATEGORIES).astype(np.int64)
+    price = np.round(np.exp(3 + 1.5 * (_mix(ids, seed + 2) / 1_000_003.0)) * 1.7, 2)
+    seconds = BASE_EPOCH + (_mix(ids, seed + 3) % (180 * 86400)).astype(np.int64)
+
+    changed = (_mix(ids, seed + 4 + revision) % 100) < change_percent if revision else np.zeros(size, bool)
+    price = np.where(changed, np.round(price * (1 + 0.05 * revision), 2), price)
+    seconds = np.where(changed, seconds + revision * 86400, seconds)
+    seconds = seconds + dup * rng.integers(1, 3600, size)
+
+    ts = pd.to_datetime(seconds, unit="s", utc=True)
+    kind = rng.random(size)
+    updated = np.empty(size, dtype=object)
+    iso_z = kind < 0.5
+    offset = (kind >= 0.5) & (kind < 0.7)
+    naive = (kind >= 0.7) & (kind < 0.8)
+    epoch_s = (kind >= 0.8) & (kind < 0.9)
+    epoch_ms = kind >= 0.9
+    updated[iso_z] = ts[iso_z].strftime("%Y-%m-%dT%H:%M:%SZ")
+    updated[offset] = (ts[offset].tz_convert("Europe/Moscow")).strftime("%Y-%m-%dT%H:%M:%S+03:00")
+    updated[naive] = ts[naive].strftime("%Y-%m-%d %H:%M:%S")
+    updated[epoch_s] = seconds[epoch_s]
+    updated[epoch_ms] = seconds[epoch_ms] * 1000
+    garbage = rng.random(size) < GARBAGE_DATE_SHARE
+    empty_price = rng.random(size) < EMPTY_PRICE_SHARE
+    if typed:
+        updated = pd.Series(ts).where(~garbage)
+        price = np.where(empty_price, np.nan, price)
+    else:
+        updated[garbage] = "n/a"
+        price = price.astype(object)
+        price[empty_price] = None
+
+    block = pd.DataFrame({
+        "name": np.char.add("item-", ids.astype(str)),
+        "category": np.char.add("cat-", category.astype(str)),
+        "price": price,
+        "updated_at": updated,
+    })
+    for i in range(extra_columns):
+        block[f"description_{i}"] = np.char.add(f"Описание {i} для товара item-", ids.astype(str))
+    return block
+
+
+def _open_text(path: Path, compression: str):
+    if compression == "gz":
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    if compression == "zst":
+        import zstandard
+
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(path, "wb")), encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def _write_columnar(path: Path, fmt: str, blocks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for block in blocks:
+            table = pa.Table.from_pandas(block, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema) if fmt == "parquet" else pa.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def generate(path, rows: int, fmt: str = "csv", seed: int = 42, revision: int = 0, change_percent: int = 10,
+             extra_columns: int = 0) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    columns = columns_for(seed)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    base, _, compression = fmt.partition(".")
+    blocks = (
+        make_block(start, min(BLOCK, rows - start), seed, revision, change_percent,
+                   typed=base in COLUMNAR, extra_columns=extra_columns).rename(columns=columns)
+        for start in range(0, rows, BLOCK)
+    )
+    if base in COLUMNAR:
+        _write_columnar(tmp, base, blocks)
+        tmp.replace(path)
+        return path
+    with _open_text(tmp, compression) as f:
+        if base == "json":
+            f.write("[")
+        for i, block in enumerate(blocks):
+            if base == "csv":
+                block.to_csv(f, index=False, header=i == 0)
+            elif base == "ndjson":
+                # to_json(lines=True) завершает каждую запись переводом строки
+                f.write(block.to_json(orient="records", lines=True))
+            else:
+                records = block.to_json(orient="records")[1:-1]
+                f.write(("," if i else "") + records)
+        if base == "json":
+            f.write("]")
+    tmp.replace(path)
+    return path
+
+
+def ensure_feed(rows: int, fmt: str = "csv", seed: int = 42, revision: int = 0, directory: Path = DEFAULT_DIR,
+                extra_columns: int = 0) -> Path:
+    """Путь к фиду; генерирует его, если такого ещё нет."""
+    path = feed_path(rows, fmt, seed, revision, directory, extra_columns)
+    if not path.exists():
+        generate(path, rows, fmt, seed, revision, extra_columns=extra_columns)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--revision", type=int, default=0)
+    parser.add_argument("--change-percent", type=int, default=10)
+    parser.add_argument("--extra-columns", type=int, default=0, help="Лишние для ETL колонки-описания")
+    parser.add_argument("--out", help="Путь к файлу (по умолчанию var/bench/feeds/...)")
+    args = parser.parse_args()
+
+    out = args.out or feed_path(args.rows, args.format, args.seed, args.revision, extra_columns=args.extra_columns)
+    path = generate(out, args.rows, args.format, args.seed, args.revision, args.change_percent, args.extra_columns)
+    print(json.dumps({"path": str(path), "bytes": path.stat().st_size, "rows": args.rows}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Результаты бенчмарков в JSON и сравнение с сохранённым baseline.
+
+Результат — список метрик {"name", "value", "unit", "better"}, где better —
+"lower" (секунды, латентность) или "higher" (строк/с, запросов/с).
+Метрика считается регрессией, если она хуже baseline больше чем на
+tolerance (доля). Регрессии печатаются и дают ненулевой код выхода.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+DEFAULT_TOLERANCE = 0.2
+
+
+class Results:
+    def __init__(self, suite: str, params: dict | None = None):
+        self.suite = suite
+        self.params = params or {}
+        self.metrics: list[dict] = []
+
+    def add(self, name: str, value: float, unit: str, better: str = "lower"):
+        assert better in ("lower", "higher")
+        self.metrics.append({"name": name, "value": float(value), "unit": unit, "better": better})
+        print(f"{name:<60} {value:>14.3f} {unit}", flush=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "suite": self.suite,
+            "params": self.params,
+            "environment": environment(),
+            "metrics": self.metrics,
+        }
+
+    def write(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """Возвращает описания регрессий (пустой список — всё в пределах допуска)."""
+    base = {m["name"]: m for m in baseline.get("metrics", [])}
+    regressions = []
+    for metric in current["metrics"]:
+        old = base.get(metric["name"])
+        if old is None or not old["value"]:
+            continue
+        change = (metric["value"] - old["value"]) / old["value"]
+        worse = change if metric["better"] == "lower" else -change
+        if worse > tolerance:
+            regressions.append(
+                f"{metric['name']}: {old['value']:.3f} -> {metric['value']:.3f} {metric['unit']} "
+                f"({change:+.0%}, tolerance {tolerance:.0%})"
+            )
+    return regressions
+
+
+def add_arguments(parser):
+    parser.add_argument("--output", help="Куда записать результаты (JSON)")
+    parser.add_argument("--baseline", help="JSON с результатами, с которыми сравнивать")
+    parser.add_argument("--save-baseline", action="store_true", help="Записать результаты в --baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Допустимое ухудшение относительно baseline (доля, по умолчанию 0.2)")
+
+
+def finish(results: Results, args):
+    """Пишет результаты и сравнивает с baseline; при регрессии завершает процесс с кодом 1."""
+    if args.output:
+        results.write(args.output)
+    if not args.baseline:
+        return
+    if args.save_baseline:
+        results.write(args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"Baseline {baseline_path} not found, nothing to compare (use --save-baseline)")
+        return
+    regressions = compare(results.to_dict(), json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS against baseline:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\nNo regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
@@ -0,0 +1,4 @@
+#!/bin/bash
+# Разрешает потоковую репликацию для db-replica (выполняется при первой инициализации тома)
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
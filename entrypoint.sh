@@ -21,5 +21,12 @@ if echo "$@" | grep -q "gunicorn"; then
   python manage.py collectstatic --noinput
 fi
 
+# Каталог метрик prometheus_client для многопроцессного воркера: должен существовать
+# до первого импорта prometheus_client, файлы прошлых запусков искажают счётчики
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 # Запуск основной команды (gunicorn / celery)
 exec "$@"
@@ -0,0 +1,37 @@
+"""
+Конфигурация gunicorn для сервиса web (gunicorn читает ./gunicorn.conf.py сам,
+в compose он указан явно).
+
+preload_app: Django, DRF, модели и URLconf импортируются один раз в мастере,
+воркеры получают их через fork и делят эти страницы памяти (copy-on-write).
+Чтобы страницы оставались общими, сборщик мусора не должен их трогать:
+до загрузки приложения GC выключен, перед первым fork объекты мастера
+переносятся в постоянное поколение (gc.freeze), после чего GC включается
+снова — и в мастере, и в воркерах он обходит только то, что создано позже.
+
+Число воркеров — WEB_CONCURRENCY (как у gunicorn по умолчанию).
+GUNICORN_PRELOAD=0 — загрузка приложения в каждом воркере отдельно.
+"""
+import gc
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+# Перезапуск воркера после N запросов (0 — без перезапуска) со случайным разбросом
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+if preload_app:
+    gc.disable()
+
+
+def when_ready(server):
+    # Вызывается после загрузки приложения в мастере и до запуска воркеров
+    if server.cfg.preload_app:
+        # Соединения, открытые при импорте, воркеры не должны унаследовать
+        from django.db import connections
+
+        connections.close_all()
+        gc.freeze()
+        # Мастер живёт всё время работы сервиса: без GC его циклический мусор не освобождался бы
+        gc.enable()
@@ -0,0 +1,110 @@
+"""
+Async-версии эндпоинтов чтения для запуска под ASGI (uvicorn).
+
+Формат ответов тот же, что у синхронных DRF-view (быстрый путь /api/items/
+со всеми видами пагинации и статистика). Запросы к базе идут через async ORM
+Django, кэш статистики — через redis.asyncio (stats_cache.aget_or_compute),
+так что медленный Redis или Postgres не занимает воркер целиком, пока ждёт.
+Курсоры и оценка количества (?cursor=, ?count=estimate) — те же, что
+в items.pagination; EXPLAIN для оценки идёт через sync_to_async.
+"""
+import orjson
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .models import Item
+from .pagination import (
+    ItemCursorPagination, estimate_count, ordering_fields, page_size, wants_cursor, wants_estimated_count,
+)
+from .serializers import ITEM_COLUMNS, item_rows_to_data
+from .services import stats, stats_cache
+from .services.search import order_by_relevance
+from .views import ItemFilter, PriceStatsByCategoryView
+
+_encoder = JSONEncoder()
+
+
+def _json(data, status=200) -> HttpResponse:
+    return HttpResponse(orjson.dumps(data, default=_encoder.default), status=status, content_type="application/json")
+
+
+async def items_list(request):
+    filterset = ItemFilter(request.GET, queryset=Item.objects.all())
+    if not filterset.is_valid():
+        return _json({field: list(errors) for field, errors in filterset.errors.items()}, status=400)
+    # Request DRF — только обёртка над query_params для хелперов пагинации
+    request = Request(request)
+    # .qs строит запрос синхронно (фильтр категории может дочитать справочник)
+    queryset = await sync_to_async(lambda: filterset.qs)()
+    queryset = queryset.order_by(*ordering_fields(request))
+    cursor = wants_cursor(request)
+    if request.GET.get("search") and "ordering" not in request.GET and not cursor:
+        queryset = await sync_to_async(order_by_relevance)(queryset, request.GET["search"])
+    queryset = queryset.values_list(*ITEM_COLUMNS)
+    estimated = wants_estimated_count(request)
+    if cursor:
+        return await _cursor_page(request, queryset, estimated)
+
+    size = page_size()
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 0
+    count = await sync_to_async(estimate_count)(queryset) if estimated else await queryset.acount()
+    pages = max((count + size - 1) // size, 1)
+    if not 1 <= page <= pages:
+        return _json({"detail": "Invalid page."}, status=404)
+
+    offset = (page - 1) * size
+    rows = [row async for row in queryset[offset:offset + size]]
+    data = await sync_to_async(item_rows_to_data)(rows)
+    url = request.build_absolute_uri()
+    previous = None
+    if page > 1:
+        previous = remove_query_param(url, "page") if page == 2 else replace_query_param(url, "page", page - 1)
+    payload = {
+        "count": count,
+        "next": replace_query_param(url, "page", page + 1) if page < pages else None,
+        "previous": previous,
+        "results": data,
+    }
+    if estimated:
+        payload["count_estimated"] = True
+    return _json(payload)
+
+
+async def _cursor_page(request, queryset, estimated: bool) -> HttpResponse:
+    """Keyset-страница: WHERE по ключу курсора + LIMIT, без COUNT(*) и OFFSET."""
+    paginator = ItemCursorPagination()
+    paginator.count = await sync_to_async(estimate_count)(queryset) if estimated else None
+    try:
+        page_queryset = paginator.page_queryset(queryset, request)
+    except NotFound as exc:
+        return _json({"detail": exc.detail}, status=404)
+    rows = paginator.page_rows([row async for row in page_queryset])
+    data = await sync_to_async(item_rows_to_data)(rows)
+    return _json(paginator.get_paginated_response(data).data)
+
+
+async def avg_price_by_category(request):
+    return _json(await stats_cache.aget_or_compute("avg_price_by_category", stats.average_prices))
+
+
+async def prices_by_category(request):
+    max_bins = PriceStatsByCategoryView.max_bins
+    try:
+        bins = int(request.GET.get("bins", 10))
+    except ValueError:
+        bins = 0
+    if not 1 <= bins <= max_bins:
+        return _json({"bins": [f"Expected an integer from 1 to {max_bins}"]}, status=400)
+    category = request.GET.get("category")
+    if category is not None:
+        return _json(await sync_to_async(stats.price_distribution)(bins, category))
+    return _json(await stats_cache.aget_or_compute(
+        f"price_distribution:{bins}", lambda: stats.price_distribution(bins)
+    ))
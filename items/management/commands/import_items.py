@@ -1,6 +1,9 @@
 import os
 import logging
-from django.core.management.base import BaseCommand
+import uuid
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from items.services import runs
 from items.services.etl import ItemETLService
 
 logger = logging.getLogger(__name__)
@@ -11,6 +14,30 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--source", type=str, default="", help="Путь или URL к CSV/JSON")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Потоковый импорт блоками по N строк (по умолчанию ETL_CHUNK_SIZE; 0 — читать источник целиком)",
+        )
+        parser.add_argument(
+            "--date-format",
+            type=str,
+            default=None,
+            help="Формат updated_at: iso8601, epoch, epoch_s, epoch_ms или strftime-строка (по умолчанию — автоопределение)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Разбирать локальный CSV/NDJSON в N процессах (по умолчанию ETL_WORKERS; 1 — последовательно)",
+        )
+
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Импортировать, даже если источник не изменился, и не отбрасывать строки по водяному знаку",
+        )
 
     def handle(self, *args, **options):
         source = (
@@ -21,7 +48,37 @@ class Command(BaseCommand):
         )
 
         self.stdout.write(self.style.NOTICE(f"Importing from: {source}"))
-        result = ItemETLService(source).run()
-        msg = f"Import completed — created={result['created']}, updated={result['updated']}, total={result['total']}"
+        chunk_size = options.get("chunk_size")
+        if chunk_size is None:
+            chunk_size = settings.ETL_CHUNK_SIZE
+        chunk_size = chunk_size or None
+        # Та же блокировка, что у Celery: не писать один источник параллельно с воркером
+        run = runs.start(source, uuid.uuid4().hex, chunk_size, coalesce=False)
+        if run is None:
+            raise CommandError(f"Import of {source} is already running")
+        service = ItemETLService(
+            source,
+            chunk_size=chunk_size,
+            date_format=options.get("date_format"),
+            force=options.get("force", False),
+            workers=options.get("workers"),
+            import_run=run,
+        )
+        try:
+            with runs.heartbeat([source], run.task_id):
+                result = service.run()
+        except Exception as exc:
+            runs.fail(run, exc)
+            raise
+        runs.finish(run, result)
+        if result["unchanged"]:
+            msg = f"Source unchanged ({result['unchanged']}), nothing imported"
+            logger.info(msg)
+            self.stdout.write(self.style.SUCCESS(msg))
+            return
+        msg = (
+            f"Import completed — created={result['created']}, updated={result['updated']}, "
+            f"total={result['total']}, skipped={result['skipped']}, invalid_dates={result['invalid_dates']}"
+        )
         logger.info(msg)
         self.stdout.write(self.style.SUCCESS(msg))
@@ -0,0 +1,31 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from items.services import stats, stats_cache
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Пересборка и сверка агрегата CategoryStats с таблицей товаров"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Только сверить агрегат с таблицей товаров, ничего не меняя",
+        )
+
+    def handle(self, *args, **options):
+        if not options["verify"]:
+            count = stats.rebuild()
+            stats_cache.bump_version()
+            msg = f"CategoryStats rebuilt — categories={count}"
+            logger.info(msg)
+            self.stdout.write(self.style.SUCCESS(msg))
+
+        problems = stats.verify()
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f"CategoryStats mismatch in {len(problems)} field(s)")
+        self.stdout.write(self.style.SUCCESS("CategoryStats matches items table"))
@@ -0,0 +1,58 @@
+"""
+Метрики Prometheus приложения items.
+
+В web они отдаются через django_prometheus (/metrics). В Celery-воркере
+метрики ETL отдаёт HTTP-сервер, который поднимается в itemstats.celery
+(WORKER_METRICS_PORT); с PROMETHEUS_MULTIPROC_DIR значения собираются со
+всех дочерних процессов prefork-пула.
+"""
+import resource
+import sys
+
+from prometheus_client import Counter, Gauge, Histogram
+
+ETL_CACHE_INVALIDATIONS = Counter(
+    "items_etl_cache_invalidations_total",
+    "cacheops invalidations issued after ETL commits",
+    ["mode"],
+)
+
+# Этапы: fetch (скачивание/хэширование), parse, normalize, write
+ETL_STAGE_SECONDS = Histogram(
+    "items_etl_stage_seconds",
+    "Time spent in each ETL stage per import run",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+ETL_RUN_SECONDS = Histogram(
+    "items_etl_run_seconds",
+    "Total duration of an import run",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+ETL_BYTES_FETCHED = Counter("items_etl_bytes_fetched_total", "Bytes read from import sources")
+ETL_ROWS = Counter("items_etl_rows_total", "Rows processed by imports", ["result"])
+ETL_ROWS_PER_SECOND = Gauge(
+    "items_etl_rows_per_second", "Throughput of the last import run", multiprocess_mode="mostrecent"
+)
+ETL_PEAK_RSS = Gauge(
+    "items_etl_peak_rss_bytes", "Peak resident memory of the worker process after an import run",
+    multiprocess_mode="max",
+)
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss — в килобайтах на Linux и в байтах на macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def observe_etl_run(timings: dict[str, float], elapsed: float, bytes_fetched: int, result: dict):
+    for stage, seconds in timings.items():
+        ETL_STAGE_SECONDS.labels(stage).observe(seconds)
+    ETL_RUN_SECONDS.observe(elapsed)
+    ETL_BYTES_FETCHED.inc(bytes_fetched)
+    for key in ("created", "updated", "skipped", "total"):
+        ETL_ROWS.labels(key).inc(result.get(key, 0))
+    if elapsed > 0 and result.get("total"):
+        ETL_ROWS_PER_SECOND.set(result["total"] / elapsed)
+    ETL_PEAK_RSS.set(peak_rss_bytes())
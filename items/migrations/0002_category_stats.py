@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:33
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def fill_category_stats(apps, schema_editor):
+    Item = apps.get_model('items', 'Item')
+    CategoryStats = apps.get_model('items', 'CategoryStats')
+    rows = (
+        Item.objects.values('category')
+        .annotate(count=Count('id'), price_sum=Sum('price'), price_min=Min('price'), price_max=Max('price'))
+        .order_by()
+    )
+    CategoryStats.objects.bulk_create([CategoryStats(**r) for r in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=255, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('price_min', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('price_max', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+            ],
+        ),
+        migrations.RunPython(fill_category_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0002_category_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['price', 'id'], name='items_item_price_id_idx'),
+        ),
+    ]
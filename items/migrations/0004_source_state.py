@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_item_price_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=2000, unique=True)),
+                ('etag', models.CharField(blank=True, default='', max_length=255)),
+                ('last_modified', models.CharField(blank=True, default='', max_length=64)),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('watermark', models.DateTimeField(null=True)),
+                ('checked_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:45
+
+import math
+import struct
+import zlib
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Копия items.services.sketch (формат 1, точность 0.01) на момент миграции:
+# миграция должна писать те же байты, как бы потом ни менялся скетч
+SKETCH_FORMAT_VERSION = 1
+SKETCH_LOG_GAMMA = math.log((1 + 0.01) / (1 - 0.01))
+SKETCH_MIN_VALUE = 0.01
+SKETCH_ZERO_KEY = -(2 ** 31)
+
+
+def _sketch_key(price):
+    price = float(price)
+    if price < SKETCH_MIN_VALUE:
+        return SKETCH_ZERO_KEY
+    return math.ceil(math.log(price) / SKETCH_LOG_GAMMA)
+
+
+def _sketch_bytes(buckets):
+    keys = sorted(k for k, c in buckets.items() if c)
+    if not keys:
+        return b''
+    deltas = [keys[0]] + [b - a for a, b in zip(keys, keys[1:])]
+    counts = [buckets[k] for k in keys]
+    payload = struct.pack(f'<BI{len(keys)}q{len(keys)}q', SKETCH_FORMAT_VERSION, len(keys), *deltas, *counts)
+    return zlib.compress(payload)
+
+
+def fill_price_sketches(apps, schema_editor):
+    Item = apps.get_model('items', 'Item')
+    CategoryStats = apps.get_model('items', 'CategoryStats')
+    sketches = {}
+    rows = Item.objects.values_list('category', 'price').annotate(n=Count('id')).order_by()
+    for category, price, n in rows.iterator(chunk_size=10000):
+        sketches.setdefault(category, Counter())[_sketch_key(price)] += n
+    stats = list(CategoryStats.objects.filter(category__in=list(sketches)))
+    for s in stats:
+        s.price_sketch = _sketch_bytes(sketches[s.category])
+    CategoryStats.objects.bulk_update(stats, ['price_sketch'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0004_source_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorystats',
+            name='price_sketch',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.RunPython(fill_price_sketches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-17 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0005_category_price_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('key', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='item',
+            unique_together=set(),
+        ),
+        migrations.RenameField(
+            model_name='item',
+            old_name='category',
+            new_name='category_name',
+        ),
+        # nullable, чтобы откат 0008 мог вернуть колонку до заполнения в 0007
+        migrations.AlterField(
+            model_name='item',
+            name='category_name',
+            field=models.CharField(db_index=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='category',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='items', to='items.category'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.0.6 on 2026-10-17 14:05
+
+import math
+import struct
+import zlib
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum
+
+# Копия items.services.sketch (формат 1, точность 0.01) на момент миграции:
+# миграция должна писать те же байты, как бы потом ни менялся скетч
+SKETCH_FORMAT_VERSION = 1
+SKETCH_LOG_GAMMA = math.log((1 + 0.01) / (1 - 0.01))
+SKETCH_MIN_VALUE = 0.01
+SKETCH_ZERO_KEY = -(2 ** 31)
+
+
+def _sketch_key(price):
+    price = float(price)
+    if price < SKETCH_MIN_VALUE:
+        return SKETCH_ZERO_KEY
+    return math.ceil(math.log(price) / SKETCH_LOG_GAMMA)
+
+
+def _sketch_bytes(buckets):
+    keys = sorted(k for k, c in buckets.items() if c)
+    if not keys:
+        return b''
+    deltas = [keys[0]] + [b - a for a, b in zip(keys, keys[1:])]
+    counts = [buckets[k] for k in keys]
+    payload = struct.pack(f'<BI{len(keys)}q{len(keys)}q', SKETCH_FORMAT_VERSION, len(keys), *deltas, *counts)
+    return zlib.compress(payload)
+
+
+def _key(name):
+    # копия items.models.category_key на момент миграции
+    return name.strip().casefold()
+
+
+def fill_categories(apps, schema_editor):
+    """
+    Заполняет справочник из строк товаров. Написания, совпадающие без учёта
+    регистра, становятся одной категорией (с именем самого частого написания);
+    товары, которые после этого совпали по (name, category), схлопываются
+    в самый свежий. CategoryStats пересчитывается под новые имена.
+    """
+    Item = apps.get_model('items', 'Item')
+    Category = apps.get_model('items', 'Category')
+    CategoryStats = apps.get_model('items', 'CategoryStats')
+
+    ids = {}
+    spellings = Item.objects.values_list('category_name').annotate(n=Count('id')).order_by('-n', 'category_name')
+    for spelling, _ in spellings:
+        key = _key(spelling)
+        if key not in ids:
+            ids[key] = Category.objects.create(name=spelling.strip(), key=key).pk
+        Item.objects.filter(category_name=spelling).update(category_id=ids[key])
+
+    duplicates = (
+        Item.objects.values('name', 'category_id').annotate(n=Count('id')).filter(n__gt=1).order_by()
+    )
+    for dup in duplicates.iterator():
+        rows = Item.objects.filter(name=dup['name'], category_id=dup['category_id'])
+        latest = rows.order_by('-updated_at', '-id').values_list('id', flat=True).first()
+        rows.exclude(id=latest).delete()
+
+    names = dict(Category.objects.values_list('id', 'name'))
+    sketches = {}
+    rows = Item.objects.values_list('category_id', 'price').annotate(n=Count('id')).order_by()
+    for category_id, price, n in rows.iterator(chunk_size=10000):
+        sketches.setdefault(category_id, Counter())[_sketch_key(price)] += n
+    aggregates = (
+        Item.objects.values('category_id')
+        .annotate(count=Count('id'), price_sum=Sum('price'), price_min=Min('price'), price_max=Max('price'))
+        .order_by()
+    )
+    stats = []
+    for values in aggregates:
+        category_id = values.pop('category_id')
+        stats.append(CategoryStats(
+            category=names[category_id], price_sketch=_sketch_bytes(sketches[category_id]), **values
+        ))
+    CategoryStats.objects.all().delete()
+    CategoryStats.objects.bulk_create(stats, batch_size=500)
+
+
+def fill_category_names(apps, schema_editor):
+    Item = apps.get_model('items', 'Item')
+    Category = apps.get_model('items', 'Category')
+    Item.objects.update(
+        category_name=Subquery(Category.objects.filter(id=OuterRef('category_id')).values('name')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0006_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_categories, fill_category_names),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-17 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0007_backfill_categories'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='item',
+            name='category_name',
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='items', to='items.category'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='item',
+            unique_together={('name', 'category')},
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', 'price'], name='items_item_category_price_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:20
+
+from django.db import migrations
+
+INDEX = 'items_item_name_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    GIN-индекс триграмм на UPPER(name) для ?search= (items.services.search).
+    Создаётся только на PostgreSQL с доступным pg_trgm; иначе поиск
+    работает без индекса (icontains). CONCURRENTLY — чтобы не блокировать
+    запись в большую таблицу, поэтому миграция не атомарная.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX} ON items_item USING gin (UPPER(name) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('items', '0008_item_category_required'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
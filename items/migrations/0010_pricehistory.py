@@ -0,0 +1,70 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BRIN_INDEX = 'items_pricehist_changed_brin'
+
+
+def create_history_table(apps, schema_editor):
+    """
+    На PostgreSQL — таблица, секционированная по месяцам changed_at
+    (первичный ключ секционированной таблицы обязан включать ключ
+    секционирования), плюс BRIN-индекс по времени: строки пишутся примерно
+    в порядке changed_at, и индекс в несколько страниц отсекает лишние блоки.
+    Секции создаются при записи (items.services.price_history).
+    На остальных бэкендах — обычная таблица.
+    """
+    model = apps.get_model('items', 'PriceHistory')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(model)
+        return
+    table = schema_editor.quote_name(model._meta.db_table)
+    schema_editor.execute(
+        f"""
+        CREATE TABLE {table} (
+            id bigserial NOT NULL,
+            item_id bigint NOT NULL,
+            category_id bigint NOT NULL,
+            price numeric(12, 2) NOT NULL,
+            changed_at timestamptz NOT NULL,
+            PRIMARY KEY (id, changed_at)
+        ) PARTITION BY RANGE (changed_at)
+        """
+    )
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+    schema_editor.execute(f'CREATE INDEX {BRIN_INDEX} ON {table} USING brin (changed_at)')
+
+
+def drop_history_table(apps, schema_editor):
+    # Секции удаляются вместе с родительской таблицей
+    schema_editor.delete_model(apps.get_model('items', 'PriceHistory'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0009_item_name_trgm_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PriceHistory',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                        ('changed_at', models.DateTimeField()),
+                        ('category', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='items.category')),
+                        ('item', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='items.item')),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['item', 'changed_at'], name='items_pricehist_item_idx'), models.Index(fields=['category', 'changed_at'], name='items_pricehist_cat_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_history_table, drop_history_table),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-17 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0010_pricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=2000)),
+                ('task_id', models.CharField(db_index=True, max_length=255)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('coalesced', 'Coalesced')], default='running', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=1)),
+                ('chunk_size', models.PositiveIntegerField(null=True)),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('chunks_done', models.PositiveIntegerField(default=0)),
+                ('rows_done', models.BigIntegerField(default=0)),
+                ('created', models.BigIntegerField(default=0)),
+                ('updated', models.BigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('heartbeat_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('result', models.JSONField(null=True)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+        ),
+    ]
@@ -1,13 +1,152 @@
 from django.db import models
 
+
+def category_key(name: str) -> str:
+    """Ключ категории: без пробелов по краям и без учёта регистра."""
+    return name.strip().casefold()
+
+
+class Category(models.Model):
+    """
+    Справочник категорий. Имя — написание, с которым категория впервые
+    пришла в импорт; key (category_key) уникален, так что "Books" и " books"
+    — одна категория. Строки только добавляются (items.services.categories
+    держит карту id в памяти процесса).
+    """
+    name = models.CharField(max_length=255)
+    key = models.CharField(max_length=255, unique=True)
+
+    def save(self, *args, **kwargs):
+        self.key = category_key(self.name)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
 class Item(models.Model):
     name = models.CharField(max_length=255)
-    category = models.CharField(max_length=255, db_index=True)
+    # Отдельный индекс не нужен: его покрывает (category, price)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='items', db_index=False)
     price = models.DecimalField(max_digits=12, decimal_places=2, db_index=True)
     updated_at = models.DateTimeField(db_index=True)
 
     class Meta:
         unique_together = ('name', 'category')
+        indexes = [
+            # keyset-пагинация по (price, id)
+            models.Index(fields=['price', 'id'], name='items_item_price_id_idx'),
+            # фильтр по категории + диапазон цен
+            models.Index(fields=['category', 'price'], name='items_item_category_price_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.category})"
+
+
+class PriceHistory(models.Model):
+    """
+    История цен: строка на каждое изменение цены товара, которое записал ETL
+    (новый товар или другая цена при более свежем updated_at), changed_at —
+    updated_at новой версии. Таблица только пополняется; связи без внешних
+    ключей, чтобы удаление товара не трогало историю.
+
+    На PostgreSQL таблица секционирована по месяцам changed_at (секции
+    создаёт items.services.price_history), по времени — BRIN-индекс
+    (миграция 0010); запрос за период читает только нужные секции.
+    """
+    # Одиночные индексы не нужны: их покрывают (item, changed_at) и (category, changed_at)
+    item = models.ForeignKey(
+        Item, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'changed_at'], name='items_pricehist_item_idx'),
+            models.Index(fields=['category', 'changed_at'], name='items_pricehist_cat_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id}: {self.price} @ {self.changed_at}"
+
+
+class CategoryStats(models.Model):
+    """
+    Агрегат цен по категории, который поддерживается инкрементально:
+    ETL применяет дельты по созданным/обновлённым строкам, одиночные
+    сохранения через ORM — сигналы (items.signals).
+    Пересчёт с нуля и сверка — manage.py rebuild_category_stats.
+    """
+    category = models.CharField(max_length=255, unique=True)
+    count = models.BigIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    price_min = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    price_max = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    # Скетч распределения цен (items.services.sketch.PriceSketch.to_bytes)
+    price_sketch = models.BinaryField(default=bytes)
+
+    def __str__(self):
+        return f"{self.category}: {self.count}"
+
+
+class SourceState(models.Model):
+    """
+    Состояние источника импорта между запусками: заголовки для условного
+    запроса, отпечаток содержимого и водяной знак updated_at.
+    """
+    source = models.CharField(max_length=2000, unique=True)
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    watermark = models.DateTimeField(null=True)
+    checked_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.source
+
+
+class ImportRun(models.Model):
+    """
+    Один запуск импорта источника (items.services.runs): статус, прогресс
+    и контрольная точка — сколько блоков уже закоммичено. Повтор той же
+    задачи Celery (тот же task_id) продолжает запуск с этой точки, если
+    содержимое источника и размер блока не изменились.
+    """
+
+    class Status(models.TextChoices):
+        RUNNING = 'running'
+        SUCCEEDED = 'succeeded'
+        FAILED = 'failed'
+        # Источник уже импортировался другим запуском; тот перезапустится после завершения
+        COALESCED = 'coalesced'
+
+    source = models.CharField(max_length=2000, db_index=True)
+    task_id = models.CharField(max_length=255, db_index=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.RUNNING)
+    attempts = models.PositiveIntegerField(default=1)
+    # Контрольная точка: блоки и строки, уже записанные в базу
+    chunk_size = models.PositiveIntegerField(null=True)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    chunks_done = models.PositiveIntegerField(default=0)
+    rows_done = models.BigIntegerField(default=0)
+    created = models.BigIntegerField(default=0)
+    updated = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"{self.source} [{self.status}]"
+
+    @property
+    def rows_per_second(self) -> float | None:
+        end = self.finished_at or self.heartbeat_at
+        seconds = (end - self.started_at).total_seconds() if end and self.started_at else 0
+        return round(self.rows_done / seconds, 1) if seconds > 0 else None
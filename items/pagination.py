@@ -0,0 +1,215 @@
+"""
+Пагинация списка товаров.
+
+- ItemPagination — обычная постраничная (?page=N), опционально с оценкой
+  количества из статистики планировщика (?count=estimate) вместо COUNT(*).
+- ItemCursorPagination — keyset-пагинация (?cursor=...) по (id) или
+  (price, id): каждая страница — это WHERE по ключу + LIMIT, без OFFSET,
+  поэтому время ответа не зависит от глубины.
+"""
+import base64
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Ниже этого порога оценка планировщика неточна, а точный COUNT(*) и так дешёвый
+ESTIMATE_EXACT_BELOW = 1000
+
+ORDERINGS = {
+    "id": ("id",),
+    "price": ("price", "id"),
+}
+
+
+def page_size() -> int:
+    # Читаем на каждый запрос, а не при импорте модуля, как PageNumberPagination
+    return settings.REST_FRAMEWORK.get('PAGE_SIZE') or api_settings.PAGE_SIZE
+
+
+def ordering_fields(request) -> tuple[str, ...]:
+    return ORDERINGS.get(request.query_params.get("ordering", "id"), ORDERINGS["id"])
+
+
+def wants_estimated_count(request) -> bool:
+    return request.query_params.get("count") == "estimate"
+
+
+def wants_cursor(request) -> bool:
+    """?cursor=... или ?pagination=cursor — keyset-пагинация, иначе постраничная."""
+    params = request.query_params
+    return "cursor" in params or params.get("pagination") == "cursor"
+
+
+def estimate_count(queryset) -> int:
+    """Число строк по оценке планировщика PostgreSQL (EXPLAIN), без выполнения запроса."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate < ESTIMATE_EXACT_BELOW:
+        return queryset.count()
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class ItemPagination(PageNumberPagination):
+    @property
+    def page_size(self):
+        return page_size()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.estimated = wants_estimated_count(request)
+        self.django_paginator_class = EstimatedCountPaginator if self.estimated else Paginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.estimated:
+            response.data["count_estimated"] = True
+        return response
+
+
+class ItemCursorPagination(BasePagination):
+    """
+    Курсор — base64 от JSON {"v": [значения ключа], "r": назад?}.
+    Для сортировки по цене ключ (price, id), иначе (id); индексы по этим
+    полям позволяют базе начинать чтение сразу с нужного места.
+    """
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    @property
+    def page_size(self):
+        return page_size()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = estimate_count(queryset) if wants_estimated_count(request) else None
+        return self.page_rows(list(self.page_queryset(queryset, request)))
+
+    def page_queryset(self, queryset, request):
+        """
+        Запрос страницы (без выполнения): сортировка, WHERE по ключу курсора
+        и LIMIT page_size + 1. async-view выполняет его через async ORM и
+        передаёт строки в page_rows; count (оценку) он заполняет сам.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = ordering_fields(request)
+        self.positions = {name: i for i, name in enumerate(getattr(queryset, "_fields", ()))}
+
+        self.values, self.reverse = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*[f"-{f}" if self.reverse else f for f in self.fields])
+        if self.values is not None:
+            queryset = queryset.filter(self._after(self.values, self.reverse))
+        return queryset[:self.page_size + 1]
+
+    def page_rows(self, rows: list) -> list:
+        values, reverse = self.values, self.reverse
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # В прямом направлении «ещё есть» — это следующая страница, в обратном — предыдущая;
+        # противоположная сторона существует, если мы пришли по курсору
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = values is not None if not reverse else has_more
+        self.first_key = self._key(rows[0]) if rows else None
+        self.last_key = self._key(rows[-1]) if rows else None
+        return rows
+
+    def _key(self, obj):
+        if isinstance(obj, tuple):
+            # строки values_list: позиции полей берём из queryset
+            return [str(obj[self.positions[f]]) for f in self.fields]
+        return [str(obj[f]) if isinstance(obj, dict) else str(getattr(obj, f)) for f in self.fields]
+
+    def _after(self, values, reverse) -> Q:
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        op = "lt" if reverse else "gt"
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.fields, values):
+            condition |= Q(**equal, **{f"{field}__{op}": value})
+            equal[field] = value
+        return condition
+
+    def decode_cursor(self, request, model):
+        """Значения ключа приводятся к типам полей модели: подделанный курсор — 404, а не ошибка базы."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            values, reverse = data["v"], bool(data.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [self._coerce(model._meta.get_field(f), v) for f, v in zip(self.fields, values)]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    @staticmethod
+    def _coerce(field, value):
+        # Курсор хранит значения строками; валидаторы поля отсекают NaN и числа вне диапазона колонки
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise ValidationError("Unsupported cursor value")
+        value = field.to_python(value)
+        field.run_validators(value)
+        return value
+
+    def encode_cursor(self, values, reverse=False) -> str:
+        data = json.dumps({"v": values, "r": reverse} if reverse else {"v": values})
+        encoded = base64.urlsafe_b64encode(data.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return self.encode_cursor(self.last_key)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_key is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first_key, reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "previous": self.get_previous_link()}
+        if self.count is not None:
+            payload["count"] = self.count
+            payload["count_estimated"] = True
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,96 @@
+"""
+Описание операций API для Swagger/ReDoc (drf_yasg).
+
+Вынесено из views: модуль импортирует только itemstats.api_docs при первом
+запросе к документации, поэтому drf_yasg не загружается в web-процессах,
+которые документацию не отдают (API_DOCS=0) или ещё не отдавали.
+"""
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+
+from .pagination import ORDERINGS
+from .serializers import ItemSerializer
+from .services import price_history
+from .views import AvgPriceByCategoryView, ItemListView, PriceHistoryView, PriceStatsByCategoryView
+
+
+def document(view, **kwargs):
+    """swagger_auto_schema для метода get view (метод должен быть объявлен в самом классе)."""
+    swagger_auto_schema(**kwargs)(view.__dict__['get'])
+
+
+document(
+    ItemListView,
+    operation_description="Получить список товаров с фильтрацией по категории и цене",
+    manual_parameters=[
+        openapi.Parameter('search', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Поиск по имени: подстрока без учёта регистра и нечёткое совпадение "
+                                      "(pg_trgm); без ordering — по релевантности"),
+        openapi.Parameter('ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(ORDERINGS),
+                          description="Сортировка: id (по умолчанию) или price"),
+        openapi.Parameter('pagination', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['page', 'cursor'],
+                          description="cursor — keyset-пагинация с постоянным временем на любой глубине"),
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Курсор из ссылок next/previous"),
+        openapi.Parameter('count', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['exact', 'estimate'],
+                          description="estimate — оценка количества из статистики планировщика вместо COUNT(*)"),
+    ],
+    responses={200: ItemSerializer(many=True)},
+)
+
+document(
+    AvgPriceByCategoryView,
+    operation_description="Средняя цена товаров по категориям",
+    responses={200: openapi.Response(
+        description="Словарь с категориями и средними ценами",
+        examples={"application/json": {"electronics": 150.5, "books": 82.3}}
+    )}
+)
+
+document(
+    PriceStatsByCategoryView,
+    operation_description=(
+        "Распределение цен по категориям: count/min/max/mean точные, "
+        "p50/p90/p99 и гистограмма — по скетчу с относительной ошибкой до 1%"
+    ),
+    manual_parameters=[
+        openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Только эта категория (без учёта регистра)"),
+        openapi.Parameter('bins', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Число интервалов гистограммы "
+                                      f"(1..{PriceStatsByCategoryView.max_bins}, по умолчанию 10)"),
+    ],
+    responses={200: openapi.Response(
+        description="Словарь категория → статистика",
+        examples={"application/json": {"books": {
+            "count": 3, "min": 5.0, "max": 20.0, "mean": 11.67, "p50": 10.0, "p90": 20.0, "p99": 20.0,
+            "histogram": [{"lower": 5.0, "upper": 10.0, "count": 1}, {"lower": 10.0, "upper": 20.0, "count": 2}],
+        }}}
+    )}
+)
+
+document(
+    PriceHistoryView,
+    operation_description=(
+        "История цен по интервалам: min/avg/max/count по изменениям цены за каждый интервал "
+        "(по категории, по товару или по всему каталогу)"
+    ),
+    manual_parameters=[
+        openapi.Parameter('bucket', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          enum=list(price_history.BUCKETS), description="Интервал (по умолчанию day)"),
+        openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Начало периода, ISO-8601 (по умолчанию end - 30 дней)"),
+        openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Конец периода (не включая), ISO-8601 (по умолчанию сейчас)"),
+        openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Только эта категория (без учёта регистра)"),
+        openapi.Parameter('item', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description="Только этот товар (id)"),
+    ],
+    responses={200: openapi.Response(
+        description="Интервалы по возрастанию времени; интервалы без изменений цены пропускаются",
+        examples={"application/json": [
+            {"bucket": "2024-01-07T00:00:00Z", "count": 3, "min": 10.0, "avg": 12.5, "max": 15.0},
+        ]}
+    )}
+)
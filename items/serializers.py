@@ -1,7 +1,54 @@
+from datetime import timezone as dt_timezone
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Item
+from .models import ImportRun, Item
+from .services import categories
+
+ITEM_FIELDS = ('id', 'name', 'category', 'price', 'updated_at')
+# Колонки для values_list: категория — id, имя подставляется из карты категорий
+ITEM_COLUMNS = ('id', 'name', 'category_id', 'price', 'updated_at')
 
 class ItemSerializer(serializers.ModelSerializer):
+    category = serializers.CharField(source='category.name', read_only=True)
+
     class Meta:
         model = Item
-        fields = ('id', 'name', 'category', 'price', 'updated_at')
+        fields = ITEM_FIELDS
+
+
+class ImportRunSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportRun
+        fields = (
+            'id', 'source', 'task_id', 'status', 'attempts', 'started_at', 'heartbeat_at', 'finished_at',
+            'chunks_done', 'rows_done', 'created', 'updated', 'rows_per_second', 'result', 'error',
+        )
+
+
+def item_rows_to_data(rows) -> list[dict]:
+    """
+    Быстрая сериализация кортежей values_list(*ITEM_COLUMNS) без DRF-полей.
+    Формат совпадает с ItemSerializer: цена — строка с двумя знаками,
+    время — ISO 8601 в текущей таймзоне, UTC с суффиксом Z.
+    """
+    tz = timezone.get_current_timezone()
+    utc = tz is dt_timezone.utc or getattr(tz, 'key', None) == 'UTC'
+    rows = list(rows)
+    names = categories.names({row[2] for row in rows})
+    data = []
+    for pk, name, category_id, price, updated_at in rows:
+        if not utc:
+            updated_at = updated_at.astimezone(tz)
+        updated = updated_at.isoformat()
+        if updated.endswith('+00:00'):
+            updated = updated[:-6] + 'Z'
+        data.append({
+            'id': pk,
+            'name': name,
+            'category': names[category_id],
+            'price': f'{price:f}',
+            'updated_at': updated,
+        })
+    return data
@@ -0,0 +1,86 @@
+"""
+Карта категорий в памяти процесса: ключ (models.category_key) → id и id → имя.
+
+Категории только добавляются и не переименовываются, поэтому найденное
+значение можно держать сколько угодно; промахи дочитываются из базы одним
+запросом. В карту попадают только закоммиченные строки (через
+transaction.on_commit): id категории из откатившегося импорта в памяти
+не останется. После flush/миграций (post_migrate) карта сбрасывается.
+"""
+import threading
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from items.models import Category, category_key
+
+_lock = threading.Lock()
+_ids: dict[str, int] = {}
+_names: dict[int, str] = {}
+
+
+def _remember(rows):
+    with _lock:
+        for pk, name, key in rows:
+            _ids[key] = pk
+            _names[pk] = name
+
+
+def _fetch(queryset, using: str) -> list[tuple[int, str, str]]:
+    rows = list(queryset.using(using).values_list("id", "name", "key"))
+    if rows:
+        transaction.on_commit(partial(_remember, rows), using=using)
+    return rows
+
+
+def lookup(name: str, using: str = DEFAULT_DB_ALIAS) -> int | None:
+    """id категории по имени без учёта регистра; None, если такой нет."""
+    key = category_key(name)
+    pk = _ids.get(key)
+    if pk is None:
+        rows = _fetch(Category.objects.filter(key=key), using)
+        pk = rows[0][0] if rows else None
+    return pk
+
+
+def resolve(names, using: str = DEFAULT_DB_ALIAS) -> dict[str, int]:
+    """
+    id для каждого имени; недостающие категории создаются (в текущей транзакции)
+    с первым встреченным написанием.
+    """
+    result = {}
+    missing: dict[str, list[str]] = {}
+    for name in dict.fromkeys(names):
+        key = category_key(name)
+        pk = _ids.get(key)
+        if pk is None:
+            missing.setdefault(key, []).append(name)
+        else:
+            result[name] = pk
+    if missing:
+        # Вставка в порядке ключа: параллельные партиции fan-out берут блокировки
+        # уникального индекса в одном порядке и не ждут друг друга крест-накрест
+        Category.objects.using(using).bulk_create(
+            [Category(name=group[0].strip(), key=key) for key, group in sorted(missing.items())],
+            ignore_conflicts=True, batch_size=500,
+        )
+        for pk, _, key in _fetch(Category.objects.filter(key__in=list(missing)), using):
+            for name in missing[key]:
+                result[name] = pk
+    return result
+
+
+def names(ids, using: str = DEFAULT_DB_ALIAS) -> dict[int, str]:
+    """Имена категорий по id."""
+    ids = {int(pk) for pk in ids}
+    result = {pk: _names[pk] for pk in ids if pk in _names}
+    missing = ids - result.keys()
+    if missing:
+        result.update((pk, name) for pk, name, _ in _fetch(Category.objects.filter(id__in=missing), using))
+    return result
+
+
+def clear():
+    with _lock:
+        _ids.clear()
+        _names.clear()
@@ -0,0 +1,147 @@
+"""
+Векторный разбор колонки updated_at.
+
+Поддерживаются:
+  - ISO-8601 строки (в том числе со смешанными смещениями часового пояса),
+  - unix-время в секундах и миллисекундах (числами или числовыми строками),
+  - явный strftime-формат источника (например "%d.%m.%Y %H:%M").
+
+Всё приводится к UTC. Значения, которые не удалось разобрать векторно,
+досчитываются поштучно (только уникальные) тем же способом, что и раньше:
+django parse_datetime, затем pd.to_datetime. Наивное время считается UTC.
+"""
+import pandas as pd
+from django.utils.dateparse import parse_datetime
+
+ISO8601 = "iso8601"
+EPOCH = "epoch"
+EPOCH_SECONDS = "epoch_s"
+EPOCH_MILLISECONDS = "epoch_ms"
+
+# Числа меньше этого порога не похожи на unix-время (это 1973 год)
+EPOCH_MIN = 1e8
+# Начиная с этого порога число трактуется как миллисекунды (в секундах это 5138 год)
+EPOCH_MS_MIN = 1e11
+
+# Время с явным часовым поясом: "...12:00:00Z", "...12:00+03:00", "...12:00:00.5-0530"
+TZ_SUFFIX = r"\d:\d{2}(?::\d{2})?(?:[.,]\d+)?\s*(?:[zZ]|[+-]\d{2}(?::?\d{2})?)$"
+
+# Обнаруженный формат по источнику: живёт в пределах процесса воркера,
+# чтобы повторные импорты (и блоки потокового импорта) сразу шли нужной веткой
+_detected_formats: dict[str, str] = {}
+
+
+def parse_scalar(x):
+    """Поштучный разбор одного значения; эталон для векторной версии."""
+    if pd.isna(x):
+        return pd.NaT
+    try:
+        if isinstance(x, str):
+            dt = parse_datetime(x)
+            ts = pd.Timestamp(dt) if dt is not None else pd.to_datetime(x, utc=True)
+        else:
+            ts = pd.to_datetime(x, utc=True)
+    except Exception:
+        return pd.NaT
+    if ts is pd.NaT:
+        return ts
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+class DateParser:
+    """
+    Разбирает серию значений updated_at целиком.
+
+    ``hint`` — формат источника: "iso8601", "epoch", "epoch_s", "epoch_ms"
+    или strftime-строка. Без подсказки формат определяется автоматически
+    и запоминается для ``source``.
+    """
+
+    def __init__(self, source: str = "", hint: str | None = None):
+        self.source = source
+        self.hint = hint
+
+    def parse(self, values: pd.Series) -> tuple[pd.Series, int]:
+        """Возвращает (datetime64[ns, UTC] с NaT на месте мусора, число неразобранных)."""
+        index = values.index
+        values = pd.Series(values).reset_index(drop=True)
+
+        if pd.api.types.is_datetime64_any_dtype(values):
+            result = values.dt.tz_localize("UTC") if values.dt.tz is None else values.dt.tz_convert("UTC")
+        elif self.hint and "%" in self.hint:
+            result = pd.to_datetime(values, format=self.hint, utc=True, errors="coerce")
+        else:
+            result = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, UTC]")
+            kind = self.hint or _detected_formats.get(self.source)
+            steps = [(ISO8601, self._parse_iso), (EPOCH, self._parse_epoch)]
+            if pd.api.types.is_numeric_dtype(values) or kind in (EPOCH, EPOCH_SECONDS, EPOCH_MILLISECONDS):
+                steps.reverse()
+            # Формат, которым разобрано больше всего значений, запоминается
+            # для источника и в следующий раз пробуется первым
+            parsed_by = {}
+            for step_kind, step in steps:
+                todo = result.isna() & values.notna()
+                if not todo.any():
+                    break
+                step(values[todo], result)
+                parsed_by[step_kind] = int(result[todo].notna().sum())
+            todo = result.isna() & values.notna()
+            if todo.any():
+                self._parse_leftovers(values[todo], result)
+
+            if not self.hint and any(parsed_by.values()):
+                _detected_formats[self.source] = max(parsed_by, key=parsed_by.get)
+
+        result.index = index
+        return result, int(result.isna().sum())
+
+    def _parse_epoch(self, values: pd.Series, result: pd.Series):
+        if self.hint == ISO8601:
+            return
+        num = pd.to_numeric(values, errors="coerce")
+        forced = self.hint in (EPOCH_SECONDS, EPOCH_MILLISECONDS)
+        if self.hint == EPOCH_SECONDS:
+            ms = pd.Series(False, index=num.index)
+        elif self.hint == EPOCH_MILLISECONDS:
+            ms = pd.Series(True, index=num.index)
+        else:
+            ms = num.abs() >= EPOCH_MS_MIN
+        plausible = num.notna() & (forced or (num.abs() >= EPOCH_MIN))
+        for mask, unit in ((plausible & ~ms, "s"), (plausible & ms, "ms")):
+            if mask.any():
+                parsed = pd.to_datetime(num[mask], unit=unit, utc=True, errors="coerce")
+                result.loc[parsed.index] = parsed
+
+    def _parse_iso(self, values: pd.Series, result: pd.Series):
+        if self.hint in (EPOCH, EPOCH_SECONDS, EPOCH_MILLISECONDS):
+            return
+        strings = _strings(values)
+        if not len(strings):
+            return
+        # pandas при смеси строк со смещением и без него приписывает наивным
+        # значениям смещение соседей, поэтому разбираем группы раздельно
+        aware = strings.str[-1].isin(("Z", "z"))
+        rest = strings[~aware]
+        if len(rest):
+            aware[rest.index] = rest.str.contains(TZ_SUFFIX, regex=True, na=False)
+        for group in (strings[aware], strings[~aware]):
+            if len(group):
+                result.loc[group.index] = pd.to_datetime(group, format="ISO8601", utc=True, errors="coerce")
+
+    @staticmethod
+    def _parse_leftovers(values: pd.Series, result: pd.Series):
+        # Числа, не похожие на unix-время, поштучно не разбираем: pd.to_datetime
+        # трактует их как наносекунды и даёт 1970 год
+        strings = _strings(values)
+        if not len(strings):
+            return
+        parsed = {v: parse_scalar(v) for v in strings.unique()}
+        result.loc[strings.index] = pd.to_datetime(strings.map(parsed), utc=True)
+
+
+def _strings(values: pd.Series) -> pd.Series:
+    if values.dtype != object:
+        return values.iloc[0:0]
+    if pd.api.types.infer_dtype(values, skipna=True) == "string":
+        return values
+    return values[values.map(type).eq(str)]
@@ -1,127 +1,528 @@
 import pandas as pd
-import json
-import io
+import cProfile
+import hashlib
+import logging
+import os
+import queue
 import requests
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from typing import BinaryIO, Iterator
 from urllib.parse import urlparse
-from django.utils.dateparse import parse_datetime
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
-from items.models import Item
+from items import metrics
+from items.models import ImportRun, Item, SourceState, category_key
+from items.services import (
+    categories, item_cache, parallel, pg_upsert, price_history, readers, replicas, runs, stats, stats_cache,
+)
+from items.services.dates import DateParser
+
+logger = logging.getLogger(__name__)
+
+
+# Размер блока при скачивании и хэшировании источника
+DOWNLOAD_BLOCK = 1024 * 1024
+# Максимальное число имён в одном IN (...) при поиске существующих товаров
+LOOKUP_BATCH_SIZE = 500
+
+COLUMNS = ["name", "category", "price", "updated_at"]
+# Другие названия колонок источника (без учёта регистра), которые _normalize приводит к COLUMNS
+COLUMN_ALIASES = {
+    "title": "name", "product": "name", "item": "name", "item_name": "name",
+    "cat": "category", "group": "category", "type": "category",
+    "cost": "price", "amount": "price", "value": "price",
+    "updated": "updated_at", "updatedat": "updated_at", "last_update": "updated_at", "last_updated": "updated_at",
+}
+
+
+def _known_column(name: str) -> bool:
+    return name in COLUMNS or name.lower() in COLUMN_ALIASES
 
 
 class ItemETLService:
     """
     Сервис отвечает за:
-      - загрузку данных из CSV/JSON (локально или по URL),
+      - загрузку данных из CSV/JSON/NDJSON/Parquet/Arrow, в том числе
+        сжатых gzip/zstd (локально или по URL; см. items.services.readers),
       - нормализацию структуры,
       - идемпотентный импорт в базу.
+
+    Если задан ``chunk_size``, источник читается потоково: CSV — блоками
+    по ``chunk_size`` строк, NDJSON и JSON-массивы — инкрементально,
+    Parquet и Arrow — пакетами записей до ``chunk_size`` строк.
+    Каждый блок нормализуется и импортируется отдельно, поэтому
+    потребление памяти не зависит от размера фида.
+
+    ``date_format`` — подсказка формата updated_at для источника
+    (см. items.services.dates.DateParser).
+
+    Для каждого источника хранится SourceState: ETag/Last-Modified для
+    условного запроса, sha256 содержимого и водяной знак updated_at.
+    Если источник не изменился (304 или тот же хэш), разбор пропускается;
+    строки уже известных товаров старше водяного знака отбрасываются до
+    записи в базу (новые товары с поздно пришедшей старой датой — нет).
+    ``force=True`` игнорирует сохранённое состояние.
+
+    ``workers`` > 1 (по умолчанию ETL_WORKERS) — локальный CSV/NDJSON
+    разбирается и нормализуется диапазонами в пуле процессов
+    (items.services.parallel), блоки уходят на запись по готовности.
+
+    ``import_run`` — ImportRun (items.services.runs): после каждого блока в его
+    транзакции пишется контрольная точка. Если у запуска уже есть
+    закоммиченные блоки того же содержимого, они разбираются, но не
+    записываются повторно. При параллельном разборе блоки приходят в
+    произвольном порядке, поэтому такой запуск продолжается с начала.
     """
 
-    def __init__(self, source: str):
+    def __init__(
+        self,
+        source: str,
+        chunk_size: int | None = None,
+        date_format: str | None = None,
+        force: bool = False,
+        workers: int | None = None,
+        import_run: ImportRun | None = None,
+    ):
         self.source = source
+        self.import_run = import_run
+        self.chunk_size = chunk_size
+        self.force = force
+        self.workers = settings.ETL_WORKERS if workers is None else workers
+        self.date_parser = DateParser(source, date_format)
+        self.invalid_dates = self.total = self.skipped = 0
+        self.max_updated_at = None
+        self.fetch_info = {}
+        self.state = None
+        self.unchanged = None
+        self.cache_invalidations = 0
+        self.bytes_fetched = 0
+        # Формат и сжатие (readers.Feed) и кодировка текста; определяются при открытии источника
+        self.feed = None
+        self.encoding = "utf-8"
+        # Суммарное время по этапам: fetch, parse, normalize, write (секунды);
+        # при параллельном разборе parse/normalize — сумма по воркерам
+        self.timings: dict[str, float] = {}
 
     def run(self) -> dict:
-        df = self._load_to_dataframe()
-        df = self._normalize(df)
-        return self._import_to_db(df)
+        profiler = cProfile.Profile() if settings.ETL_PROFILE_SLOW_SECONDS > 0 else None
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = self._run()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        metrics.observe_etl_run(self.timings, elapsed, self.bytes_fetched, result)
+        logger.info(
+            "%s: import finished in %.2fs (%s), %d rows, %d bytes",
+            self.source, elapsed,
+            ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in self.timings.items()),
+            result["total"], self.bytes_fetched,
+        )
+        if profiler is not None and elapsed >= settings.ETL_PROFILE_SLOW_SECONDS:
+            self._dump_profile(profiler, elapsed)
+        return result
+
+    def _run(self) -> dict:
+        result = {"created": 0, "updated": 0}
+        resume = None
+        for index, df in enumerate(self.extract()):
+            if resume is None:
+                resume = self._resume_point()
+                if resume:
+                    result = {"created": self.import_run.created, "updated": self.import_run.updated}
+                    logger.info("%s: resuming after %d committed chunks", self.source, resume)
+            if index < resume:
+                continue
+            imported = self._import_to_db(df)
+            result["created"] += imported["created"]
+            result["updated"] += imported["updated"]
+        self._save_state(self.state, imported=self.unchanged is None)
 
-    def _load_to_dataframe(self) -> pd.DataFrame:
-        parsed = urlparse(self.source)
-        is_url = parsed.scheme in ("http", "https")
+        if self.unchanged:
+            logger.info("%s: source unchanged (%s), import skipped", self.source, self.unchanged)
+        if self.invalid_dates:
+            logger.warning(
+                "%s: %d rows with missing or unparseable updated_at, current time used instead",
+                self.source, self.invalid_dates,
+            )
+        return {**result, **self.extract_stats(), "cache_invalidations": self.cache_invalidations}
 
-        if is_url:
-            resp = requests.get(self.source, timeout=30)
+    def _resume_point(self) -> int:
+        """Сколько первых блоков уже записано этим запуском (0 — начинать сначала)."""
+        run = self.import_run
+        if run is None or not run.chunks_done:
+            return 0
+        if (not self._parallel and run.chunk_size == self.chunk_size
+                and run.content_hash == self.fetch_info.get("content_hash")):
+            return run.chunks_done
+        runs.reset(run)
+        return 0
+
+    def extract(self) -> Iterator[pd.DataFrame]:
+        """
+        Загрузка и нормализация без записи в базу: отдаёт нормализованные
+        блоки (или один DataFrame без chunk_size), уже отфильтрованные по
+        водяному знаку. Если источник не изменился, не отдаёт ничего.
+        Состояние источника не сохраняется — это делает вызывающий код
+        после успешной записи (_save_state).
+        """
+        self.invalid_dates = self.total = self.skipped = 0
+        self.max_updated_at = None
+        self.state = self._load_state()
+        watermark = None if self.force else self.state.watermark
+
+        with ExitStack() as stack:
+            with self._stage("fetch"):
+                stream = stack.enter_context(self._open_stream(self.state))
+            self.unchanged = self._unchanged_reason(self.state)
+            if self.unchanged:
+                return
+            for df in self._iter_normalized(stream):
+                self.total += len(df)
+                if watermark is not None:
+                    stale = df["updated_at"] < watermark
+                    if stale.any():
+                        stale.loc[stale] = self._existing_mask(df[stale])
+                    self.skipped += int(stale.sum())
+                    df = df[~stale]
+                yield df
+
+    def _iter_normalized(self, stream) -> Iterator[pd.DataFrame]:
+        if self._parallel:
+            yield from self._iter_normalized_parallel()
+            return
+        frames = self._iter_frames(stream)
+        while True:
+            with self._stage("parse"):
+                frame = next(frames, None)
+            if frame is None:
+                return
+            with self._stage("normalize"):
+                df = self._normalize(frame)
+            yield df
+
+    @property
+    def _parallel(self) -> bool:
+        # Диапазоны байтов режутся только в несжатом файле
+        return (self.workers > 1 and not self._is_url and self.feed is not None
+                and self.feed.format in parallel.FORMATS and self.feed.compression is None)
+
+    def _iter_normalized_parallel(self) -> Iterator[pd.DataFrame]:
+        """
+        Диапазоны файла разбираются в пуле процессов; готовые блоки отдаются
+        в порядке завершения (апсерт по updated_at от порядка не зависит).
+        В работе одновременно не больше 2 * workers диапазонов.
+        """
+        # Пул billiard (из Celery): multiprocessing не даёт заводить дочерние
+        # процессы внутри prefork-воркера Celery, billiard — даёт
+        from billiard.pool import Pool
+
+        fmt = self.feed.format
+        head, ranges = parallel.byte_ranges(
+            self.source, self.workers, settings.ETL_PARSE_PARTITION_BYTES, header=fmt == "csv"
+        )
+        done: queue.Queue = queue.Queue()
+        pending = iter(ranges)
+        in_flight = 0
+        with Pool(max(min(self.workers, len(ranges)), 1), initializer=parallel.init_worker) as pool:
+            def submit():
+                nonlocal in_flight
+                part = next(pending, None)
+                if part is not None:
+                    pool.apply_async(
+                        parallel.parse_range, (self.source, fmt, self.date_parser.hint, head, *part),
+                        callback=done.put, error_callback=done.put,
+                    )
+                    in_flight += 1
+
+            for _ in range(2 * self.workers):
+                submit()
+            while in_flight:
+                result = done.get()
+                in_flight -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                submit()
+                df, counters = result
+                self.invalid_dates += counters["invalid_dates"]
+                latest = counters["max_updated_at"]
+                if latest is not None and (self.max_updated_at is None or latest > self.max_updated_at):
+                    self.max_updated_at = latest
+                for stage in ("parse", "normalize"):
+                    self.timings[stage] = self.timings.get(stage, 0.0) + counters[stage]
+                if self.chunk_size:
+                    for start in range(0, len(df), self.chunk_size):
+                        yield df.iloc[start:start + self.chunk_size]
+                else:
+                    yield df
+
+    def _iter_frames(self, stream) -> Iterator[pd.DataFrame]:
+        if self.chunk_size:
+            yield from self._iter_chunks(stream)
+        else:
+            yield self._load_to_dataframe(stream)
+
+    @contextmanager
+    def _stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+    def _dump_profile(self, profiler: cProfile.Profile, elapsed: float):
+        os.makedirs(settings.ETL_PROFILE_DIR, exist_ok=True)
+        name = f"etl-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.prof"
+        path = os.path.join(settings.ETL_PROFILE_DIR, name)
+        profiler.dump_stats(path)
+        logger.warning("%s: slow import (%.1fs), profile saved to %s", self.source, elapsed, path)
+
+    def extract_stats(self) -> dict:
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "invalid_dates": self.invalid_dates,
+            "unchanged": self.unchanged,
+        }
+
+    def _load_state(self) -> SourceState:
+        return SourceState.objects.filter(source=self.source).first() or SourceState(source=self.source)
+
+    def _unchanged_reason(self, state: SourceState) -> str | None:
+        if self.fetch_info.get("not_modified"):
+            return "not_modified"
+        if not self.force and state.content_hash and state.content_hash == self.fetch_info.get("content_hash"):
+            return "same_content"
+        return None
+
+    def _save_state(self, state: SourceState, imported: bool):
+        for field in ("etag", "last_modified", "content_hash"):
+            if field in self.fetch_info:
+                setattr(state, field, self.fetch_info[field])
+        if imported and self.max_updated_at is not None:
+            if state.watermark is None or self.max_updated_at > state.watermark:
+                state.watermark = self.max_updated_at
+        state.save()
+
+    @property
+    def _is_url(self) -> bool:
+        return urlparse(self.source).scheme in ("http", "https")
+
+    def _load_to_dataframe(self, stream: BinaryIO | None = None) -> pd.DataFrame:
+        if stream is None:
+            with self._open_stream() as stream:
+                return self._load_to_dataframe(stream)
+        return next(self._read(stream))
+
+    @contextmanager
+    def _open_stream(self, state: SourceState | None = None) -> Iterator[BinaryIO | None]:
+        """
+        Открывает источник как бинарный поток, считает sha256 содержимого
+        (self.fetch_info["content_hash"], по байтам как есть, до распаковки)
+        и определяет формат и сжатие (self.feed) до начала разбора.
+
+        URL скачивается потоково во временный файл: до ETL_SPOOL_MAX_MEMORY
+        байт в памяти, дальше на диске. С условными заголовками из ``state``
+        сервер может ответить 304 — тогда вместо потока отдаётся None.
+        """
+        self.fetch_info = {}
+        self.feed = None
+        if not self._is_url:
+            with open(self.source, "rb") as f:
+                digest = hashlib.sha256()
+                while block := f.read(DOWNLOAD_BLOCK):
+                    digest.update(block)
+                    self.bytes_fetched += len(block)
+                f.seek(0)
+                self.fetch_info["content_hash"] = digest.hexdigest()
+                self.feed = readers.detect(f, self.source)
+                yield f
+            return
+
+        headers = {}
+        if state is not None and not self.force:
+            if state.etag:
+                headers["If-None-Match"] = state.etag
+            if state.last_modified:
+                headers["If-Modified-Since"] = state.last_modified
+
+        with requests.get(self.source, timeout=30, stream=True, headers=headers) as resp:
+            if resp.status_code == 304:
+                self.fetch_info["not_modified"] = True
+                yield None
+                return
             resp.raise_for_status()
-            if self.source.endswith(".csv"):
-                return pd.read_csv(io.StringIO(resp.text))
-            data = resp.json()
-            return pd.DataFrame(data if isinstance(data, list) else data.get("items", data))
-
-        if self.source.endswith(".csv"):
-            return pd.read_csv(self.source)
-        if self.source.endswith(".json"):
-            with open(self.source, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return pd.DataFrame(data if isinstance(data, list) else data.get("items", data))
-        raise ValueError(f"Unsupported file type: {self.source}")
+            self.fetch_info["etag"] = resp.headers.get("ETag", "")
+            self.fetch_info["last_modified"] = resp.headers.get("Last-Modified", "")
+
+            with tempfile.SpooledTemporaryFile(max_size=settings.ETL_SPOOL_MAX_MEMORY) as spool:
+                digest = hashlib.sha256()
+                # iter_content распаковывает gzip/deflate, если сервер сжал ответ (Content-Encoding);
+                # сжатый файл (.csv.gz, .zst) распаковывается при разборе
+                for block in resp.iter_content(chunk_size=DOWNLOAD_BLOCK):
+                    digest.update(block)
+                    self.bytes_fetched += len(block)
+                    spool.write(block)
+                spool.seek(0)
+                self.fetch_info["content_hash"] = digest.hexdigest()
+                content_type = resp.headers.get("Content-Type", "")
+                self.feed = readers.detect(spool, self.source, content_type)
+                # requests подставляет ISO-8859-1 для text/* без charset — доверяем только явному
+                charset = "charset=" in content_type and resp.encoding
+                self.encoding = charset or "utf-8"
+                yield spool
+
+    def _iter_chunks(self, stream: BinaryIO | None = None) -> Iterator[pd.DataFrame]:
+        if stream is None:
+            with self._open_stream() as stream:
+                yield from self._iter_chunks(stream)
+            return
+        yield from self._read(stream, self.chunk_size)
+
+    def _read(self, stream: BinaryIO, chunk_size: int | None = None) -> Iterator[pd.DataFrame]:
+        # Колоночные форматы читают только колонки, которые знает _normalize
+        return readers.read(self.feed, stream, chunk_size, columns=_known_column, encoding=self.encoding)
+
+    _iter_json_records = staticmethod(readers.iter_json_records)
 
     def _normalize(self, df: pd.DataFrame) -> pd.DataFrame:
-        rename_map = {}
-        for cand in df.columns:
-            cl = cand.lower()
-            if cl in ("title", "product", "item", "item_name"):
-                rename_map[cand] = "name"
-            elif cl in ("cat", "group", "type"):
-                rename_map[cand] = "category"
-            elif cl in ("cost", "amount", "value"):
-                rename_map[cand] = "price"
-            elif cl in ("updated", "updatedat", "last_update", "last_updated"):
-                rename_map[cand] = "updated_at"
+        rename_map = {cand: COLUMN_ALIASES[cand.lower()] for cand in df.columns if cand.lower() in COLUMN_ALIASES}
 
         df = df.rename(columns=rename_map)
-        for col in ["name", "category", "price", "updated_at"]:
+        for col in COLUMNS:
             if col not in df.columns:
                 df[col] = None
 
         df["name"] = df["name"].astype(str)
         df["category"] = df["category"].astype(str)
-        df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0.0)
-        df["updated_at"] = df["updated_at"].apply(self._parse_dt).fillna(pd.Timestamp.utcnow())
-        return df[["name", "category", "price", "updated_at"]]
+        # Округляем как numeric(12, 2) в базе, чтобы агрегаты по категориям сходились с таблицей
+        df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0.0).round(2)
+        updated_at, invalid = self.date_parser.parse(df["updated_at"])
+        self.invalid_dates += invalid
+        # Водяной знак двигают только реально разобранные даты, а не подставленное «сейчас»
+        latest = updated_at.max()
+        if not pd.isna(latest) and (self.max_updated_at is None or latest > self.max_updated_at):
+            self.max_updated_at = latest
+        df["updated_at"] = updated_at.fillna(pd.Timestamp.utcnow())
+        return df[COLUMNS]
 
     @staticmethod
-    def _parse_dt(x):
-        if pd.isna(x):
-            return None
-        if isinstance(x, str):
-            dt = parse_datetime(x)
-            if dt is None:
-                try:
-                    return pd.to_datetime(x, utc=True)
-                except Exception:
-                    return None
-            return dt
-        try:
-            return pd.to_datetime(x, utc=True)
-        except Exception:
-            return None
+    def _existing_mask(df: pd.DataFrame) -> pd.Series:
+        """Какие строки df — уже существующие в базе товары (по ключу name + ключ категории)."""
+        names = df["name"].unique().tolist()
+        known = set()
+        for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+            batch = names[start:start + LOOKUP_BATCH_SIZE]
+            known.update(Item.objects.filter(name__in=batch).values_list("name", "category__key").nocache())
+        return pd.Series(
+            [key in known for key in zip(df["name"], df["category"].map(category_key))], index=df.index,
+        )
+
+    @staticmethod
+    def _load_existing(df: pd.DataFrame) -> dict:
+        """
+        Загружает из базы только товары, чьи имена встречаются в df,
+        а не всю таблицу — объём зависит от размера фида (или блока).
+        """
+        names = df["name"].unique().tolist()
+        existing = {}
+        for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+            batch = names[start:start + LOOKUP_BATCH_SIZE]
+            # nocache: разовые выборки ETL не должны попадать в кэш cacheops
+            qs = Item.objects.filter(name__in=batch).only("id", "name", "category", "price", "updated_at").nocache()
+            for i in qs:
+                existing[(i.name, i.category_id)] = i
+        return existing
 
     def _import_to_db(self, df):
-        # Получаем все существующие товары из базы
-        existing = {
-            (i.name, i.category): i
-            for i in Item.objects.all().only("id", "name", "category", "price", "updated_at")
+        with self._stage("write"):
+            # До транзакции импорта: создание секции блокирует историю цен до коммита
+            price_history.ensure_partitions(df["updated_at"])
+        # cacheops не сбрасывает кэш на каждую пачку: один раз по категориям после коммита
+        with self._stage("write"), transaction.atomic(), item_cache.deferred:
+            category_ids = categories.resolve(df["category"].unique())
+            rows = df.assign(category_id=df["category"].map(category_ids))
+            if connection.vendor == "postgresql" and settings.ETL_PG_UPSERT:
+                # Сырой SQL cacheops не видит: кэш сбрасывается после коммита в _apply_changes
+                changes = pg_upsert.upsert_items(rows)
+            else:
+                changes = self._upsert_orm(rows)
+            self._apply_changes(changes)
+            created = int(changes["created"].sum())
+            if self.import_run is not None:
+                runs.checkpoint(
+                    self.import_run, len(df), created, len(changes) - created,
+                    self.fetch_info.get("content_hash", ""), self.chunk_size,
+                )
+
+        return {
+            "created": created,
+            "updated": len(changes) - created,
+            "total": len(df),
         }
 
+    def _apply_changes(self, changes: pd.DataFrame):
+        """Обновляет производные данные по фактически изменённым строкам (в той же транзакции)."""
+        if changes.empty:
+            return
+        price_history.record(changes)
+        category_ids = changes["category_id"].unique()
+        # CategoryStats ведётся по имени категории
+        names = categories.names(category_ids)
+        stats.apply_deltas(stats.deltas_from_changes(changes.assign(category=changes["category_id"].map(names))))
+        stats_cache.bump_on_commit()
+        replicas.mark_written_on_commit()
+        self.cache_invalidations += item_cache.invalidate_categories_on_commit(category_ids)
+
+    def _upsert_orm(self, df) -> pd.DataFrame:
+        """
+        Fallback для остальных бэкендов: сравнение updated_at на стороне Python.
+        Возвращает изменения в формате pg_upsert.CHANGE_COLUMNS.
+        """
+        # Написания категории, различающиеся регистром, — один товар: берём самую свежую версию
+        df = df.sort_values("updated_at", kind="stable").drop_duplicates(["name", "category_id"], keep="last")
+        # Получаем существующие товары с теми же именами, что и во входных данных
+        existing = self._load_existing(df)
+
         new_items = []
         updated_items = []
+        changes = []
 
         for row in df.to_dict(orient="records"):
-            key = (row["name"], row["category"])
+            key = (row["name"], row["category_id"])
             item = existing.get(key)
 
             if item is None:
                 new_items.append(
                     Item(
                         name=row["name"],
-                        category=row["category"],
+                        category_id=row["category_id"],
                         price=row["price"],
                         updated_at=row["updated_at"],
                     )
                 )
             elif row["updated_at"] > item.updated_at:
+                changes.append(
+                    (item.pk, item.name, item.category_id, row["price"], float(item.price), row["updated_at"], False)
+                )
                 item.price = row["price"]
                 item.updated_at = row["updated_at"]
                 updated_items.append(item)
 
-        with transaction.atomic():
-            if new_items:
-                Item.objects.bulk_create(new_items, batch_size=500)
-            if updated_items:
-                Item.objects.bulk_update(updated_items, ["price", "updated_at"], batch_size=500)
+        if new_items:
+            # id новых строк bulk_create получает через RETURNING (PostgreSQL, SQLite 3.35+)
+            Item.objects.bulk_create(new_items, batch_size=500)
+            changes.extend(
+                (item.pk, item.name, item.category_id, item.price, None, item.updated_at, True) for item in new_items
+            )
+        if updated_items:
+            Item.objects.bulk_update(updated_items, ["price", "updated_at"], batch_size=500)
 
-        return {
-            "created": len(new_items),
-            "updated": len(updated_items),
-            "total": len(df),
-        }
+        return pd.DataFrame(changes, columns=pg_upsert.CHANGE_COLUMNS)
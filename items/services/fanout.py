@@ -0,0 +1,241 @@
+"""
+Параллельный импорт нескольких источников.
+
+Схема (задачи в items/tasks.py):
+  1. extract_source — на каждый источник: загрузка и нормализация,
+     строки раскладываются по партициям по стабильному хешу (name, ключ категории)
+     и пишутся файлами в spool-каталог запуска;
+  2. load_partition — на каждую партицию: файлы всех источников склеиваются,
+     дубликаты схлопываются по самому свежему updated_at, затем обычный апсерт.
+     Разные партиции не пересекаются по ключу, поэтому не конкурируют за строки;
+  3. aggregate — сводный отчёт; состояние источников (SourceState)
+     сохраняется только здесь, после того как все партиции записаны.
+Если какая-то задача упала, chord не доходит до отчёта: spool-каталог
+запуска удаляет обработчик ошибки (discard).
+
+Источники запуска блокируются так же, как одиночный импорт (items.services.runs,
+token — run_id): источник, который уже импортирует другой запуск, схлопывается,
+и владелец перезапустит его после себя. Блокировки снимаются в aggregate
+или обработчиком ошибки (fail_runs); пока идут задачи, их продлевает heartbeat.
+Партиция считается записанной, когда удалены её файлы: после потери воркера
+(acks_late) повтор пропускает уже записанное.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+from pathlib import Path
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+from django.conf import settings
+
+from items.models import ImportRun
+from items.services import runs
+from items.services.etl import ItemETLService
+
+logger = logging.getLogger(__name__)
+
+
+def item_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """Ключ товара, как его видит база: имя и ключ категории (models.category_key)."""
+    return pd.DataFrame({"name": df["name"], "category": df["category"].str.strip().str.casefold()})
+
+
+def load_manifest(manifest: str) -> list[dict]:
+    """
+    Манифест — локальный файл или URL: JSON-список источников (строки или
+    объекты {"source": ..., "date_format": ..., "chunk_size": ...}),
+    JSON-объект {"sources": [...]} или текст по одному источнику в строке.
+    """
+    if urlparse(manifest).scheme in ("http", "https"):
+        response = requests.get(manifest, timeout=30)
+        response.raise_for_status()
+        text = response.text
+    else:
+        text = Path(manifest).read_text(encoding="utf-8")
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    if isinstance(data, dict):
+        data = data.get("sources", [])
+    return normalize_sources(data)
+
+
+def normalize_sources(sources) -> list[dict]:
+    result = []
+    for source in sources:
+        entry = {"source": source} if isinstance(source, str) else dict(source)
+        if entry.get("source") and entry not in result:
+            result.append(entry)
+    return result
+
+
+def resolve_sources(sources=None, manifest: str | None = None) -> list[dict]:
+    """Явный список, иначе манифест, иначе IMPORT_SOURCES / IMPORT_MANIFEST из настроек."""
+    if sources:
+        return normalize_sources(sources)
+    manifest = manifest or settings.IMPORT_MANIFEST
+    if manifest:
+        return load_manifest(manifest)
+    return normalize_sources(settings.IMPORT_SOURCES)
+
+
+def run_dir(run_id: str) -> Path:
+    return Path(settings.ETL_SPOOL_DIR) / run_id
+
+
+def lock_sources(run_id: str, entries: list[dict]) -> list[dict]:
+    """Берёт блокировки источников; возвращает те, что достались запуску (остальные схлопнуты)."""
+    return [entry for entry in entries if runs.start(entry["source"], run_id, entry.get("chunk_size")) is not None]
+
+
+def locked_sources(run_id: str) -> list[str]:
+    return list(
+        ImportRun.objects.filter(task_id=run_id, status=ImportRun.Status.RUNNING).values_list("source", flat=True)
+    )
+
+
+def ensure_locked(run_id: str):
+    """Перед записью: блокировки всех источников запуска всё ещё у него."""
+    for source in locked_sources(run_id):
+        if not runs.refresh(source, run_id):
+            raise runs.LockLost(f"Import lock for {source} is held by another run")
+
+
+def finish_runs(run_id: str, extracts: list[dict]) -> list[dict]:
+    """Закрывает запуски источников и снимает блокировки; возвращает источники, которым заказан перезапуск."""
+    reports = {report["source"]: report for report in extracts}
+    rerun = []
+    for run in ImportRun.objects.filter(task_id=run_id, status=ImportRun.Status.RUNNING):
+        report = reports.get(run.source, {})
+        if report.get("error"):
+            runs.fail(run, report["error"])
+            continue
+        runs.finish(run, {k: v for k, v in report.items() if k not in ("files", "fetch_info", "entry")})
+        if runs.pop_rerun(run.source):
+            rerun.append(report.get("entry", {"source": run.source}))
+    return rerun
+
+
+def fail_runs(run_id: str, exc: BaseException | str):
+    for run in ImportRun.objects.filter(task_id=run_id, status=ImportRun.Status.RUNNING):
+        runs.fail(run, exc)
+
+
+def discard(run_id: str):
+    """Удаляет spool-каталог запуска (после отчёта или после ошибки любой из задач)."""
+    shutil.rmtree(run_dir(run_id), ignore_errors=True)
+
+
+def partition_of(df: pd.DataFrame, partitions: int) -> pd.Series:
+    # hash_pandas_object детерминирован между процессами (в отличие от hash())
+    hashes = pd.util.hash_pandas_object(item_keys(df), index=False)
+    return pd.Series(hashes.to_numpy() % partitions, index=df.index)
+
+
+def _slug(source: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", source).strip("_")[-80:] or "source"
+
+
+def extract_source(run_id: str, entry: dict, index: int, partitions: int) -> dict:
+    """
+    Загружает и нормализует один источник, раскладывая строки по партициям.
+    Ошибка источника не роняет весь запуск: она попадает в отчёт.
+    """
+    source = entry["source"]
+    report = {
+        "source": source, "entry": entry, "total": 0, "skipped": 0, "invalid_dates": 0, "unchanged": None,
+        "files": {},
+    }
+    service = ItemETLService(
+        source,
+        chunk_size=entry.get("chunk_size") or None,
+        date_format=entry.get("date_format"),
+        force=entry.get("force", False),
+    )
+    try:
+        for chunk_no, df in enumerate(service.extract()):
+            if df.empty:
+                continue
+            for partition, part in df.groupby(partition_of(df, partitions), sort=False):
+                path = run_dir(run_id) / f"p{int(partition):03d}" / f"{index:04d}-{_slug(source)}-{chunk_no:05d}.pkl"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                part.to_pickle(path)
+                report["files"].setdefault(str(int(partition)), []).append(str(path))
+    except Exception as exc:
+        logger.exception("%s: extract failed", source)
+        report["error"] = f"{type(exc).__name__}: {exc}"
+        report["files"] = {}
+        return report
+
+    report.update(service.extract_stats())
+    report["fetch_info"] = {k: v for k, v in service.fetch_info.items() if k != "not_modified"}
+    report["max_updated_at"] = service.max_updated_at.isoformat() if service.max_updated_at is not None else None
+    return report
+
+
+def load_partition(partition: int, files: list[str]) -> dict:
+    """Апсерт одной партиции; внутри партиции побеждает самая свежая версия строки."""
+    # Файлов нет — партиция уже записана до потери воркера
+    frames = [pd.read_pickle(path) for path in files if os.path.exists(path)]
+    if not frames:
+        return {"partition": partition, "rows": 0, "created": 0, "updated": 0, "cache_invalidations": 0}
+    df = pd.concat(frames, ignore_index=True)
+    df = df.sort_values("updated_at", kind="stable")
+    df = df[~item_keys(df).duplicated(keep="last")].reset_index(drop=True)
+    service = ItemETLService(f"partition:{partition}")
+    imported = service._import_to_db(df)
+    for path in files:
+        Path(path).unlink(missing_ok=True)
+    return {
+        "partition": partition,
+        "rows": len(df),
+        "created": imported["created"],
+        "updated": imported["updated"],
+        "cache_invalidations": service.cache_invalidations,
+    }
+
+
+def partition_files(extracts: list[dict]) -> dict[int, list[str]]:
+    files: dict[int, list[str]] = {}
+    for report in extracts:
+        for partition, paths in report.get("files", {}).items():
+            files.setdefault(int(partition), []).extend(paths)
+    return dict(sorted(files.items()))
+
+
+def aggregate(run_id: str, extracts: list[dict], loads: list[dict]) -> dict:
+    """Сводный отчёт запуска; сохраняет состояние успешно импортированных источников."""
+    for report in extracts:
+        if report.get("error"):
+            continue
+        service = ItemETLService(report["source"])
+        service.fetch_info = report.get("fetch_info", {})
+        if report.get("max_updated_at"):
+            service.max_updated_at = pd.Timestamp(report["max_updated_at"])
+        service._save_state(service._load_state(), imported=report["unchanged"] is None)
+    discard(run_id)
+    rerun = finish_runs(run_id, extracts)
+
+    sources = [
+        {k: v for k, v in r.items() if k not in ("files", "fetch_info", "max_updated_at", "entry")} for r in extracts
+    ]
+    coalesced = ImportRun.objects.filter(task_id=run_id, status=ImportRun.Status.COALESCED)
+    return {
+        "run_id": run_id,
+        "created": sum(r["created"] for r in loads),
+        "updated": sum(r["updated"] for r in loads),
+        "total": sum(r["total"] for r in extracts),
+        "skipped": sum(r["skipped"] for r in extracts),
+        "invalid_dates": sum(r["invalid_dates"] for r in extracts),
+        "cache_invalidations": sum(r["cache_invalidations"] for r in loads),
+        "failed": [r["source"] for r in extracts if r.get("error")],
+        "coalesced": sorted(coalesced.values_list("source", flat=True)),
+        "rerun": rerun,
+        "sources": sources,
+        "partitions": sorted(loads, key=lambda r: r["partition"]),
+    }
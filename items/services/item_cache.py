@@ -0,0 +1,56 @@
+"""
+Инвалидация кэша cacheops для импорта.
+
+Массовые операции ETL вызывают инвалидацию cacheops на каждый объект
+(bulk_create) или не вызывают вовсе (raw SQL на PostgreSQL). Вместо этого
+запись идёт внутри no_invalidation, а после коммита кэш сбрасывается
+один раз на каждую затронутую категорию: invalidate_dict(Item, {"category_id": c})
+удаляет запросы с category_id=c и запросы без условий на равенство.
+
+Это точно, пока все кэшируемые запросы к Item фильтруют на равенство только
+по category_id. Если в Redis есть схемы с другими полями (например, кто-то
+кэшировал Item.objects.get(name=...)), сбрасывается вся модель — один раз.
+"""
+from cacheops.invalidation import invalidate_dict, invalidate_model, no_invalidation
+from cacheops.conf import settings as cacheops_settings
+from cacheops.redis import redis_client
+from cacheops.sharding import get_prefix
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from items.metrics import ETL_CACHE_INVALIDATIONS
+from items.models import Item
+
+CATEGORY_MODE = "category"
+MODEL_MODE = "model"
+
+deferred = no_invalidation
+
+
+def _category_schemes_only(using: str) -> bool:
+    table = Item._meta.db_table
+    prefix = get_prefix(tables=[table], dbs=[using])
+    for scheme in redis_client.smembers(f"{prefix}schemes:{table}"):
+        fields = {f for f in scheme.decode().split(",") if f}
+        if fields - {"category_id"}:
+            return False
+    return True
+
+
+def invalidate_categories_on_commit(categories, using: str = DEFAULT_DB_ALIAS) -> int:
+    """Планирует сброс кэша после коммита (categories — id); возвращает число инвалидаций."""
+    categories = sorted({int(c) for c in categories})
+    if not categories or not cacheops_settings.CACHEOPS_ENABLED:
+        return 0
+    if _category_schemes_only(using):
+        def invalidate():
+            for category in categories:
+                invalidate_dict(Item, {"category_id": category}, using=using)
+            ETL_CACHE_INVALIDATIONS.labels(CATEGORY_MODE).inc(len(categories))
+        count = len(categories)
+    else:
+        def invalidate():
+            invalidate_model(Item, using=using)
+            ETL_CACHE_INVALIDATIONS.labels(MODEL_MODE).inc()
+        count = 1
+    transaction.on_commit(invalidate, using=using)
+    return count
@@ -0,0 +1,49 @@
+"""
+Блокировки с владельцем в кэше Django.
+
+Блокировка берётся cache.add(key, token, timeout), где token уникален для
+владельца (new_token). Снять (release) или продлить (extend) её может только
+владелец: в Redis сравнение значения и DEL/EXPIRE выполняются одним
+Lua-скриптом, поэтому процесс, чья блокировка истекла, не тронет блокировку
+следующего владельца. Для других бэкендов (LocMem в тестах) — get и затем
+delete/touch, без атомарности.
+"""
+import uuid
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+EXTEND_SCRIPT = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0"
+)
+
+
+def new_token() -> str:
+    return uuid.uuid4().hex
+
+
+def _redis() -> RedisCache | None:
+    # django.core.cache.cache — прокси, isinstance нужно проверять у самого бэкенда
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    return backend if isinstance(backend, RedisCache) else None
+
+
+def _eval(backend: RedisCache, script: str, key: str, token: str, *args) -> bool:
+    key = backend.make_and_validate_key(key)
+    client = backend._cache.get_client(key, write=True)
+    return bool(client.eval(script, 1, key, backend._cache._serializer.dumps(token), *args))
+
+
+def release(key: str, token: str) -> bool:
+    """Снимает блокировку, если она ещё принадлежит token."""
+    if backend := _redis():
+        return _eval(backend, RELEASE_SCRIPT, key, token)
+    return cache.get(key) == token and cache.delete(key)
+
+
+def extend(key: str, token: str, timeout: int) -> bool:
+    """Продлевает блокировку на timeout секунд, если она ещё принадлежит token."""
+    if backend := _redis():
+        return _eval(backend, EXTEND_SCRIPT, key, token, timeout)
+    return cache.get(key) == token and cache.touch(key, timeout)
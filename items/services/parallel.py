@@ -0,0 +1,83 @@
+"""
+Параллельный разбор большого локального CSV/NDJSON.
+
+Файл делится на байтовые диапазоны, выровненные по концам строк
+(byte_ranges); каждый диапазон читается, разбирается pandas и
+нормализуется (ItemETLService._normalize) в отдельном процессе.
+Нормализация построчная, поэтому результат совпадает с последовательным
+разбором тех же строк блоками; CSV-заголовок подставляется в каждый
+диапазон. Предполагается одна запись на строку: CSV с переводами строк
+внутри кавычек так делить нельзя.
+
+Модуль не импортирует модели на верхнем уровне: воркер может быть
+запущен через spawn и поднимает Django сам (init_worker).
+"""
+import io
+import os
+import time
+
+import pandas as pd
+
+from items.services import readers
+
+FORMATS = ("csv", "ndjson")
+
+
+def byte_ranges(path: str, partitions: int, partition_bytes: int, header: bool) -> tuple[bytes, list[tuple[int, int]]]:
+    """
+    Возвращает (строка заголовка, [(начало, конец)]): не меньше ``partitions``
+    диапазонов и не больше ``partition_bytes`` в каждом (с точностью до строки).
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.readline() if header else b""
+        start = f.tell()
+        count = max(partitions, -(-(size - start) // partition_bytes), 1)
+        step = (size - start) / count
+        bounds = [start]
+        for i in range(1, count):
+            f.seek(start + int(i * step))
+            # граница — начало следующей строки; строка целиком остаётся в предыдущем диапазоне
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+        bounds.append(size)
+    return head, [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def init_worker():
+    # При fork всё уже загружено; при spawn/forkserver процесс начинает с нуля
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "itemstats.settings")
+        django.setup()
+
+
+def parse_range(source: str, fmt: str, date_format: str | None, head: bytes, start: int, end: int):
+    """Разбор и нормализация одного диапазона; возвращает (df, счётчики для сервиса)."""
+    from items.services.etl import ItemETLService
+
+    started = time.perf_counter()
+    with open(source, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # Диапазоны режутся по b"\n", который в UTF-8 не встречается внутри символа
+    text = io.StringIO((head + data).decode("utf-8"))
+    # Те же параметры, что у последовательного чтения: типы не угадываются по каждому диапазону отдельно
+    if fmt == "csv":
+        frame = pd.read_csv(text, **readers.CSV_OPTIONS)
+    else:
+        frame = pd.read_json(text, **readers.NDJSON_OPTIONS)
+    parsed = time.perf_counter()
+
+    service = ItemETLService(source, date_format=date_format)
+    df = service._normalize(frame)
+    return df, {
+        "invalid_dates": service.invalid_dates,
+        "max_updated_at": service.max_updated_at,
+        "parse": parsed - started,
+        "normalize": time.perf_counter() - parsed,
+    }
@@ -0,0 +1,76 @@
+"""
+Быстрый путь импорта для PostgreSQL: нормализованный DataFrame заливается
+через COPY во временную staging-таблицу, после чего один
+INSERT ... ON CONFLICT обновляет только записи со свежим updated_at.
+Сравнение идёт на стороне БД, таблица товаров в Python не загружается.
+"""
+import io
+import pandas as pd
+from django.db import connection
+from items.models import Item
+
+STAGE_TABLE = "items_item_stage"
+# Сколько строк отправлять одним COPY, чтобы не сериализовать весь df в один буфер
+COPY_BATCH_SIZE = 100_000
+COLUMNS = ["name", "category_id", "price", "updated_at"]
+# Строки, которые импорт реально вставил или обновил; old_price — цена до обновления
+CHANGE_COLUMNS = ["item_id", "name", "category_id", "price", "old_price", "updated_at", "created"]
+
+
+def upsert_items(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Апсерт по (name, category_id); df — нормализованные строки с колонкой
+    category_id (categories.resolve). Должен вызываться внутри transaction.atomic().
+    Возвращает вставленные и обновлённые строки (колонки CHANGE_COLUMNS).
+    """
+    table = connection.ops.quote_name(Item._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE {STAGE_TABLE} (
+                name varchar(255),
+                category_id bigint,
+                price numeric(12, 2),
+                updated_at timestamptz
+            ) ON COMMIT DROP
+            """
+        )
+        for start in range(0, len(df), COPY_BATCH_SIZE):
+            buf = io.StringIO()
+            df.iloc[start:start + COPY_BATCH_SIZE][COLUMNS].to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cursor.copy_expert(
+                f"COPY {STAGE_TABLE} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf
+            )
+
+        # DISTINCT ON: одна и та же пара (name, category_id) не может обновиться
+        # дважды в одном INSERT ... ON CONFLICT — берём самую свежую версию.
+        # CTE old читает снимок до вставки, так что в нём цены до обновления.
+        # xmax = 0 у строки, которая была вставлена, а не обновлена.
+        cursor.execute(
+            f"""
+            WITH old AS (
+                SELECT t.name, t.category_id, t.price
+                FROM {table} t
+                WHERE (t.name, t.category_id) IN (SELECT name, category_id FROM {STAGE_TABLE})
+            ), upserted AS (
+                INSERT INTO {table} AS t (name, category_id, price, updated_at)
+                SELECT DISTINCT ON (name, category_id) name, category_id, price, updated_at
+                FROM {STAGE_TABLE}
+                ORDER BY name, category_id, updated_at DESC
+                ON CONFLICT (name, category_id) DO UPDATE
+                SET price = EXCLUDED.price, updated_at = EXCLUDED.updated_at
+                WHERE t.updated_at < EXCLUDED.updated_at
+                RETURNING t.id, t.name, t.category_id, t.price, t.updated_at, (t.xmax = 0) AS created
+            )
+            SELECT u.id, u.name, u.category_id, u.price, old.price, u.updated_at, u.created
+            FROM upserted u
+            LEFT JOIN old ON old.name = u.name AND old.category_id = u.category_id
+            """
+        )
+        changes = pd.DataFrame(cursor.fetchall(), columns=CHANGE_COLUMNS)
+        # ON COMMIT DROP не срабатывает, если импорт идёт во внешней транзакции
+        cursor.execute(f"DROP TABLE {STAGE_TABLE}")
+    changes["price"] = changes["price"].astype(float)
+    changes["old_price"] = changes["old_price"].astype(float)
+    return changes
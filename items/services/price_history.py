@@ -0,0 +1,119 @@
+"""
+История цен (PriceHistory): запись изменений из ETL и агрегаты по интервалам.
+
+ETL пишет строку только для новых товаров и для обновлений, где цена
+действительно изменилась (у updated_at без новой цены истории нет).
+На PostgreSQL таблица секционирована по месяцам changed_at: секции
+создаются заранее (ensure_partitions), отдельными короткими транзакциями —
+CREATE TABLE ... PARTITION OF берёт эксклюзивную блокировку родительской
+таблицы до коммита, и внутри транзакции импорта она держала бы чтение истории.
+Запрос с диапазоном по changed_at читает только секции этого диапазона.
+"""
+import io
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+from django.db import IntegrityError, ProgrammingError, connection, transaction
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Trunc
+
+from items.models import PriceHistory
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+BUCKETS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+COLUMNS = ["item_id", "category_id", "price", "changed_at"]
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"{PriceHistory._meta.db_table}_p{year:04d}_{month:02d}"
+
+
+def ensure_partitions(timestamps: "pd.Series"):
+    """Создаёт недостающие месячные секции для этих моментов времени (только PostgreSQL)."""
+    if connection.vendor != "postgresql" or timestamps.empty:
+        return
+    # pandas нужен только ETL: модуль импортируется и в web (aggregate)
+    import pandas as pd
+
+    utc = pd.to_datetime(timestamps, utc=True)
+    months = sorted(set(zip(utc.dt.year, utc.dt.month)))
+    table = connection.ops.quote_name(PriceHistory._meta.db_table)
+    with connection.cursor() as cursor:
+        for year, month in months:
+            name = partition_name(year, month)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is not None:
+                continue
+            start = datetime(year, month, 1, tzinfo=timezone.utc)
+            end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+            try:
+                with transaction.atomic():
+                    cursor.execute(
+                        f"CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(name)} "
+                        f"PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                        [start, end],
+                    )
+            except (IntegrityError, ProgrammingError):
+                # Гонка: ту же секцию одновременно создал другой импорт. Иначе ошибка настоящая
+                # (секция пересекается с чужой, нет прав) и всплывает здесь, а не в COPY импорта
+                cursor.execute("SELECT to_regclass(%s)", [name])
+                if cursor.fetchone()[0] is None:
+                    raise
+
+
+def price_changes(changes: "pd.DataFrame") -> "pd.DataFrame":
+    """Строки изменений ETL (pg_upsert.CHANGE_COLUMNS), которые попадают в историю."""
+    if changes.empty:
+        return changes
+    changed = changes["price"].round(2) != changes["old_price"].round(2)
+    return changes[changes["created"].astype(bool) | changed]
+
+
+def record(changes: "pd.DataFrame") -> int:
+    """Дописывает в историю изменения цен; вызывается в транзакции импорта. Возвращает число строк."""
+    rows = price_changes(changes)
+    if rows.empty:
+        return 0
+    rows = rows.rename(columns={"updated_at": "changed_at"})[COLUMNS]
+    if connection.vendor == "postgresql":
+        # Секции уже созданы (ensure_partitions до транзакции); COPY в родительскую
+        # таблицу раскладывает строки по ним
+        buf = io.StringIO()
+        rows.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        table = connection.ops.quote_name(PriceHistory._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+    else:
+        PriceHistory.objects.bulk_create(
+            [PriceHistory(**row) for row in rows.to_dict(orient="records")], batch_size=500
+        )
+    return len(rows)
+
+
+def aggregate(bucket: str, start: datetime, end: datetime,
+              category_id: int | None = None, item_id: int | None = None) -> list[dict]:
+    """min/avg/max/count цен за каждый интервал bucket в [start, end), по категории или товару."""
+    queryset = PriceHistory.objects.filter(changed_at__gte=start, changed_at__lt=end)
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    if item_id is not None:
+        queryset = queryset.filter(item_id=item_id)
+    rows = (
+        queryset.annotate(bucket=Trunc("changed_at", bucket))
+        .values("bucket")
+        .annotate(count=Count("id"), min=Min("price"), avg=Avg("price"), max=Max("price"))
+        .order_by("bucket")
+    )
+    return [
+        {
+            "bucket": row["bucket"],
+            "count": row["count"],
+            "min": float(row["min"]),
+            "avg": round(float(row["avg"]), 2),
+            "max": float(row["max"]),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,271 @@
+"""
+Форматы фидов ItemETLService: определение формата и сжатия, чтение в DataFrame.
+
+Формат определяется по сигнатуре содержимого (Parquet, Arrow IPC), затем
+по Content-Type ответа, затем по расширению пути; URL без подсказок
+читается как JSON (массив или NDJSON). Сжатие gzip и zstd распознаётся по
+сигнатуре и снимается потоково при чтении, распакованный фид целиком не
+хранится (кроме колоночных форматов: им нужен произвольный доступ).
+
+READERS — функции (бинарный поток, chunk_size, columns, encoding) ->
+DataFrame-блоки: без chunk_size — один DataFrame на весь источник.
+Новый формат — запись в READERS и в таблицы SIGNATURES/CONTENT_TYPES/SUFFIXES.
+``columns`` — фильтр имён колонок: Parquet и Arrow отдают только подходящие
+(Parquet остальные не читает с диска вовсе), текстовые форматы читаются целиком.
+
+Parquet и Arrow читаются через pyarrow, zstd — через zstandard; обе
+зависимости необязательные и нужны только для таких фидов.
+"""
+import gzip
+import importlib
+import io
+import json
+from contextlib import contextmanager
+from itertools import chain, islice
+from typing import BinaryIO, Callable, Iterator, NamedTuple
+from urllib.parse import urlparse
+
+import pandas as pd
+
+# Размер блока, которым читается поток при инкрементальном разборе JSON
+JSON_READ_BLOCK = 64 * 1024
+
+COMPRESSION_SIGNATURES = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+# Arrow IPC: файл начинается с ARROW1, поток — с маркера продолжения сообщения
+ARROW_FILE_SIGNATURE = b"ARROW1"
+SIGNATURES = {b"PAR1": "parquet", ARROW_FILE_SIGNATURE: "arrow", b"\xff\xff\xff\xff": "arrow"}
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/x-jsonlines": "ndjson",
+    "application/json": "json",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+SUFFIXES = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".json": "json",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".arrows": "arrow",
+    ".feather": "arrow",
+}
+# Форматам с метаданными в конце файла нужен произвольный доступ
+RANDOM_ACCESS = ("parquet", "arrow")
+
+Columns = Callable[[str], bool] | None
+
+# Текстовые форматы читаются без угадывания типов: имя "00123" остаётся строкой,
+# как в JSON-массиве, иначе ключ товара зависел бы от формата фида. Цену и дату
+# приводит _normalize. Эти же параметры использует параллельный разбор (parallel)
+CSV_OPTIONS = {"dtype": str}
+NDJSON_OPTIONS = {"lines": True, "convert_dates": False, "dtype": False}
+
+
+class Feed(NamedTuple):
+    format: str
+    compression: str | None = None
+
+
+def _peek(stream: BinaryIO, size: int) -> bytes:
+    position = stream.tell()
+    head = stream.read(size)
+    stream.seek(position)
+    return head
+
+
+def _suffixes(path: str) -> list[str]:
+    name = path.rsplit("/", 1)[-1].lower()
+    return ["." + part for part in name.split(".")[1:]]
+
+
+def detect(stream: BinaryIO, source: str, content_type: str = "") -> Feed:
+    """Формат и сжатие источника; поток остаётся в исходной позиции."""
+    is_url = urlparse(source).scheme in ("http", "https")
+    suffixes = _suffixes(urlparse(source).path if is_url else source)
+    if suffixes and suffixes[-1] in COMPRESSION_SUFFIXES:
+        # Сжатие определяет сигнатура: ответ с .gz в пути сервер мог уже распаковать
+        suffixes = suffixes[:-1]
+    head = _peek(stream, 8)
+    compression = next((c for c, sig in COMPRESSION_SIGNATURES.items() if head.startswith(sig)), None)
+    if compression is not None:
+        position = stream.tell()
+        with decompress(stream, compression) as raw:
+            head = raw.read(8)
+        stream.seek(position)
+
+    fmt = next((f for sig, f in SIGNATURES.items() if head.startswith(sig)), None)
+    fmt = fmt or CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    if fmt is None and suffixes:
+        fmt = SUFFIXES.get(suffixes[-1])
+    if fmt is None and is_url:
+        fmt = "json"
+    if fmt is None:
+        raise ValueError(f"Unsupported file type: {source}")
+    return Feed(fmt, compression)
+
+
+@contextmanager
+def decompress(stream: BinaryIO, compression: str | None) -> Iterator[BinaryIO]:
+    """Распакованный поток поверх ``stream``; сам ``stream`` не закрывается."""
+    if compression is None:
+        yield stream
+    elif compression == "gzip":
+        with gzip.GzipFile(fileobj=stream, mode="rb") as raw:
+            yield raw
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise ValueError("zstd-compressed feeds require the zstandard package") from exc
+        with zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True, closefd=False) as raw:
+            yield raw
+    else:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+
+def read(feed: Feed, stream: BinaryIO, chunk_size: int | None = None, columns: Columns = None,
+         encoding: str = "utf-8") -> Iterator[pd.DataFrame]:
+    """Блоки DataFrame из источника (без chunk_size — один на весь источник)."""
+    with decompress(stream, feed.compression) as raw:
+        if feed.compression is not None and feed.format in RANDOM_ACCESS:
+            raw = io.BytesIO(raw.read())
+        yield from READERS[feed.format](raw, chunk_size, columns, encoding)
+
+
+def read_csv(raw: BinaryIO, chunk_size: int | None, columns: Columns, encoding: str) -> Iterator[pd.DataFrame]:
+    text = io.TextIOWrapper(raw, encoding=encoding)
+    if chunk_size:
+        yield from pd.read_csv(text, chunksize=chunk_size, **CSV_OPTIONS)
+    else:
+        yield pd.read_csv(text, **CSV_OPTIONS)
+
+
+def read_ndjson(raw: BinaryIO, chunk_size: int | None, columns: Columns, encoding: str) -> Iterator[pd.DataFrame]:
+    text = io.TextIOWrapper(raw, encoding=encoding)
+    if chunk_size:
+        yield from pd.read_json(text, chunksize=chunk_size, **NDJSON_OPTIONS)
+    else:
+        yield pd.read_json(text, **NDJSON_OPTIONS)
+
+
+def read_json(raw: BinaryIO, chunk_size: int | None, columns: Columns, encoding: str) -> Iterator[pd.DataFrame]:
+    text = io.TextIOWrapper(raw, encoding=encoding)
+    if chunk_size:
+        records = iter_json_records(text)
+        while batch := list(islice(records, chunk_size)):
+            yield pd.DataFrame(batch)
+    else:
+        data = json.load(text)
+        yield pd.DataFrame(data if isinstance(data, list) else data.get("items", data))
+
+
+def _pyarrow(module: str):
+    try:
+        return importlib.import_module(f"pyarrow.{module}")
+    except ImportError as exc:
+        raise ValueError("Parquet and Arrow feeds require the pyarrow package") from exc
+
+
+def _projection(names: list[str], columns: Columns) -> list[str]:
+    return [name for name in names if columns is None or columns(name)]
+
+
+def read_parquet(raw: BinaryIO, chunk_size: int | None, columns: Columns, encoding: str) -> Iterator[pd.DataFrame]:
+    parquet = _pyarrow("parquet")
+    source = parquet.ParquetFile(raw)
+    names = _projection(source.schema_arrow.names, columns)
+    if chunk_size:
+        for batch in source.iter_batches(batch_size=chunk_size, columns=names):
+            yield batch.to_pandas()
+    else:
+        yield source.read(columns=names).to_pandas()
+
+
+def read_arrow(raw: BinaryIO, chunk_size: int | None, columns: Columns, encoding: str) -> Iterator[pd.DataFrame]:
+    ipc = _pyarrow("ipc")
+    if _peek(raw, len(ARROW_FILE_SIGNATURE)) == ARROW_FILE_SIGNATURE:
+        source = ipc.open_file(raw)
+        batches = (source.get_batch(i) for i in range(source.num_record_batches))
+    else:
+        source = ipc.open_stream(raw)
+        batches = iter(source)
+    names = _projection(source.schema.names, columns)
+    if not chunk_size:
+        yield source.read_all().select(names).to_pandas()
+        return
+    for batch in batches:
+        batch = batch.select(names)
+        for start in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(start, chunk_size).to_pandas()
+
+
+def iter_json_records(stream: io.TextIOBase) -> Iterator[dict]:
+    """
+    Инкрементально разбирает JSON-массив (или NDJSON) из потока.
+    Объект-обёртка вида {"items": [...]} потоково не разбирается
+    и читается целиком.
+    """
+    decoder = json.JSONDecoder()
+    buf = stream.read(JSON_READ_BLOCK).lstrip()
+    if not buf:
+        return
+
+    if buf[0] == "{":
+        first_line, sep, _ = buf.partition("\n")
+        try:
+            first = json.loads(first_line)
+        except ValueError:
+            first = None
+        if not isinstance(first, dict) or not sep or "items" in first:
+            data = json.loads(buf + stream.read())
+            yield from (data.get("items", [data]) if isinstance(data, dict) else data)
+            return
+        # NDJSON: по одному объекту в строке; последняя строка блока может быть обрезана
+        lines = buf.splitlines(keepends=True)
+        if not lines[-1].endswith("\n"):
+            lines[-1] += stream.readline()
+        for line in chain(lines, stream):
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    pos, eof = 1, False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            obj, end = None, None
+        # Значение, упёршееся в конец буфера, могло быть обрезано — дочитываем
+        if end is None or (end >= len(buf) and not eof):
+            if eof:
+                raise ValueError("Malformed JSON array in source")
+            more = stream.read(JSON_READ_BLOCK)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield obj
+        pos = end
+
+
+READERS = {
+    "csv": read_csv,
+    "ndjson": read_ndjson,
+    "json": read_json,
+    "parquet": read_parquet,
+    "arrow": read_arrow,
+}
@@ -0,0 +1,112 @@
+"""
+Чтение из реплики для эндпоинтов, которым не нужна строгая свежесть.
+
+Реплика — необязательный alias "replica" в DATABASES (POSTGRES_REPLICA_HOST),
+выключается REPLICA_READS=0.
+View оборачивает обработку запроса в replica_reads(): на это время
+ReplicaRouter отправляет чтения в реплику, всё остальное (запись, ETL,
+Celery, справочник категорий) идёт в основную базу.
+
+Read-your-writes: запись после коммита ставит в Redis метку — позицию WAL
+основной базы (mark_written_on_commit). Пока реплика не проиграла WAL до
+этой позиции (pg_last_wal_replay_lsn), чтения остаются на основной базе, и
+пересчитанная после импорта статистика не попадёт в кэш со старыми данными
+отстающей реплики; догнавшая реплика снимает метку. Если отставание не
+измерить (реплика недоступна или не standby), метка живёт
+REPLICA_READ_AFTER_WRITE_SECONDS — это и верхняя граница ожидания.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+from items.services import locks
+
+REPLICA = "replica"
+RECENT_WRITE_KEY = "db:recent_write"
+
+_read_alias: contextvars.ContextVar[str | None] = contextvars.ContextVar("read_alias", default=None)
+
+
+def _lsn(position: str) -> int:
+    high, low = position.split("/")
+    return int(high, 16) << 32 | int(low, 16)
+
+
+def wal_position() -> str:
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute("SELECT pg_current_wal_lsn()")
+        return cursor.fetchone()[0]
+
+
+def replay_position() -> str | None:
+    """Докуда реплика проиграла WAL; None — не standby или недоступна."""
+    try:
+        with connections[REPLICA].cursor() as cursor:
+            cursor.execute("SELECT pg_last_wal_replay_lsn()")
+            return cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+
+
+def mark_written():
+    if REPLICA in settings.DATABASES and settings.REPLICA_READ_AFTER_WRITE_SECONDS > 0:
+        # Более поздняя позиция перекрывает прежнюю метку: её тоже нужно дождаться
+        cache.set(RECENT_WRITE_KEY, wal_position(), settings.REPLICA_READ_AFTER_WRITE_SECONDS)
+
+
+def replica_caught_up() -> bool:
+    """Проиграла ли реплика последнюю запись (метку); догнав, снимает её."""
+    written = cache.get(RECENT_WRITE_KEY)
+    if written is None:
+        return True
+    replayed = replay_position()
+    if replayed is None or _lsn(replayed) < _lsn(written):
+        return False
+    # Снимаем только свою метку: более новую запись реплика ещё могла не проиграть
+    locks.release(RECENT_WRITE_KEY, written)
+    return True
+
+
+def mark_written_on_commit():
+    transaction.on_commit(mark_written)
+
+
+def read_alias() -> str:
+    """Откуда читать сейчас: реплика, если она настроена и недавно не было записи."""
+    if REPLICA not in settings.DATABASES or not settings.REPLICA_READS:
+        return DEFAULT_DB_ALIAS
+    if settings.REPLICA_READ_AFTER_WRITE_SECONDS > 0 and not replica_caught_up():
+        return DEFAULT_DB_ALIAS
+    return REPLICA
+
+
+@contextmanager
+def replica_reads():
+    """Чтения внутри блока (и в вызванных из него sync_to_async) идут в read_alias()."""
+    token = _read_alias.set(read_alias())
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def current_alias() -> str:
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != REPLICA
@@ -0,0 +1,153 @@
+"""
+Координация запусков импорта одного источника.
+
+- Блокировка на источник в Redis (cache.add с TTL IMPORT_LOCK_TIMEOUT):
+  значение — task_id запуска. Пока идёт импорт, TTL продлевает фоновый
+  поток (heartbeat) — загрузка и разбор фида одним блоком могут идти
+  дольше TTL; продлить и снять блокировку может только её владелец
+  (items.services.locks). Контрольная точка, обнаружившая, что блокировку
+  забрал другой запуск, откатывает свой блок (LockLost).
+  Повторная доставка той же задачи (воркер упал, acks_late) забирает
+  свою же блокировку, не дожидаясь TTL.
+- Дубликаты схлопываются: запуск, не получивший блокировку, ставит флаг
+  «перезапустить» и завершается (ImportRun со статусом coalesced);
+  владелец после завершения ставит в очередь один повторный запуск,
+  сколько бы дубликатов ни пришло.
+- Контрольные точки (checkpoint) пишутся в транзакции блока, поэтому
+  chunks_done — ровно число закоммиченных блоков.
+"""
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from items.models import ImportRun
+from items.services import locks
+
+logger = logging.getLogger(__name__)
+
+
+class LockLost(RuntimeError):
+    """Блокировку источника забрал другой запуск: продолжать запись нельзя."""
+
+
+def _key(kind: str, source: str) -> str:
+    return f"import:{kind}:{hashlib.sha1(source.encode('utf-8')).hexdigest()}"
+
+
+def acquire(source: str, token: str) -> bool:
+    key = _key("lock", source)
+    return cache.add(key, token, settings.IMPORT_LOCK_TIMEOUT) or cache.get(key) == token
+
+
+def refresh(source: str, token: str) -> bool:
+    """
+    Продлевает свою блокировку (истёкшую, но никем не занятую — берёт снова).
+    False — блокировку держит другой запуск.
+    """
+    key = _key("lock", source)
+    timeout = settings.IMPORT_LOCK_TIMEOUT
+    return locks.extend(key, token, timeout) or cache.add(key, token, timeout)
+
+
+def release(source: str, token: str):
+    locks.release(_key("lock", source), token)
+
+
+@contextmanager
+def heartbeat(sources: list[str], token: str):
+    """Пока выполняется блок, продлевает блокировки источников каждые IMPORT_LOCK_TIMEOUT / 3 секунд."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(settings.IMPORT_LOCK_TIMEOUT / 3):
+            for source in sources:
+                if not refresh(source, token):
+                    logger.warning("%s: import lock was taken over by another run", source)
+
+    thread = threading.Thread(target=beat, name="import-lock-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def pop_rerun(source: str) -> bool:
+    """Был ли запрошен повторный запуск (флаг сбрасывается)."""
+    return cache.delete(_key("rerun", source))
+
+
+def start(source: str, token: str, chunk_size: int | None = None, coalesce: bool = True) -> ImportRun | None:
+    """
+    Берёт блокировку и возвращает запуск для task_id=token (продолжает
+    существующий при повторе). None — источник уже импортируется: с
+    ``coalesce`` владельцу заказывается повторный запуск.
+    """
+    if not acquire(source, token):
+        if coalesce:
+            cache.set(_key("rerun", source), 1, settings.IMPORT_LOCK_TIMEOUT)
+            ImportRun.objects.create(
+                source=source, task_id=token, status=ImportRun.Status.COALESCED, finished_at=timezone.now(),
+            )
+        return None
+    # Под блокировкой других живых запусков этого источника нет: «running» остались от упавших воркеров
+    ImportRun.objects.filter(source=source, status=ImportRun.Status.RUNNING).exclude(task_id=token).update(
+        status=ImportRun.Status.FAILED, error="lost: worker stopped before the run finished",
+        finished_at=timezone.now(),
+    )
+    run = (
+        ImportRun.objects.filter(source=source, task_id=token)
+        .exclude(status=ImportRun.Status.COALESCED).order_by("-id").first()
+    )
+    if run is None:
+        return ImportRun.objects.create(source=source, task_id=token, chunk_size=chunk_size)
+    ImportRun.objects.filter(pk=run.pk).update(
+        status=ImportRun.Status.RUNNING, attempts=F("attempts") + 1, finished_at=None, error="",
+    )
+    run.refresh_from_db()
+    return run
+
+
+def checkpoint(run: ImportRun, rows: int, created: int, updated: int, content_hash: str, chunk_size: int | None):
+    """Отмечает закоммиченный блок; вызывается внутри транзакции его записи."""
+    if not refresh(run.source, run.task_id):
+        # Исключение откатывает транзакцию блока: источник уже пишет другой запуск
+        raise LockLost(f"Import lock for {run.source} is held by another run")
+    run.chunks_done += 1
+    run.rows_done += rows
+    run.created += created
+    run.updated += updated
+    run.content_hash = content_hash
+    run.chunk_size = chunk_size
+    run.save(update_fields=[
+        "chunks_done", "rows_done", "created", "updated", "content_hash", "chunk_size", "heartbeat_at",
+    ])
+
+
+def reset(run: ImportRun):
+    """Контрольная точка не подходит (другое содержимое или блоки) — прогресс заново."""
+    run.chunks_done = run.rows_done = run.created = run.updated = 0
+    run.save(update_fields=["chunks_done", "rows_done", "created", "updated", "heartbeat_at"])
+
+
+def finish(run: ImportRun, result: dict):
+    run.status = ImportRun.Status.SUCCEEDED
+    run.result = result
+    run.finished_at = timezone.now()
+    run.save(update_fields=["status", "result", "finished_at", "heartbeat_at"])
+    release(run.source, run.task_id)
+
+
+def fail(run: ImportRun, exc: BaseException | str):
+    run.status = ImportRun.Status.FAILED
+    run.error = exc if isinstance(exc, str) else f"{type(exc).__name__}: {exc}"
+    run.finished_at = timezone.now()
+    run.save(update_fields=["status", "error", "finished_at", "heartbeat_at"])
+    release(run.source, run.task_id)
@@ -0,0 +1,65 @@
+"""
+Поиск товаров по имени (?search= в ItemFilter).
+
+Совпадение — подстрока без учёта регистра (icontains, в PostgreSQL это
+UPPER(name) LIKE UPPER('%q%')) или, если установлен pg_trgm, нечёткое
+совпадение со словом в имени (word_similarity, переживает опечатки).
+Оба условия идут по GIN-индексу items_item_name_trgm_idx на UPPER(name)
+(миграция 0009). Без pg_trgm (SQLite, PostgreSQL без расширения) остаётся
+только icontains.
+
+Релевантность: сначала имена, начинающиеся с запроса, затем по
+word_similarity (если есть pg_trgm), затем по id.
+"""
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Upper
+
+# Короче трёх символов у запроса нет полноценных триграмм — только подстрока
+MIN_FUZZY_LENGTH = 3
+
+_trigram: dict[str, bool] = {}
+
+
+def trigram_available(using: str) -> bool:
+    """Установлен ли pg_trgm в базе (проверяется один раз на процесс)."""
+    if using not in _trigram:
+        connection = connections[using]
+        available = False
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                available = cursor.fetchone() is not None
+        _trigram[using] = available
+    return _trigram[using]
+
+
+def _fuzzy(queryset, query: str) -> bool:
+    return len(query) >= MIN_FUZZY_LENGTH and trigram_available(queryset.db)
+
+
+def filter_by_name(queryset, query: str):
+    query = query.strip()
+    if not query:
+        return queryset
+    condition = Q(name__icontains=query)
+    if _fuzzy(queryset, query):
+        # То же выражение, что в индексе: UPPER(name); pg_trgm сам не различает регистр
+        queryset = queryset.alias(search_name=Upper("name"))
+        condition |= Q(search_name__trigram_word_similar=query)
+    return queryset.filter(condition)
+
+
+def order_by_relevance(queryset, query: str):
+    query = query.strip()
+    if not query:
+        return queryset
+    queryset = queryset.alias(
+        search_prefix=Case(When(name__istartswith=query, then=Value(0)), default=Value(1), output_field=IntegerField())
+    )
+    if not _fuzzy(queryset, query):
+        return queryset.order_by("search_prefix", "id")
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    queryset = queryset.alias(search_rank=TrigramWordSimilarity(Value(query), Upper("name")))
+    return queryset.order_by("search_prefix", "-search_rank", "id")
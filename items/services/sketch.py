@@ -0,0 +1,143 @@
+"""
+Скетч распределения цен для квантилей (в духе DDSketch).
+
+Цена попадает в логарифмическую корзину с ключом ceil(log_gamma(price)),
+gamma = (1 + a) / (1 - a): любой квантиль восстанавливается с относительной
+ошибкой не больше a. Скетч — это счётчики по корзинам, поэтому два скетча
+складываются, а цену можно вычесть (обновление товара убирает старую цену).
+Цены меньше MIN_VALUE (в том числе нули) считаются в отдельной корзине.
+
+Хранится компактно: отсортированные ключи дельтами + счётчики, zlib.
+Чтение (квантили, гистограмма, from_bytes) — на чистом Python: скетчи читает
+статистика API, и процессу web не нужен numpy; он импортируется только в
+add_many, который вызывает ETL.
+"""
+import bisect
+import itertools
+import math
+import struct
+import zlib
+from collections import Counter
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+MIN_VALUE = 0.01
+ZERO_KEY = -(2 ** 31)
+FORMAT_VERSION = 1
+
+
+def bucket_key(value: float) -> int:
+    if value < MIN_VALUE:
+        return ZERO_KEY
+    return math.ceil(math.log(value) / LOG_GAMMA)
+
+
+def bucket_value(key: int) -> float:
+    """Представитель корзины (gamma^(k-1), gamma^k]: относительная ошибка <= a."""
+    if key == ZERO_KEY:
+        return 0.0
+    return 2 * GAMMA ** key / (GAMMA + 1)
+
+
+def bucket_bounds(key: int) -> tuple[float, float]:
+    if key == ZERO_KEY:
+        return 0.0, MIN_VALUE
+    return GAMMA ** (key - 1), GAMMA ** key
+
+
+class PriceSketch:
+    def __init__(self, buckets: dict[int, int] | None = None):
+        self.buckets = Counter(buckets or {})
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets.values())
+
+    def add(self, value, count: int = 1):
+        key = bucket_key(float(value))
+        self.buckets[key] += count
+        if not self.buckets[key]:
+            del self.buckets[key]
+
+    def remove(self, value, count: int = 1):
+        self.add(value, -count)
+
+    def add_many(self, values, sign: int = 1):
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        keys = np.full(len(values), ZERO_KEY, dtype=np.int64)
+        positive = values >= MIN_VALUE
+        keys[positive] = np.ceil(np.log(values[positive]) / LOG_GAMMA)
+        unique, counts = np.unique(keys, return_counts=True)
+        self.merge(PriceSketch(dict(zip(unique.tolist(), (counts * sign).tolist()))))
+
+    def merge(self, other: "PriceSketch") -> "PriceSketch":
+        for key, count in other.buckets.items():
+            self.buckets[key] += count
+            if not self.buckets[key]:
+                del self.buckets[key]
+        return self
+
+    def quantile(self, q: float) -> float | None:
+        """Квантиль q в [0, 1]; None для пустого скетча."""
+        items = [(k, c) for k, c in sorted(self.buckets.items()) if c > 0]
+        total = sum(c for _, c in items)
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for key, count in items:
+            seen += count
+            if seen > rank:
+                return bucket_value(key)
+        return bucket_value(items[-1][0])
+
+    def histogram(self, bins: int, low: float, high: float) -> list[dict]:
+        """
+        Гистограмма из bins интервалов между low и high (логарифмических,
+        если low > 0). Корзины скетча относятся к интервалу по представителю.
+        """
+        if high <= low:
+            return [{"lower": low, "upper": high, "count": self.count}]
+        # Те же границы, что у numpy.geomspace / numpy.linspace
+        if low >= MIN_VALUE:
+            start, step = math.log10(low), (math.log10(high) - math.log10(low)) / bins
+            edges = [10 ** (start + i * step) for i in range(bins + 1)]
+        else:
+            step = (high - low) / bins
+            edges = [low + i * step for i in range(bins + 1)]
+        edges[0], edges[-1] = low, high
+        counts = [0] * bins
+        for key, count in self.buckets.items():
+            value = min(max(bucket_value(key), low), high)
+            index = min(bisect.bisect_right(edges, value) - 1, bins - 1)
+            counts[max(index, 0)] += count
+        return [
+            {"lower": round(edges[i], 2), "upper": round(edges[i + 1], 2), "count": counts[i]}
+            for i in range(bins)
+        ]
+
+    def to_bytes(self) -> bytes:
+        keys = sorted(k for k, c in self.buckets.items() if c)
+        if not keys:
+            return b""
+        deltas = [keys[0]] + [b - a for a, b in zip(keys, keys[1:])]
+        counts = [self.buckets[k] for k in keys]
+        payload = struct.pack(f"<BI{len(keys)}q{len(keys)}q", FORMAT_VERSION, len(keys), *deltas, *counts)
+        return zlib.compress(payload)
+
+    @classmethod
+    def from_bytes(cls, data) -> "PriceSketch":
+        if not data:
+            return cls()
+        payload = zlib.decompress(bytes(data))
+        version, size = struct.unpack_from("<BI", payload)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported sketch format: {version}")
+        values = struct.unpack_from(f"<{2 * size}q", payload, struct.calcsize("<BI"))
+        keys = list(itertools.accumulate(values[:size]))
+        return cls(dict(zip(keys, values[size:])))
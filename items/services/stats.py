@@ -0,0 +1,221 @@
+"""
+Инкрементальное обслуживание таблицы CategoryStats.
+
+Изменения описываются дельтами по категориям: какие цены добавились
+(новые строки и новые цены обновлённых строк) и какие ушли (старые цены
+обновлённых строк). count и сумма пересчитываются точно; если ушедшая
+цена была минимумом или максимумом категории, экстремумы этой категории
+досчитываются по таблице товаров.
+
+Вместе с агрегатом обновляется скетч цен (items.services.sketch) —
+из него берутся квантили и гистограмма без чтения таблицы товаров.
+
+CategoryStats ведётся по имени категории (Category.name); к товарам
+категории переводятся через карту items.services.categories.
+"""
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+from items.models import CategoryStats, Item
+from items.services import categories
+from items.services.sketch import PriceSketch
+
+CENT = Decimal("0.01")
+
+
+def _dec(value) -> Decimal:
+    return Decimal(str(value)).quantize(CENT)
+
+
+class CategoryDelta:
+    def __init__(self):
+        self.count = 0
+        self.price_sum = Decimal(0)
+        self.added_min = self.added_max = None
+        self.removed_min = self.removed_max = None
+        self.sketch = PriceSketch()
+
+    def add(self, count, price_sum, price_min, price_max, prices=()):
+        self.count += int(count)
+        self.price_sum += _dec(price_sum)
+        self.added_min = _min(self.added_min, _dec(price_min))
+        self.added_max = _max(self.added_max, _dec(price_max))
+        self.sketch.add_many(prices)
+
+    def remove(self, count, price_sum, price_min, price_max, prices=()):
+        self.count -= int(count)
+        self.price_sum -= _dec(price_sum)
+        self.removed_min = _min(self.removed_min, _dec(price_min))
+        self.removed_max = _max(self.removed_max, _dec(price_max))
+        self.sketch.add_many(prices, sign=-1)
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def deltas_from_changes(changes) -> dict[str, CategoryDelta]:
+    """Строит дельты из DataFrame изменений ETL (см. pg_upsert.CHANGE_COLUMNS)."""
+    deltas = {}
+    for category, prices in changes.groupby("category")["price"]:
+        deltas.setdefault(category, CategoryDelta()).add(
+            len(prices), prices.sum(), prices.min(), prices.max(), prices.to_numpy()
+        )
+
+    updated = changes[changes["old_price"].notna()]
+    for category, prices in updated.groupby("category")["old_price"]:
+        deltas.setdefault(category, CategoryDelta()).remove(
+            len(prices), prices.sum(), prices.min(), prices.max(), prices.to_numpy()
+        )
+    return deltas
+
+
+def apply_deltas(deltas: dict[str, CategoryDelta]):
+    if not deltas:
+        return
+    with transaction.atomic():
+        # Строки вставляются и блокируются в порядке категории: параллельные импорты
+        # с одними и теми же категориями ждут друг друга по очереди, без взаимной блокировки
+        CategoryStats.objects.bulk_create(
+            [CategoryStats(category=c) for c in sorted(deltas)], ignore_conflicts=True
+        )
+        # Блокируем строки агрегата: параллельные импорты применяют дельты по очереди
+        rows = list(
+            CategoryStats.objects.filter(category__in=list(deltas)).order_by("category").select_for_update()
+        )
+        stale_extremes = []
+        for row in rows:
+            delta = deltas[row.category]
+            if delta.removed_min is not None and (
+                row.price_min is None or delta.removed_min <= row.price_min or delta.removed_max >= row.price_max
+            ):
+                stale_extremes.append(row.category)
+            row.count += delta.count
+            row.price_sum += delta.price_sum
+            row.price_min = _min(row.price_min, delta.added_min)
+            row.price_max = _max(row.price_max, delta.added_max)
+            row.price_sketch = PriceSketch.from_bytes(row.price_sketch).merge(delta.sketch).to_bytes()
+            if row.count <= 0:
+                row.count, row.price_sum, row.price_min, row.price_max = 0, Decimal(0), None, None
+                row.price_sketch = b""
+        CategoryStats.objects.bulk_update(rows, ["count", "price_sum", "price_min", "price_max", "price_sketch"])
+
+        if stale_extremes:
+            ids = categories.resolve(stale_extremes)
+            extremes = (
+                Item.objects.filter(category_id__in=list(ids.values())).nocache()
+                .values("category_id").annotate(price_min=Min("price"), price_max=Max("price"))
+            )
+            found = {e["category_id"]: e for e in extremes}
+            for category in stale_extremes:
+                e = found.get(ids[category], {})
+                CategoryStats.objects.filter(category=category).update(
+                    price_min=e.get("price_min"), price_max=e.get("price_max")
+                )
+
+
+def compute_from_items() -> dict[str, dict]:
+    """Полный агрегат по таблице товаров (для пересборки и сверки)."""
+    rows = list(
+        Item.objects.nocache().values("category_id")
+        .annotate(count=Count("id"), price_sum=Sum("price"), price_min=Min("price"), price_max=Max("price"))
+        .order_by()
+    )
+    names = categories.names(r["category_id"] for r in rows)
+    return {names[r.pop("category_id")]: r for r in rows}
+
+
+def compute_sketches() -> dict[str, PriceSketch]:
+    """Скетчи цен по таблице товаров; одинаковые цены база схлопывает сама."""
+    sketches = {}
+    rows = Item.objects.nocache().values_list("category_id", "price").annotate(n=Count("id")).order_by()
+    for category_id, price, n in rows.iterator(chunk_size=10_000):
+        sketches.setdefault(category_id, PriceSketch()).add(price, n)
+    names = categories.names(sketches)
+    return {names[category_id]: sketch for category_id, sketch in sketches.items()}
+
+
+def rebuild():
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # Импорты, применяющие дельты, ждут окончания пересборки
+            with connection.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {CategoryStats._meta.db_table} IN EXCLUSIVE MODE")
+        actual = compute_from_items()
+        sketches = compute_sketches()
+        CategoryStats.objects.all().delete()
+        CategoryStats.objects.bulk_create(
+            [
+                CategoryStats(category=c, price_sketch=sketches[c].to_bytes(), **values)
+                for c, values in actual.items()
+            ],
+            batch_size=500,
+        )
+    return len(actual)
+
+
+def verify() -> list[str]:
+    """Возвращает расхождения между CategoryStats и таблицей товаров."""
+    actual = compute_from_items()
+    sketches = compute_sketches()
+    stored = {
+        s.category: s for s in CategoryStats.objects.filter(count__gt=0)
+    }
+    problems = []
+    for category in sorted(set(actual) | set(stored)):
+        expected, row = actual.get(category), stored.get(category)
+        if expected is None or row is None:
+            problems.append(f"{category}: expected={expected}, stored={row and row.count}")
+            continue
+        for field in ("count", "price_sum", "price_min", "price_max"):
+            if expected[field] != getattr(row, field):
+                problems.append(f"{category}.{field}: expected={expected[field]}, stored={getattr(row, field)}")
+        stored_sketch = PriceSketch.from_bytes(row.price_sketch)
+        if stored_sketch.buckets != sketches[category].buckets:
+            problems.append(
+                f"{category}.price_sketch: expected={sketches[category].count} values, stored={stored_sketch.count}"
+            )
+    return problems
+
+
+def average_prices() -> dict[str, float]:
+    return {
+        s.category: float((s.price_sum / s.count).quantize(CENT))
+        for s in CategoryStats.objects.filter(count__gt=0).order_by("category")
+    }
+
+
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def price_distribution(bins: int = 10, category: str | None = None) -> dict[str, dict]:
+    """
+    count/min/max/mean — точные из агрегата, квантили и гистограмма — из скетча
+    (относительная ошибка не больше sketch.RELATIVE_ACCURACY, в пределах [min, max]).
+    """
+    qs = CategoryStats.objects.filter(count__gt=0).order_by("category")
+    if category is not None:
+        pk = categories.lookup(category)
+        if pk is None:
+            return {}
+        qs = qs.filter(category=categories.names([pk])[pk])
+    result = {}
+    for s in qs:
+        sketch = PriceSketch.from_bytes(s.price_sketch)
+        low, high = float(s.price_min), float(s.price_max)
+        data = {
+            "count": s.count,
+            "min": low,
+            "max": high,
+            "mean": float((s.price_sum / s.count).quantize(CENT)),
+        }
+        for name, q in QUANTILES.items():
+            value = sketch.quantile(q)
+            data[name] = None if value is None else round(min(max(value, low), high), 2)
+        data["histogram"] = sketch.histogram(bins, low, high)
+        result[s.category] = data
+    return result
@@ -0,0 +1,232 @@
+"""
+Кэш статистики, привязанный к версии данных.
+
+- Ключи содержат версию ("stats:<name>:v<version>"); импорт после коммита
+  увеличивает версию (bump_on_commit), и новые данные видны сразу, без TTL.
+- При промахе пересчитывает только один процесс (блокировка с владельцем,
+  items.services.locks), остальные получают предыдущее значение
+  (stale-while-revalidate) или недолго ждут, если предыдущего нет.
+- Опциональный L1-кэш в памяти процесса (STATS_L1_CACHE_TTL > 0)
+  сбрасывается той же версией: проверка версии — один маленький GET в Redis.
+
+aget_or_compute — то же для async-view: ключи и формат значений общие
+с синхронной версией, Redis опрашивается через redis.asyncio.
+"""
+import asyncio
+import threading
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache, RedisSerializer
+from django.db import transaction
+
+from items.services import locks
+
+VERSION_KEY = "stats:version"
+# Сколько ждать чужой пересчёт, если отдать нечего, прежде чем считать самим
+LOCK_WAIT = 5.0
+LOCK_POLL_INTERVAL = 0.05
+
+_l1: dict[str, tuple[int, float, object]] = {}
+_l1_lock = threading.Lock()
+
+
+def data_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Версия в миллисекундах: после потери ключа старые значения не совпадут с новыми
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+
+
+def bump_on_commit():
+    """Увеличивает версию после коммита текущей транзакции (сразу, если транзакции нет)."""
+    transaction.on_commit(bump_version)
+
+
+def get_or_compute(name: str, compute, ttl: int | None = None):
+    ttl = settings.STATS_CACHE_TTL if ttl is None else ttl
+    version = data_version()
+
+    value = _l1_get(name, version)
+    if value is not None:
+        return value
+
+    key = f"stats:{name}:v{version}"
+    value = cache.get(key)
+    if value is not None:
+        _l1_set(name, version, value)
+        return value
+
+    lock_key = f"stats:{name}:lock"
+    latest_key = f"stats:{name}:latest"
+    token = locks.new_token()
+    if not cache.add(lock_key, token, settings.STATS_CACHE_LOCK_TIMEOUT):
+        stale = cache.get(latest_key)
+        if stale is not None:
+            return stale[1]
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return compute()
+
+    try:
+        value = compute()
+        cache.set(key, value, ttl)
+        cache.set(latest_key, (version, value), settings.STATS_STALE_TTL)
+    finally:
+        # Пересчёт дольше STATS_CACHE_LOCK_TIMEOUT: блокировка уже чужая, её не трогаем
+        locks.release(lock_key, token)
+    _l1_set(name, version, value)
+    return value
+
+
+def _l1_get(name: str, version: int):
+    if settings.STATS_L1_CACHE_TTL <= 0:
+        return None
+    entry = _l1.get(name)
+    if entry is None or entry[0] != version or entry[1] < time.monotonic():
+        return None
+    return entry[2]
+
+
+def _l1_set(name: str, version: int, value):
+    if settings.STATS_L1_CACHE_TTL <= 0:
+        return
+    with _l1_lock:
+        _l1[name] = (version, time.monotonic() + settings.STATS_L1_CACHE_TTL, value)
+
+
+def clear_l1():
+    with _l1_lock:
+        _l1.clear()
+
+
+class AsyncCache:
+    """
+    Минимальный async-клиент к тому же кэшу, что django.core.cache.cache:
+    ключи строятся cache.make_key, значения сериализуются как в RedisCache.
+    Для бэкендов кроме Redis используются встроенные async-методы Django.
+    """
+
+    def __init__(self):
+        self.redis = None
+        # cache — прокси, isinstance проверяется у самого бэкенда
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], RedisCache):
+            import redis.asyncio
+
+            location = cache._servers[0]
+            self.redis = redis.asyncio.Redis.from_url(location, **cache._options.get("CLIENT_KWARGS", {}))
+            self.serializer = RedisSerializer()
+
+    async def get(self, key):
+        if self.redis is None:
+            return await cache.aget(key)
+        value = await self.redis.get(cache.make_key(key))
+        return None if value is None else self.serializer.loads(value)
+
+    async def set(self, key, value, timeout):
+        if self.redis is None:
+            return await cache.aset(key, value, timeout)
+        await self.redis.set(cache.make_key(key), self.serializer.dumps(value), ex=timeout)
+
+    async def add(self, key, value, timeout) -> bool:
+        if self.redis is None:
+            return await cache.aadd(key, value, timeout)
+        return bool(await self.redis.set(cache.make_key(key), self.serializer.dumps(value), ex=timeout, nx=True))
+
+    async def release(self, key, token) -> bool:
+        """Асинхронный locks.release."""
+        if self.redis is None:
+            return await cache.aget(key) == token and await cache.adelete(key)
+        return bool(await self.redis.eval(
+            locks.RELEASE_SCRIPT, 1, cache.make_key(key), self.serializer.dumps(token),
+        ))
+
+
+# Клиент redis.asyncio привязан к event loop, поэтому свой на каждый loop
+_async_caches: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncCache]" = weakref.WeakKeyDictionary()
+
+
+async def _close_with_loop(client: AsyncCache):
+    # asyncio.run (uvicorn, async_to_sync под WSGI и в тестах) закрывает незавершённые
+    # async-генераторы до закрытия loop: соединения Redis закрываются, пока loop жив
+    try:
+        yield
+    finally:
+        await client.redis.aclose()
+
+
+async def async_cache() -> AsyncCache:
+    loop = asyncio.get_running_loop()
+    client = _async_caches.get(loop)
+    if client is None:
+        client = _async_caches[loop] = AsyncCache()
+        if client.redis is not None:
+            client.lifetime = _close_with_loop(client)
+            await client.lifetime.__anext__()
+    return client
+
+
+async def adata_version() -> int:
+    client = await async_cache()
+    version = await client.get(VERSION_KEY)
+    if version is None:
+        await client.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = await client.get(VERSION_KEY)
+    return version
+
+
+async def aget_or_compute(name: str, compute, ttl: int | None = None):
+    """Async-вариант get_or_compute; compute — синхронная функция (ORM), идёт через sync_to_async."""
+    ttl = settings.STATS_CACHE_TTL if ttl is None else ttl
+    client = await async_cache()
+    version = await adata_version()
+
+    value = _l1_get(name, version)
+    if value is not None:
+        return value
+
+    key = f"stats:{name}:v{version}"
+    value = await client.get(key)
+    if value is not None:
+        _l1_set(name, version, value)
+        return value
+
+    lock_key = f"stats:{name}:lock"
+    latest_key = f"stats:{name}:latest"
+    token = locks.new_token()
+    if not await client.add(lock_key, token, settings.STATS_CACHE_LOCK_TIMEOUT):
+        stale = await client.get(latest_key)
+        if stale is not None:
+            return stale[1]
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value = await client.get(key)
+            if value is not None:
+                return value
+        return await sync_to_async(compute)()
+
+    try:
+        value = await sync_to_async(compute)()
+        await client.set(key, value, ttl)
+        await client.set(latest_key, (version, value), settings.STATS_STALE_TTL)
+    finally:
+        await client.release(lock_key, token)
+    _l1_set(name, version, value)
+    return value
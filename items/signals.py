@@ -0,0 +1,54 @@
+"""
+Поддержка CategoryStats при одиночных сохранениях Item через ORM
+(админка, shell, Item.objects.create). Массовые операции ETL сигналов
+не вызывают и применяют дельты сами (ItemETLService._apply_changes).
+"""
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+from items.models import Item
+from items.services import categories, replicas, stats, stats_cache
+
+
+def _category_name(category_id) -> str:
+    return categories.names([category_id])[category_id]
+
+
+@receiver(pre_save, sender=Item)
+def remember_old_price(sender, instance, raw=False, **kwargs):
+    instance._stats_old = None
+    if instance.pk and not raw:
+        instance._stats_old = (
+            Item.objects.filter(pk=instance.pk).nocache().values_list("category_id", "price").first()
+        )
+
+
+@receiver(post_save, sender=Item)
+def update_category_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    old = getattr(instance, "_stats_old", None)
+    if old is not None:
+        category_id, price = old
+        deltas.setdefault(_category_name(category_id), stats.CategoryDelta()).remove(1, price, price, price, [price])
+    deltas.setdefault(_category_name(instance.category_id), stats.CategoryDelta()).add(
+        1, instance.price, instance.price, instance.price, [instance.price]
+    )
+    stats.apply_deltas(deltas)
+    stats_cache.bump_on_commit()
+    replicas.mark_written_on_commit()
+
+
+@receiver(post_delete, sender=Item)
+def update_category_stats_on_delete(sender, instance, **kwargs):
+    delta = stats.CategoryDelta()
+    delta.remove(1, instance.price, instance.price, instance.price, [instance.price])
+    stats.apply_deltas({_category_name(instance.category_id): delta})
+    stats_cache.bump_on_commit()
+    replicas.mark_written_on_commit()
+
+
+@receiver(post_migrate)
+def reset_category_map(sender, **kwargs):
+    # flush (в том числе между тестами) и миграции меняют id категорий
+    categories.clear()
@@ -1,9 +1,151 @@
-from celery import shared_task
+import uuid
+import redis
+import requests
+from celery import chord, shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings
+from django.db import InterfaceError, OperationalError
+from items.services import fanout, runs
 from items.services.etl import ItemETLService
 
+# Временные сбои, после которых импорт стоит повторить: сеть, база (в том числе
+# взаимная блокировка и lock_timeout — OperationalError), Redis
+TRANSIENT_ERRORS = (
+    requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, OperationalError, InterfaceError,
+    redis.ConnectionError, redis.TimeoutError,
+)
 
-@shared_task(name="items.tasks.import_items_task")
-def import_items_task(source: str | None = None):
-    service = ItemETLService(source or "items/sample_data/sample.csv")
-    result = service.run()
-    return result
+
+def is_transient(exc: BaseException) -> bool:
+    """Повторять ли импорт: ошибки формата, данных и 4xx источника повтором не лечатся."""
+    if isinstance(exc, requests.HTTPError):
+        status = exc.response.status_code if exc.response is not None else None
+        return status is None or status >= 500 or status in (408, 429)
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+@shared_task(
+    bind=True,
+    name="items.tasks.import_items_task",
+    # Повтор после временной ошибки или потери воркера идёт с тем же task_id
+    # и продолжает запуск с контрольной точки
+    acks_late=True,
+    reject_on_worker_lost=True,
+    max_retries=settings.IMPORT_MAX_RETRIES,
+)
+def import_items_task(
+    self,
+    source: str | None = None,
+    chunk_size: int | None = None,
+    date_format: str | None = None,
+    force: bool = False,
+):
+    """
+    Импорт одного источника под блокировкой (items.services.runs).
+    Если источник уже импортируется, запуск схлопывается с текущим:
+    тот по завершении один раз перезапустится.
+    """
+    source = source or "items/sample_data/sample.csv"
+    if chunk_size is None:
+        chunk_size = settings.ETL_CHUNK_SIZE
+    run = runs.start(source, self.request.id or uuid.uuid4().hex, chunk_size or None)
+    if run is None:
+        return {"source": source, "coalesced": True}
+    service = ItemETLService(
+        source,
+        chunk_size=chunk_size or None,
+        date_format=date_format,
+        force=force,
+        import_run=run,
+    )
+    try:
+        with runs.heartbeat([source], run.task_id):
+            result = service.run()
+    except Exception as exc:
+        runs.fail(run, exc)
+        if is_transient(exc):
+            # Как retry_backoff=True: 1, 2, 4... секунд со случайным разбросом, не больше 10 минут
+            countdown = get_exponential_backoff_interval(1, self.request.retries, 600, full_jitter=True)
+            raise self.retry(exc=exc, countdown=countdown)
+        raise
+    runs.finish(run, result)
+    if runs.pop_rerun(source):
+        import_items_task.delay(source, chunk_size, date_format, force)
+    return {**result, "run_id": run.pk}
+
+
+@shared_task(bind=True, name="items.tasks.import_sources_task")
+def import_sources_task(
+    self,
+    sources: list | None = None,
+    manifest: str | None = None,
+    partitions: int | None = None,
+):
+    """
+    Импорт нескольких источников: extract по источникам параллельно,
+    затем chord из апсертов по партициям и сводный отчёт.
+    Источники блокируются, как в import_items_task: уже импортируемые
+    другим запуском схлопываются и перезапускаются его владельцем.
+    """
+    entries = fanout.resolve_sources(sources, manifest)
+    run_id = self.request.id or uuid.uuid4().hex
+    locked = fanout.lock_sources(run_id, entries)
+    if not locked:
+        return {
+            "run_id": None, "created": 0, "updated": 0, "total": 0, "sources": [],
+            "coalesced": [entry["source"] for entry in entries],
+        }
+    entries = locked
+    partitions = partitions or settings.ETL_PARTITIONS
+    workflow = chord(
+        [extract_source_task.s(run_id, entry, index, partitions) for index, entry in enumerate(entries)],
+        load_partitions_task.s(run_id).on_error(discard_import_task.s(run_id)),
+    )
+    return self.replace(workflow)
+
+
+@shared_task(name="items.tasks.extract_source_task", acks_late=True, reject_on_worker_lost=True)
+def extract_source_task(run_id: str, entry: dict, index: int, partitions: int):
+    with runs.heartbeat([entry["source"]], run_id):
+        return fanout.extract_source(run_id, entry, index, partitions)
+
+
+@shared_task(bind=True, name="items.tasks.load_partitions_task")
+def load_partitions_task(self, extracts: list[dict], run_id: str):
+    files = fanout.partition_files(extracts)
+    if not files:
+        return _finish_import(fanout.aggregate(run_id, extracts, []))
+    workflow = chord(
+        [load_partition_task.s(run_id, partition, paths) for partition, paths in files.items()],
+        aggregate_import_task.s(run_id, extracts).on_error(discard_import_task.s(run_id)),
+    )
+    return self.replace(workflow)
+
+
+# Повтор после потери воркера пропускает партицию, если её файлы уже удалены (записана)
+@shared_task(name="items.tasks.load_partition_task", acks_late=True, reject_on_worker_lost=True)
+def load_partition_task(run_id: str, partition: int, files: list[str]):
+    fanout.ensure_locked(run_id)
+    with runs.heartbeat(fanout.locked_sources(run_id), run_id):
+        return fanout.load_partition(partition, files)
+
+
+@shared_task(name="items.tasks.aggregate_import_task")
+def aggregate_import_task(loads: list[dict], run_id: str, extracts: list[dict]):
+    return _finish_import(fanout.aggregate(run_id, extracts, loads))
+
+
+def _finish_import(report: dict) -> dict:
+    if report["rerun"]:
+        import_sources_task.delay(sources=report["rerun"])
+    return report
+
+
+@shared_task(name="items.tasks.discard_import_task")
+def discard_import_task(request, exc, traceback, run_id: str):
+    """
+    Обработчик ошибки chord: упавшая партиция не оставляет файлы запуска
+    в ETL_SPOOL_DIR и блокировки источников.
+    """
+    fanout.discard(run_id)
+    fanout.fail_runs(run_id, exc)
@@ -1,10 +1,23 @@
 import json
+from unittest.mock import ANY
 import pandas as pd
 import pytest
+from django.conf import settings as django_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APIClient
-from items.models import Item
+from items.models import Category, Item
+
+
+def cat(name: str) -> Category:
+    return Category.objects.get_or_create(name=name)[0]
+
+
+@pytest.fixture(autouse=True)
+def replica_reads_only_when_requested(request, settings):
+    # Реплика в тестах — зеркало default; читать из неё можно только тестам, где она есть в databases
+    marker = request.node.get_closest_marker("django_db")
+    settings.REPLICA_READS = marker is not None and "replica" in marker.kwargs.get("databases", ())
 
 @pytest.mark.django_db
 def test_parsing_and_normalization(tmp_path, django_db_blocker):
@@ -19,15 +32,15 @@ def test_parsing_and_normalization(tmp_path, django_db_blocker):
 
     assert Item.objects.count() == 2
     phone = Item.objects.get(name="Phone")
-    assert phone.category == "Electronics"
+    assert phone.category.name == "Electronics"
     assert float(phone.price) == 100.5
 
 
 @pytest.mark.django_db
 def test_avg_price_calculation(client: APIClient):
-    Item.objects.create(name="A", category="Cat1", price=10, updated_at=timezone.now())
-    Item.objects.create(name="B", category="Cat1", price=20, updated_at=timezone.now())
-    Item.objects.create(name="C", category="Cat2", price=30, updated_at=timezone.now())
+    Item.objects.create(name="A", category=cat("Cat1"), price=10, updated_at=timezone.now())
+    Item.objects.create(name="B", category=cat("Cat1"), price=20, updated_at=timezone.now())
+    Item.objects.create(name="C", category=cat("Cat2"), price=30, updated_at=timezone.now())
 
     url = "/api/stats/avg-price-by-category/"
     resp = client.get(url)
@@ -41,9 +54,9 @@ def test_avg_price_calculation(client: APIClient):
 def test_items_filtering_pagination(client: APIClient, settings):
     settings.REST_FRAMEWORK['PAGE_SIZE'] = 2
     for i in range(5):
-        Item.objects.create(name=f"Item{i}", category="Cat", price=i, updated_at=timezone.now())
+        Item.objects.create(name=f"Item{i}", category=cat("Cat"), price=i, updated_at=timezone.now())
     for i in range(3):
-        Item.objects.create(name=f"Gadget{i}", category="Gadgets", price=100+i, updated_at=timezone.now())
+        Item.objects.create(name=f"Gadget{i}", category=cat("Gadgets"), price=100+i, updated_at=timezone.now())
 
     url = "/api/items/?category=Cat&price_min=2&price_max=4"
     resp = client.get(url)
@@ -51,3 +64,777 @@ def test_items_filtering_pagination(client: APIClient, settings):
     data = resp.json()
     assert data["count"] == 3  # items 2,3,4
     assert len(data["results"]) == 2  # page size
+
+
+@pytest.mark.django_db
+def test_chunked_import_reports_same_counts(tmp_path):
+    csv_content = (
+        "title,group,cost,last_update\n"
+        "Phone,Electronics,100.5,2024-01-01T12:00:00Z\n"
+        "Case,Accessories,10,2024-01-02T12:00:00Z\n"
+        "Cable,Accessories,5,2024-01-03T12:00:00Z\n"
+    )
+    p = tmp_path / "feed.csv"
+    p.write_text(csv_content, encoding="utf-8")
+
+    from items.services.etl import ItemETLService
+    result = ItemETLService(str(p), chunk_size=2).run()
+    assert result == {"created": 3, "updated": 0, "total": 3, "skipped": 0, "invalid_dates": 0, "unchanged": None,
+                      "cache_invalidations": ANY}
+
+    p.write_text(csv_content.replace("100.5,2024-01-01", "120,2024-02-01"), encoding="utf-8")
+    result = ItemETLService(str(p), chunk_size=2).run()
+    # Case старше водяного знака (2024-01-03) и отбрасывается до записи в базу
+    assert result == {"created": 0, "updated": 1, "total": 3, "skipped": 1, "invalid_dates": 0, "unchanged": None,
+                      "cache_invalidations": ANY}
+    assert float(Item.objects.get(name="Phone").price) == 120
+
+
+@pytest.mark.django_db
+def test_watermark_keeps_late_arriving_new_items(tmp_path):
+    from items.services.etl import ItemETLService
+
+    p = tmp_path / "feed.csv"
+    p.write_text("name,category,price,updated_at\nPhone,Electronics,100,2024-03-01T00:00:00Z\n", encoding="utf-8")
+    ItemETLService(str(p)).run()
+
+    # Водяной знак — 2024-03-01. Старая строка Phone отбрасывается, а новый товар
+    # с ещё более старой датой (и та же категория в другом написании) создаётся
+    p.write_text(
+        "name,category,price,updated_at\n"
+        "Phone,ELECTRONICS,90,2024-01-01T00:00:00Z\n"
+        "Charger,Electronics,20,2024-01-01T00:00:00Z\n",
+        encoding="utf-8",
+    )
+    result = ItemETLService(str(p)).run()
+    assert (result["created"], result["updated"], result["skipped"]) == (1, 0, 1)
+    assert float(Item.objects.get(name="Phone").price) == 100
+    assert float(Item.objects.get(name="Charger").price) == 20
+
+
+@pytest.mark.django_db
+def test_category_stats_follow_imports(tmp_path):
+    from django.core.management import call_command
+    from items.models import CategoryStats
+    from items.services import stats
+
+    p = tmp_path / "feed.csv"
+    p.write_text(
+        "name,category,price,updated_at\n"
+        "A,Cat1,10,2024-01-01T00:00:00Z\n"
+        "B,Cat1,20,2024-01-01T00:00:00Z\n"
+        "C,Cat2,30,2024-01-01T00:00:00Z\n",
+        encoding="utf-8",
+    )
+    call_command("import_items", "--source", str(p))
+    # B дорожает, A (минимум Cat1) переезжает в новую цену — экстремумы пересчитываются
+    p.write_text(
+        "name,category,price,updated_at\n"
+        "A,Cat1,15,2024-02-01T00:00:00Z\n"
+        "B,Cat1,40,2024-02-01T00:00:00Z\n",
+        encoding="utf-8",
+    )
+    call_command("import_items", "--source", str(p))
+    Item.objects.filter(name="C").delete()
+
+    cat1 = CategoryStats.objects.get(category="Cat1")
+    assert (cat1.count, float(cat1.price_sum), float(cat1.price_min), float(cat1.price_max)) == (2, 55, 15, 40)
+    assert stats.average_prices() == {"Cat1": 27.5}
+    assert stats.verify() == []
+    call_command("rebuild_category_stats", "--verify")
+
+
+@pytest.mark.django_db
+def test_category_stats_rows_locked_in_category_order():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from items.models import CategoryStats
+    from items.services import stats
+
+    deltas = {}
+    for name in ("Zoo", "Apple", "Mid"):
+        deltas.setdefault(name, stats.CategoryDelta()).add(1, 10, 10, 10, [10])
+    with CaptureQueriesContext(connection) as queries:
+        stats.apply_deltas(deltas)
+
+    # Одинаковый порядок вставки и блокировки у параллельных импортов — без взаимных блокировок
+    assert list(CategoryStats.objects.order_by("id").values_list("category", flat=True)) == ["Apple", "Mid", "Zoo"]
+    if connection.features.has_select_for_update:
+        locking = [q["sql"] for q in queries if "FOR UPDATE" in q["sql"]]
+        assert locking and all("ORDER BY" in sql for sql in locking)
+
+
+@pytest.mark.django_db
+def test_new_categories_are_inserted_in_key_order():
+    from items.services import categories
+
+    # Один порядок вставки у всех писателей — партиции fan-out не блокируют друг друга крест-накрест
+    ids = categories.resolve(["Zoo", "apple", "Mid", "ZOO"])
+    assert ids["Zoo"] == ids["ZOO"]
+    assert list(Category.objects.order_by("id").values_list("key", flat=True)) == ["apple", "mid", "zoo"]
+
+
+@pytest.mark.django_db
+def test_categories_match_case_insensitively(tmp_path, client):
+    from items.services import stats
+    from items.services.etl import ItemETLService
+
+    p = tmp_path / "feed.csv"
+    p.write_text(
+        "name,category,price,updated_at\n"
+        "Novel,Books,10,2024-01-01T00:00:00Z\n"
+        "Atlas, books ,30,2024-01-01T00:00:00Z\n"
+        "Novel,BOOKS,20,2024-01-02T00:00:00Z\n"
+        "Phone,Electronics,100,2024-01-01T00:00:00Z\n",
+        encoding="utf-8",
+    )
+    result = ItemETLService(str(p)).run()
+
+    # Написания одной категории — одна строка справочника и один товар Novel (самая свежая версия)
+    assert list(Category.objects.order_by("key").values_list("name", "key")) == [
+        ("Books", "books"), ("Electronics", "electronics"),
+    ]
+    assert (result["created"], result["updated"]) == (3, 0)
+    data = client.get("/api/items/?category=bOOks&ordering=price").json()
+    assert [(r["name"], r["category"], r["price"]) for r in data["results"]] == [
+        ("Novel", "Books", "20.00"), ("Atlas", "Books", "30.00"),
+    ]
+    assert client.get("/api/items/?category=Toys").json()["count"] == 0
+    assert stats.average_prices() == {"Books": 25.0, "Electronics": 100.0}
+    assert list(stats.price_distribution(category="BOOKS")) == ["Books"]
+    assert stats.verify() == []
+
+
+def encode_cursor(data) -> str:
+    import base64
+
+    return base64.urlsafe_b64encode(json.dumps(data).encode("ascii")).decode("ascii")
+
+
+# Курсоры правильного вида, но с подделанными значениями ключа
+TAMPERED_CURSORS = [
+    "?cursor=" + encode_cursor({"v": ["abc"]}),
+    "?cursor=" + encode_cursor({"v": [[1]]}),
+    "?cursor=" + encode_cursor({"v": [10 ** 30]}),
+    "?ordering=price&cursor=" + encode_cursor({"v": ["cheap", "1"]}),
+    "?ordering=price&cursor=" + encode_cursor({"v": ["NaN", "1"]}),
+]
+
+
+@pytest.mark.django_db
+def test_items_cursor_pagination(client: APIClient, settings):
+    settings.REST_FRAMEWORK['PAGE_SIZE'] = 2
+    for i, price in enumerate([5, 1, 3, 3, 2]):
+        Item.objects.create(name=f"Item{i}", category=cat("Cat"), price=price, updated_at=timezone.now())
+
+    # Проходим все страницы вперёд по (price, id), затем одну назад
+    url, names = "/api/items/?pagination=cursor&ordering=price", []
+    pages = []
+    while url:
+        data = client.get(url).json()
+        assert "count" not in data
+        names += [r["name"] for r in data["results"]]
+        pages.append(data)
+        url = data["next"]
+    assert names == ["Item1", "Item4", "Item2", "Item3", "Item0"]
+
+    back = client.get(pages[-1]["previous"]).json()
+    assert [r["name"] for r in back["results"]] == ["Item2", "Item3"]
+
+    assert client.get("/api/items/?cursor=garbage").status_code == 404
+    for query in TAMPERED_CURSORS:
+        resp = client.get("/api/items/" + query)
+        assert (resp.status_code, resp.json()) == (404, {"detail": "Invalid cursor"}), query
+
+
+@pytest.mark.django_db
+def test_items_estimated_count(client: APIClient):
+    for i in range(3):
+        Item.objects.create(name=f"Item{i}", category=cat("Cat"), price=i, updated_at=timezone.now())
+    data = client.get("/api/items/?count=estimate").json()
+    # На маленьких выборках оценка заменяется точным COUNT(*)
+    assert data["count"] == 3
+    assert data["count_estimated"] is True
+
+
+@pytest.mark.django_db
+def test_items_fast_serialization_matches_serializer(client: APIClient, settings):
+    Item.objects.create(name="A", category=cat("Cat"), price="10.5", updated_at="2024-01-01T12:00:00Z")
+    Item.objects.create(name="B", category=cat("Cat"), price=3, updated_at="2024-01-01T12:00:00.123456+03:00")
+
+    settings.ITEMS_FAST_SERIALIZATION = True
+    fast = client.get("/api/items/?ordering=price").json()
+    settings.ITEMS_FAST_SERIALIZATION = False
+    slow = client.get("/api/items/?ordering=price").json()
+
+    assert fast == slow
+    assert fast["results"][0]["price"] == "3.00"
+    assert fast["results"][1]["updated_at"] == "2024-01-01T12:00:00Z"
+
+
+@pytest.mark.django_db
+def test_items_export_streams_filtered_rows(client, settings):
+    import csv
+    import gzip
+    settings.EXPORT_CHUNK_SIZE = 2
+    for i in range(5):
+        Item.objects.create(name=f"Item{i}", category=cat("Cat"), price=i, updated_at=timezone.now())
+    Item.objects.create(name="Other", category=cat("Gadgets"), price=1, updated_at=timezone.now())
+
+    resp = client.get("/api/items/export/?category=cat&price_min=1")
+    assert resp.streaming
+    lines = b"".join(resp.streaming_content).decode().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["Item1", "Item2", "Item3", "Item4"]
+
+    resp = client.get("/api/items/export/?format=csv&gzip=1&category=Gadgets")
+    assert resp["Content-Encoding"] == "gzip"
+    rows = list(csv.reader(gzip.decompress(b"".join(resp.streaming_content)).decode().splitlines()))
+    assert rows[0] == ["id", "name", "category", "price", "updated_at"]
+    assert rows[1][1:4] == ["Other", "Gadgets", "1.00"]
+
+    assert client.get("/api/items/export/?format=xml").status_code == 400
+
+
+@pytest.mark.django_db
+def test_import_skips_unchanged_sources(tmp_path):
+    from unittest.mock import MagicMock, patch
+    from items.models import SourceState
+    from items.services.etl import ItemETLService
+
+    p = tmp_path / "feed.csv"
+    p.write_text("name,category,price,updated_at\nA,Cat,1,2024-01-01T00:00:00Z\n", encoding="utf-8")
+    ItemETLService(str(p)).run()
+    # Тот же файл — тот же хэш, разбор не запускается
+    with patch.object(ItemETLService, "_load_to_dataframe") as load:
+        assert ItemETLService(str(p)).run()["unchanged"] == "same_content"
+        load.assert_not_called()
+
+    # URL: сохранённый ETag уходит в If-None-Match, на 304 ничего не разбирается
+    url = "https://example.com/items.csv"
+    SourceState.objects.create(source=url, etag='"v1"')
+    resp = MagicMock(status_code=304)
+    with patch("items.services.etl.requests.get") as get:
+        get.return_value.__enter__.return_value = resp
+        result = ItemETLService(url).run()
+    assert result["unchanged"] == "not_modified"
+    assert get.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+
+
+@pytest.mark.django_db
+def test_fanout_import_merges_sources(tmp_path, settings):
+    from itemstats.celery import app
+    from items.models import SourceState
+    from items.tasks import import_sources_task
+
+    settings.ETL_SPOOL_DIR = str(tmp_path / "spool")
+    a = tmp_path / "a.csv"
+    a.write_text(
+        "title,group,cost,last_update\n"
+        "Phone,Electronics,100,2024-01-01T12:00:00Z\n"
+        "Case,Accessories,10,2024-01-01T12:00:00Z\n",
+        encoding="utf-8",
+    )
+    b = tmp_path / "b.ndjson"
+    b.write_text(
+        '{"name": "Phone", "category": "Electronics", "price": 90, "updated_at": "2024-02-01T12:00:00Z"}\n'
+        '{"name": "Cable", "category": "Accessories", "price": 5, "updated_at": "2024-02-01T12:00:00Z"}\n',
+        encoding="utf-8",
+    )
+    manifest = tmp_path / "sources.txt"
+    manifest.write_text(f"# feeds\n{a}\n{b}\n{tmp_path / 'missing.csv'}\n", encoding="utf-8")
+
+    app.conf.task_always_eager = True
+    try:
+        report = import_sources_task.apply(kwargs={"manifest": str(manifest), "partitions": 3}).get()
+    finally:
+        app.conf.task_always_eager = False
+
+    assert report["created"] == 3
+    assert report["total"] == 4
+    assert report["failed"] == [str(tmp_path / "missing.csv")]
+    assert float(Item.objects.get(name="Phone").price) == 90
+    assert SourceState.objects.filter(source__in=[str(a), str(b)]).count() == 2
+    assert not (tmp_path / "spool" / report["run_id"]).exists()
+
+
+@pytest.mark.django_db
+def test_fanout_import_failure_removes_spool(tmp_path, settings):
+    from unittest.mock import patch
+    from itemstats.celery import app
+    from items.models import ImportRun
+    from items.services import runs
+    from items.tasks import import_sources_task
+
+    settings.ETL_SPOOL_DIR = str(tmp_path / "spool")
+    feed = tmp_path / "a.csv"
+    feed.write_text("title,group,cost,last_update\nPhone,Electronics,100,2024-01-01T12:00:00Z\n", encoding="utf-8")
+
+    app.conf.task_always_eager = True
+    try:
+        with patch("items.services.fanout.load_partition", side_effect=RuntimeError("db down")):
+            with pytest.raises(RuntimeError):
+                import_sources_task.apply(kwargs={"sources": [str(feed)]}, throw=True).get()
+    finally:
+        app.conf.task_always_eager = False
+
+    # Партиции успели записаться в spool, но отчёта не было: каталог удалил обработчик ошибки
+    assert list((tmp_path / "spool").iterdir()) == []
+    # ...он же закрыл запуск источника и снял блокировку
+    assert ImportRun.objects.get(source=str(feed)).status == ImportRun.Status.FAILED
+    assert runs.acquire(str(feed), "next")
+
+
+@pytest.mark.django_db
+def test_fanout_import_locks_and_coalesces_sources(tmp_path, settings):
+    from unittest.mock import patch
+    from itemstats.celery import app
+    from items.models import ImportRun
+    from items.services import fanout, runs
+    from items.tasks import import_sources_task
+
+    settings.ETL_SPOOL_DIR = str(tmp_path / "spool")
+    busy, free = tmp_path / "busy.csv", tmp_path / "free.csv"
+    for path, name in ((busy, "Phone"), (free, "Case")):
+        path.write_text(f"title,group,cost,last_update\n{name},Electronics,100,2024-01-01T12:00:00Z\n", encoding="utf-8")
+    extract = fanout.extract_source
+
+    def extract_with_duplicate(run_id, entry, index, partitions):
+        # Пока источник импортируется, Beat ставит его ещё раз
+        assert runs.start(entry["source"], "duplicate") is None
+        return extract(run_id, entry, index, partitions)
+
+    # Источник уже импортирует одиночная задача: fan-out его не трогает
+    assert runs.acquire(str(busy), "single")
+    app.conf.task_always_eager = True
+    try:
+        with patch("items.services.fanout.extract_source", side_effect=extract_with_duplicate), \
+                patch.object(import_sources_task, "delay") as rerun:
+            report = import_sources_task.apply(kwargs={"sources": [str(busy), str(free)]}).get()
+    finally:
+        app.conf.task_always_eager = False
+
+    assert report["coalesced"] == [str(busy)]
+    assert report["rerun"] == [{"source": str(free)}]
+    assert [s["source"] for s in report["sources"]] == [str(free)]
+    assert list(Item.objects.values_list("name", flat=True)) == ["Case"]
+    # Дубликат во время extract — один перезапуск после владельца
+    rerun.assert_called_once_with(sources=[{"source": str(free)}])
+    statuses = ImportRun.objects.filter(source=str(free)).values_list("status", flat=True)
+    assert sorted(statuses) == ["coalesced", "succeeded"]
+    assert ImportRun.objects.get(source=str(busy), task_id=report["run_id"]).status == ImportRun.Status.COALESCED
+    assert runs.acquire(str(free), "next") and not runs.acquire(str(busy), "next")
+    runs.release(str(busy), "single")
+
+
+def test_import_lock_heartbeat_and_owner_checks(settings):
+    import time
+    from django.core.cache import cache
+    from items.services import runs
+
+    settings.IMPORT_LOCK_TIMEOUT = 1
+    source = "heartbeat.csv"
+    cache.delete(runs._key("lock", source))
+    assert runs.acquire(source, "owner")
+    # Разбор одним блоком дольше TTL: блокировку держит фоновый поток
+    with runs.heartbeat([source], "owner"):
+        time.sleep(2.5)
+        assert not runs.acquire(source, "other")
+    # Чужой запуск не продлевает и не снимает блокировку владельца
+    assert not runs.refresh(source, "other")
+    runs.release(source, "other")
+    assert cache.get(runs._key("lock", source)) == "owner"
+    runs.release(source, "owner")
+    assert runs.acquire(source, "other")
+    runs.release(source, "other")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_avg_price_cache_follows_imports(tmp_path, client):
+    from django.core.cache import cache
+    from django.core.management import call_command
+
+    cache.clear()
+    p = tmp_path / "items.csv"
+    p.write_text("title,group,cost,last_update\nPhone,Electronics,100,2024-01-01T12:00:00Z\n", encoding="utf-8")
+    call_command("import_items", "--source", str(p))
+    assert client.get("/api/stats/avg-price-by-category/").json() == {"Electronics": 100.0}
+
+    # Кэш сбрасывается коммитом импорта, а не TTL
+    p.write_text("title,group,cost,last_update\nPhone,Electronics,50,2024-02-01T12:00:00Z\n", encoding="utf-8")
+    call_command("import_items", "--source", str(p))
+    assert client.get("/api/stats/avg-price-by-category/").json() == {"Electronics": 50.0}
+
+
+def test_stats_cache_serves_stale_while_recomputing(settings):
+    from django.core.cache import cache
+    from items.services import stats_cache
+
+    settings.STATS_L1_CACHE_TTL = 0
+    cache.clear()
+    assert stats_cache.get_or_compute("probe", lambda: {"v": 1}) == {"v": 1}
+
+    stats_cache.bump_version()
+    # Другой процесс уже пересчитывает: получаем прежнее значение без пересчёта
+    cache.add("stats:probe:lock", 1, 30)
+    assert stats_cache.get_or_compute("probe", lambda: {"v": 2}) == {"v": 1}
+
+    cache.delete("stats:probe:lock")
+    assert stats_cache.get_or_compute("probe", lambda: {"v": 2}) == {"v": 2}
+
+
+def test_stats_cache_keeps_lock_taken_over_during_compute(settings):
+    import asyncio
+    from django.core.cache import cache
+    from items.services import stats_cache
+
+    settings.STATS_L1_CACHE_TTL = 0
+    cache.clear()
+
+    def slow_compute():
+        # Пересчёт дольше STATS_CACHE_LOCK_TIMEOUT: блокировка истекла, её взял другой процесс
+        cache.delete("stats:probe:lock")
+        cache.add("stats:probe:lock", "other", 30)
+        return {"v": 1}
+
+    assert stats_cache.get_or_compute("probe", slow_compute) == {"v": 1}
+    assert cache.get("stats:probe:lock") == "other"
+
+    cache.clear()
+    assert asyncio.run(stats_cache.aget_or_compute("probe", slow_compute)) == {"v": 1}
+    assert cache.get("stats:probe:lock") == "other"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_keeps_unrelated_category_pages_cached(tmp_path, client):
+    from cacheops import invalidate_all
+    from cacheops.conf import settings as cacheops_settings
+    from django.db import connection
+
+    if not cacheops_settings.CACHEOPS_ENABLED:
+        pytest.skip("cacheops disabled")
+    invalidate_all()
+    Item.objects.create(name="Phone", category=cat("Electronics"), price=100, updated_at="2024-01-01T00:00:00Z")
+    Item.objects.create(name="Novel", category=cat("Books"), price=10, updated_at="2024-01-01T00:00:00Z")
+    assert client.get("/api/items/?category=books").json()["results"][0]["price"] == "10.00"
+    assert client.get("/api/items/?category=Electronics").json()["results"][0]["price"] == "100.00"
+
+    # В обход ORM, чтобы cacheops об изменении не узнал
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE items_item SET price = 11 WHERE name = 'Novel'")
+
+    p = tmp_path / "feed.csv"
+    p.write_text("title,group,cost,last_update\nPhone,Electronics,90,2024-02-01T00:00:00Z\n", encoding="utf-8")
+    from items.services.etl import ItemETLService
+    result = ItemETLService(str(p)).run()
+    assert result["cache_invalidations"] == 1
+
+    assert client.get("/api/items/?category=Electronics").json()["results"][0]["price"] == "90.00"
+    # Страница Books не сброшена: отдаётся из кэша со старой ценой
+    assert client.get("/api/items/?category=books").json()["results"][0]["price"] == "10.00"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pg_upsert_import_invalidates_cached_list(tmp_path, client, settings):
+    from cacheops import invalidate_all
+    from cacheops.conf import settings as cacheops_settings
+    from django.db import connection
+    from items.services.etl import ItemETLService
+
+    if connection.vendor != "postgresql" or not cacheops_settings.CACHEOPS_ENABLED:
+        pytest.skip("COPY + ON CONFLICT upsert with cacheops only")
+    settings.ETL_PG_UPSERT = True
+    invalidate_all()
+    Item.objects.create(name="Phone", category=cat("Electronics"), price=100, updated_at="2024-01-01T00:00:00Z")
+    assert [r["price"] for r in client.get("/api/items/").json()["results"]] == ["100.00"]
+    assert client.get("/api/items/?price_min=50").json()["count"] == 1
+
+    # Запись идёт сырым SQL: без сброса после коммита список отдавался бы из кэша до истечения TTL
+    p = tmp_path / "feed.csv"
+    p.write_text(
+        "title,group,cost,last_update\n"
+        "Phone,Electronics,40,2024-02-01T00:00:00Z\nNovel,Books,60,2024-02-01T00:00:00Z\n",
+        encoding="utf-8",
+    )
+    ItemETLService(str(p)).run()
+
+    assert {r["name"]: r["price"] for r in client.get("/api/items/").json()["results"]} == {
+        "Phone": "40.00", "Novel": "60.00",
+    }
+    assert [r["name"] for r in client.get("/api/items/?price_min=50").json()["results"]] == ["Novel"]
+
+
+@pytest.mark.django_db
+def test_price_stats_follow_imports(tmp_path, client):
+    from django.core.management import call_command
+    from items.services import stats
+
+    p = tmp_path / "feed.csv"
+    p.write_text(
+        "title,group,cost,last_update\n"
+        "A,Books,5,2024-01-01T00:00:00Z\nB,Books,10,2024-01-01T00:00:00Z\nC,Books,20,2024-01-01T00:00:00Z\n",
+        encoding="utf-8",
+    )
+    call_command("import_items", "--source", str(p))
+    p.write_text("title,group,cost,last_update\nC,Books,40,2024-02-01T00:00:00Z\n", encoding="utf-8")
+    call_command("import_items", "--source", str(p))
+    Item.objects.create(name="D", category=cat("Books"), price=100, updated_at=timezone.now())
+
+    data = client.get("/api/stats/prices-by-category/?category=books&bins=4").json()["Books"]
+    assert (data["count"], data["min"], data["max"], data["mean"]) == (4, 5.0, 100.0, 38.75)
+    assert data["p50"] == pytest.approx(10, rel=0.01)
+    assert data["p99"] == pytest.approx(40, rel=0.01)
+    assert sum(b["count"] for b in data["histogram"]) == 4
+    assert stats.verify() == []
+    assert client.get("/api/stats/prices-by-category/?bins=0").status_code == 400
+
+
+@pytest.mark.django_db
+def test_async_endpoints_match_sync(client, settings):
+    settings.REST_FRAMEWORK['PAGE_SIZE'] = 2
+    for i in range(5):
+        Item.objects.create(name=f"Item{i}", category=cat("Cat"), price=i + 0.5, updated_at=timezone.now())
+    Item.objects.create(name="Other", category=cat("Dog"), price=7, updated_at=timezone.now())
+
+    def assert_same(query):
+        sync_resp = client.get("/api/items/" + query)
+        async_resp = client.get("/api/async/items/" + query)
+        assert async_resp.status_code == sync_resp.status_code
+        # ссылки next/previous отличаются только префиксом пути
+        assert json.loads(async_resp.content.replace(b"/api/async/", b"/api/")) == sync_resp.json()
+        return sync_resp.json()
+
+    for query in (
+        "?category=cat&price_min=1&page=2", "?ordering=price", "?price_min=x",
+        "?count=estimate&page=2", "?pagination=cursor&count=estimate", "?cursor=bad", *TAMPERED_CURSORS,
+    ):
+        assert_same(query)
+    assert client.get("/api/async/items/" + TAMPERED_CURSORS[0]).status_code == 404
+    assert client.get("/api/async/items/?page=9").status_code == 404
+
+    # Обход курсором вперёд и назад по ссылкам, которые отдаёт async-view
+    page = assert_same("?pagination=cursor&ordering=price&category=cat")
+    seen = [r["name"] for r in page["results"]]
+    while page["next"]:
+        page = assert_same("?" + page["next"].split("?", 1)[1])
+        seen += [r["name"] for r in page["results"]]
+    assert seen == [f"Item{i}" for i in range(5)]
+    page = assert_same("?" + page["previous"].split("?", 1)[1])
+    assert [r["name"] for r in page["results"]] == ["Item2", "Item3"]
+
+    for path in ("stats/avg-price-by-category/", "stats/prices-by-category/?bins=3"):
+        assert client.get("/api/async/" + path).json() == client.get("/api/" + path).json()
+
+
+@pytest.mark.django_db
+def test_search_by_name_ranks_prefix_matches_first(client, settings):
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'PAGE_SIZE': 10}
+    now = timezone.now()
+    Item.objects.create(name="Speaker Blue", category=cat("Audio"), price=30, updated_at=now)
+    Item.objects.create(name="Bluetooth Speaker", category=cat("Audio"), price=50, updated_at=now)
+    Item.objects.create(name="blue cable", category=cat("Cables"), price=5, updated_at=now)
+    Item.objects.create(name="Red Cable", category=cat("Cables"), price=4, updated_at=now)
+
+    names = lambda query: [r["name"] for r in client.get(f"/api/items/?{query}").json()["results"]]
+    assert names("search=BLUE") == ["Bluetooth Speaker", "blue cable", "Speaker Blue"]
+    assert names("search=blue&category=audio&price_max=40") == ["Speaker Blue"]
+    assert names("search=blue&ordering=price") == ["blue cable", "Speaker Blue", "Bluetooth Speaker"]
+    assert names("search=cable&pagination=cursor") == ["blue cable", "Red Cable"]
+    assert names("search=%20") == names("")
+
+
+@pytest.mark.django_db
+def test_price_history_records_changes_and_buckets(tmp_path, client):
+    from django.core.management import call_command
+    from django.db import connection
+    from items.models import PriceHistory
+    from items.services import price_history
+
+    p = tmp_path / "feed.csv"
+    p.write_text(
+        "title,group,cost,last_update\n"
+        "A,Books,10,2024-01-30T10:00:00Z\nB,Books,20,2024-01-30T12:00:00Z\nC,Toys,5,2024-01-31T00:00:00Z\n",
+        encoding="utf-8",
+    )
+    call_command("import_items", "--source", str(p))
+    # У B новая дата без новой цены — в историю не попадает
+    p.write_text(
+        "title,group,cost,last_update\nA,Books,12,2024-02-01T09:00:00Z\nB,Books,20,2024-02-01T10:00:00Z\n",
+        encoding="utf-8",
+    )
+    call_command("import_items", "--source", str(p))
+    assert PriceHistory.objects.count() == 4
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s), to_regclass(%s)",
+                           [price_history.partition_name(2024, 1), price_history.partition_name(2024, 2)])
+            assert None not in cursor.fetchone()
+
+    url = "/api/stats/price-history/?start=2024-01-29&end=2024-02-03"
+    assert client.get(url + "&category=books").json() == [
+        {"bucket": "2024-01-30T00:00:00Z", "count": 2, "min": 10.0, "avg": 15.0, "max": 20.0},
+        {"bucket": "2024-02-01T00:00:00Z", "count": 1, "min": 12.0, "avg": 12.0, "max": 12.0},
+    ]
+    item = Item.objects.get(name="A").pk
+    assert [row["max"] for row in client.get(url + f"&item={item}&bucket=hour").json()] == [10.0, 12.0]
+    assert client.get(url + "&category=unknown").json() == []
+    assert client.get(url + "&bucket=year").status_code == 400
+    assert client.get("/api/stats/price-history/?start=2020-01-01&bucket=hour").status_code == 400
+    assert client.get(url + "&item=²").status_code == 400
+
+
+@pytest.mark.django_db
+def test_price_history_partition_ddl_errors_surface():
+    from django.db import DatabaseError, connection
+    from items.services import price_history
+
+    if connection.vendor != "postgresql":
+        pytest.skip("partitions are PostgreSQL-only")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE items_pricehistory_manual PARTITION OF items_pricehistory "
+            "FOR VALUES FROM ('2031-01-15') TO ('2031-02-15')"
+        )
+    # Секция января 2031 пересекается с созданной вручную: это не гонка, ошибку не глотаем
+    with pytest.raises(DatabaseError):
+        price_history.ensure_partitions(pd.Series(pd.to_datetime(["2031-01-02T00:00:00Z"])))
+    price_history.ensure_partitions(pd.Series(pd.to_datetime(["2031-03-02T00:00:00Z"])))
+
+
+@pytest.mark.django_db
+def test_import_task_resumes_from_checkpoint_and_coalesces(tmp_path, client, settings):
+    from unittest.mock import patch
+    from django.db import OperationalError
+    from itemstats.celery import app
+    from items.models import ImportRun
+    from items.services import runs
+    from items.services.etl import ItemETLService
+    from items.tasks import import_items_task
+
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'PAGE_SIZE': 10}
+    p = tmp_path / "feed.csv"
+    p.write_text(
+        "title,group,cost,last_update\n"
+        + "".join(f"I{i},Books,{i + 1},2024-01-01T00:00:00Z\n" for i in range(6)),
+        encoding="utf-8",
+    )
+    source = str(p)
+    original = ItemETLService._import_to_db
+    calls = []
+
+    def flaky(service, df):
+        calls.append(list(df["name"]))
+        if len(calls) == 2:
+            raise OperationalError("connection lost")
+        return original(service, df)
+
+    app.conf.task_always_eager = True
+    try:
+        # Второй блок падает; повтор задачи (тот же task_id) не пишет первый блок заново
+        with patch.object(ItemETLService, "_import_to_db", flaky):
+            result = import_items_task.apply(args=[source, 2], task_id="import-1").get()
+        assert calls == [["I0", "I1"], ["I2", "I3"], ["I2", "I3"], ["I4", "I5"]]
+        assert (result["created"], result["total"]) == (6, 6)
+        assert Item.objects.count() == 6
+
+        # Пока источник занят, новый запуск схлопывается и заказывает один перезапуск
+        assert runs.acquire(source, "other")
+        assert import_items_task.apply(args=[source, 2]).get() == {"source": source, "coalesced": True}
+        runs.release(source, "other")
+        assert runs.pop_rerun(source) and not runs.pop_rerun(source)
+    finally:
+        app.conf.task_always_eager = False
+
+    data = client.get("/api/imports/", {"source": source}).json()["results"]
+    assert [run["status"] for run in data] == ["coalesced", "succeeded"]
+    run = data[1]
+    assert (run["attempts"], run["chunks_done"], run["rows_done"], run["created"]) == (2, 3, 6, 6)
+    assert run["result"]["total"] == 6
+    assert client.get(f"/api/imports/{run['id']}/").json()["task_id"] == "import-1"
+    assert ImportRun.objects.filter(status=ImportRun.Status.RUNNING).count() == 0
+
+
+@pytest.mark.django_db
+def test_import_task_fails_fast_on_permanent_errors(tmp_path):
+    import requests
+    from unittest.mock import patch
+    from itemstats.celery import app
+    from items.models import ImportRun
+    from items.services.etl import ItemETLService
+    from items.tasks import import_items_task, is_transient
+
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.HTTPError(response=response)
+
+    assert not is_transient(http_error(404)) and not is_transient(ValueError("Unsupported file type"))
+    assert is_transient(http_error(503)) and is_transient(http_error(429))
+    assert is_transient(requests.ConnectionError())
+
+    # Неподдерживаемый формат повтором не лечится: одна попытка, ошибка сразу в ImportRun
+    feed = tmp_path / "feed.txt"
+    feed.write_text("name\n", encoding="utf-8")
+    app.conf.task_always_eager = True
+    try:
+        with patch.object(ItemETLService, "run", autospec=True, side_effect=ItemETLService.run) as run:
+            with pytest.raises(ValueError):
+                import_items_task.apply(args=[str(feed)], task_id="permanent-1", throw=True).get()
+    finally:
+        app.conf.task_always_eager = False
+    assert run.call_count == 1
+    record = ImportRun.objects.get(task_id="permanent-1")
+    assert (record.status, record.attempts) == (ImportRun.Status.FAILED, 1)
+    assert record.error.startswith("ValueError: Unsupported file type")
+
+
+# transaction=True: зеркало в тестах — отдельное соединение и не видит незакоммиченные данные
+@pytest.mark.django_db(
+    transaction=True, databases=["default", "replica"] if "replica" in django_settings.DATABASES else ["default"],
+)
+def test_read_endpoints_use_replica_except_after_writes(client, settings):
+    from django.core.cache import cache
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+    from unittest.mock import patch
+    from items.services import replicas, stats_cache
+
+    if "replica" not in connections:
+        assert replicas.read_alias() == "default"
+        pytest.skip("POSTGRES_REPLICA_HOST is not set")
+    settings.REPLICA_READ_AFTER_WRITE_SECONDS = 60
+    # Ответы из кэша в базу не ходят вовсе
+    settings.CACHEOPS_ENABLED = False
+    Item.objects.create(name="Novel", category=cat("Books"), price=10, updated_at=timezone.now())
+    stats_cache.bump_version()
+    cache.delete(replicas.RECENT_WRITE_KEY)
+
+    def queries(path):
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica"]) as replica:
+            resp = client.get(path)
+            body = b"".join(resp.streaming_content) if resp.streaming else resp.content
+        assert resp.status_code == 200 and (b"Novel" in body or b"Books" in body), path
+        # Проверка отставания реплики — не чтение данных
+        return len(primary), len([q for q in replica if "pg_last_wal_replay_lsn" not in q["sql"]])
+
+    for path in ("/api/items/", "/api/stats/avg-price-by-category/", "/api/items/export/"):
+        primary, replica = queries(path)
+        assert replica > 0 and primary == 0, path
+    with replicas.replica_reads():
+        assert Item.objects.all().db == "replica"
+        # Запись — всегда в основную базу
+        assert Item.objects.filter(name="Novel").update(price=11) == 1
+
+    # Сразу после импорта читаем из основной базы
+    replicas.mark_written()
+    primary, replica = queries("/api/items/")
+    assert primary > 0 and replica == 0
+
+    # Окно определяется отставанием реплики: пока она не проиграла запись — основная база,
+    # догнала — снова реплика, и метка снята
+    written = cache.get(replicas.RECENT_WRITE_KEY)
+    with patch.object(replicas, "replay_position", return_value="0/0"):
+        assert queries("/api/items/")[1] == 0
+    with patch.object(replicas, "replay_position", return_value=written):
+        assert queries("/api/items/")[1] > 0
+    assert cache.get(replicas.RECENT_WRITE_KEY) is None
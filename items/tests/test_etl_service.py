@@ -1,5 +1,6 @@
 import io
 import json
+import os
 import pandas as pd
 import pytest
 from unittest.mock import patch, MagicMock
@@ -29,6 +30,23 @@ def json_data(tmp_path):
     return str(file_path)
 
 
+FEED_ROWS = 3_000
+
+
+def generated_feed(tmp_path, fmt, **kwargs):
+    """Синтетический фид benchmarks.generate: одинаковое содержимое в любом формате."""
+    from benchmarks import generate
+
+    return generate.generate(tmp_path / f"feed.{fmt}", FEED_ROWS, fmt, seed=7, **kwargs)
+
+
+@pytest.fixture
+def dated_rows():
+    """Маска строк с разобранной датой: невалидные даты заменяются текущим временем — их не сравниваем."""
+    started = pd.Timestamp.now(tz="UTC")
+    return lambda df: df["updated_at"] < started
+
+
 def test_load_local_csv(csv_data):
     service = ItemETLService(csv_data)
     df = service._load_to_dataframe()
@@ -83,3 +101,263 @@ def test_import_to_db_creates_and_updates(mock_item):
     assert set(result.keys()) == {"created", "updated", "total"}
     assert result["total"] == 2
 
+
+def test_iter_chunks_csv(csv_data):
+    service = ItemETLService(csv_data, chunk_size=1)
+    chunks = list(service._iter_chunks())
+    assert [len(c) for c in chunks] == [1, 1]
+    assert chunks[1].iloc[0]["title"] == "Case"
+
+
+def test_iter_chunks_json_array(json_data):
+    # JSON-массив разбирается инкрементально, блоками по chunk_size записей
+    service = ItemETLService(json_data, chunk_size=1)
+    chunks = list(service._iter_chunks())
+    assert [c.iloc[0]["name"] for c in chunks] == ["Laptop", "Mouse"]
+
+
+def test_iter_json_records_across_read_blocks():
+    records = [{"name": f"Item{i}", "price": i} for i in range(5000)]
+    stream = io.StringIO(json.dumps(records))
+    assert list(ItemETLService._iter_json_records(stream)) == records
+
+    ndjson = io.StringIO("\n".join(json.dumps(r) for r in records) + "\n")
+    assert list(ItemETLService._iter_json_records(ndjson)) == records
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("chunk_size", [None, 1])
+def test_numeric_looking_names_keep_text_in_every_format(tmp_path, chunk_size):
+    from items.models import Item
+
+    record = {"name": "00123", "category": "0042", "price": 1, "updated_at": "2024-01-01T00:00:00Z"}
+    (tmp_path / "a.ndjson").write_text(json.dumps(record) + "\n", encoding="utf-8")
+    (tmp_path / "b.json").write_text(json.dumps([{**record, "updated_at": "2024-01-02T00:00:00Z"}]), encoding="utf-8")
+    (tmp_path / "c.csv").write_text("name,category,price,updated_at\n00123,0042,3,2024-01-03T00:00:00Z\n",
+                                    encoding="utf-8")
+    results = [ItemETLService(str(tmp_path / f), chunk_size=chunk_size).run() for f in ("a.ndjson", "b.json", "c.csv")]
+
+    # Один и тот же товар в любом формате: создаётся один раз и дважды обновляется
+    assert [(r["created"], r["updated"]) for r in results] == [(1, 0), (0, 1), (0, 1)]
+    item = Item.objects.get()
+    assert (item.name, item.category.name, float(item.price)) == ("00123", "0042", 3.0)
+
+
+@pytest.mark.django_db
+def test_import_to_db_upsert_counts():
+    from items.models import Category, Item
+    Item.objects.create(name="Phone", category=Category.objects.create(name="Electronics"), price=90, updated_at=pd.Timestamp("2024-01-02T00:00:00Z"))
+    Item.objects.create(name="Case", category=Category.objects.create(name="Accessories"), price=10, updated_at=pd.Timestamp("2024-01-02T00:00:00Z"))
+
+    df = pd.DataFrame([
+        # свежее — обновится
+        {"name": "Phone", "category": "Electronics", "price": 100.0, "updated_at": pd.Timestamp("2024-01-03T00:00:00Z")},
+        # старее существующего — пропускается
+        {"name": "Case", "category": "Accessories", "price": 5.0, "updated_at": pd.Timestamp("2024-01-01T00:00:00Z")},
+        {"name": "Mouse", "category": "Accessories", "price": 25.0, "updated_at": pd.Timestamp("2024-01-01T00:00:00Z")},
+    ])
+    result = ItemETLService("dummy_source")._import_to_db(df)
+
+    assert result == {"created": 1, "updated": 1, "total": 3}
+    assert float(Item.objects.get(name="Phone").price) == 100.0
+    assert float(Item.objects.get(name="Case").price) == 10.0
+
+
+def test_date_parser_matches_scalar_parsing():
+    from items.services.dates import DateParser, parse_scalar
+
+    values = pd.Series([
+        "2024-01-01T12:00:00Z",
+        "2024-01-01T12:00:00+03:00",
+        "2024-01-01 12:00:00",          # наивное — считается UTC
+        "2024-01-01T12:00:00.123456-05:30",
+        "2024-01-01",
+        "garbage",
+        None,
+    ], dtype=object)
+    parsed, invalid = DateParser("test").parse(values)
+
+    for got, expected in zip(parsed, values.map(parse_scalar)):
+        assert (pd.isna(got) and pd.isna(expected)) or got == expected
+    assert invalid == 2
+
+
+def test_date_parser_epoch_seconds_and_millis():
+    from items.services.dates import DateParser
+
+    parsed, invalid = DateParser("epoch").parse(pd.Series([1704110400, 1704110400000, "1704110400"], dtype=object))
+    assert invalid == 0
+    assert (parsed == pd.Timestamp("2024-01-01T12:00:00Z")).all()
+
+
+def test_normalize_counts_invalid_dates():
+    df = pd.DataFrame({"name": ["A", "B"], "category": ["C", "C"], "price": [1, 2], "updated_at": ["2024-01-01", "n/a"]})
+    service = ItemETLService("dummy_source")
+    normalized = service._normalize(df)
+    assert service.invalid_dates == 1
+    assert normalized["updated_at"].notna().all()
+
+
+def test_price_sketch_quantiles_merge_and_roundtrip():
+    import numpy as np
+    from items.services.sketch import RELATIVE_ACCURACY, PriceSketch
+
+    prices = np.random.default_rng(0).lognormal(4, 1, 20_000).round(2)
+    sketch = PriceSketch()
+    sketch.add_many(prices[:10_000])
+    other = PriceSketch()
+    other.add_many(prices[10_000:])
+    sketch.merge(other)
+    for q in (0.5, 0.9, 0.99):
+        exact = np.quantile(prices, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= exact * RELATIVE_ACCURACY * 1.01
+
+    restored = PriceSketch.from_bytes(sketch.to_bytes())
+    assert restored.buckets == sketch.buckets
+    restored.add_many(prices[10_000:], sign=-1)
+    assert restored.count == 10_000
+
+
+@pytest.mark.django_db
+def test_run_records_stage_metrics(csv_data, settings, tmp_path):
+    from prometheus_client import REGISTRY
+
+    settings.ETL_PROFILE_SLOW_SECONDS = 1e-9
+    settings.ETL_PROFILE_DIR = str(tmp_path)
+    before = REGISTRY.get_sample_value("items_etl_stage_seconds_count", {"stage": "normalize"}) or 0
+
+    service = ItemETLService(csv_data)
+    service.run()
+
+    assert set(service.timings) == {"fetch", "parse", "normalize", "write"}
+    assert service.bytes_fetched == os.path.getsize(csv_data)
+    assert REGISTRY.get_sample_value("items_etl_stage_seconds_count", {"stage": "normalize"}) == before + 1
+    assert REGISTRY.get_sample_value("items_etl_peak_rss_bytes") > 0
+    assert list(tmp_path.glob("etl-*.prof"))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "json", "ndjson"])
+def test_benchmark_feed_is_deterministic_and_normalizes(tmp_path, fmt):
+    from benchmarks import generate
+
+    first = generate.generate(tmp_path / f"a.{fmt}", 2_000, fmt, seed=7)
+    second = generate.generate(tmp_path / f"b.{fmt}", 2_000, fmt, seed=7)
+    assert first.read_bytes() == second.read_bytes()
+
+    service = ItemETLService(str(first))
+    df = service._normalize(service._load_to_dataframe())
+    assert len(df) == 2_000
+    assert df["name"].str.startswith("item-").all()
+    assert df["category"].str.startswith("cat-").all()
+    # Мусорные даты генератор подмешивает в 0.1% строк; остальные форматы должны разбираться
+    assert service.invalid_dates <= 10
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fmt", ["csv.gz", "json.gz", "ndjson.zst", "parquet", "arrow"])
+def test_compressed_and_columnar_feeds_match_csv(tmp_path, dated_rows, fmt):
+    from benchmarks import generate
+    from items.models import Item
+
+    if fmt.endswith(".zst"):
+        pytest.importorskip("zstandard")
+    if fmt in generate.COLUMNAR:
+        pytest.importorskip("pyarrow")
+    csv_path = generated_feed(tmp_path, "csv", extra_columns=2)
+    path = generated_feed(tmp_path, fmt, extra_columns=2)
+    if fmt in generate.COLUMNAR:
+        # Колоночные форматы узнаются по сигнатуре, расширение не нужно
+        path = path.rename(tmp_path / "feed.bin")
+
+    def load(source):
+        service = ItemETLService(str(source))
+        raw = service._load_to_dataframe()
+        return raw, service._normalize(raw)
+
+    raw, df = load(path)
+    _, expected = load(csv_path)
+    valid = dated_rows(expected)
+    pd.testing.assert_frame_equal(df[valid], expected[valid])
+    if fmt in generate.COLUMNAR:
+        assert not any(c.startswith("description") for c in raw.columns)
+
+    result = ItemETLService(str(path), chunk_size=700).run()
+    assert result["total"] == FEED_ROWS
+    assert Item.objects.count() == len(expected.drop_duplicates(["name", "category"]))
+
+
+def test_detect_feed_format():
+    import gzip
+    from items.services.readers import Feed, detect
+
+    assert detect(io.BytesIO(b"name,price\n"), "https://example.com/export", "text/csv; charset=utf-8") == Feed("csv")
+    ndjson = io.BytesIO(gzip.compress(b'{"name": "A"}\n'))
+    assert detect(ndjson, "https://example.com/feed.ndjson.gz") == Feed("ndjson", "gzip")
+    assert ndjson.tell() == 0
+    # Сервер уже распаковал ответ: .gz в пути, но содержимое без сжатия
+    assert detect(io.BytesIO(b"name\n"), "https://example.com/feed.csv.gz") == Feed("csv")
+    assert detect(io.BytesIO(b"[]"), "https://example.com/api/items") == Feed("json")
+    with pytest.raises(ValueError):
+        detect(io.BytesIO(b"name\n"), "/data/feed.txt")
+
+
+def test_byte_ranges_split_on_line_boundaries(tmp_path):
+    from items.services import parallel
+
+    path = tmp_path / "items.csv"
+    path.write_text("name,category,price,updated_at\n" + "".join(f"item-{i},cat,1.0,2024-01-01\n" for i in range(100)))
+    head, ranges = parallel.byte_ranges(str(path), 3, 500, header=True)
+    data = path.read_bytes()
+    assert head == b"name,category,price,updated_at\n"
+    assert len(ranges) >= 3
+    assert ranges[0][0] == len(head) and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[end - 1:end] == b"\n"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_parallel_extract_matches_serial(tmp_path, settings, dated_rows, fmt):
+    settings.ETL_PARSE_PARTITION_BYTES = 20_000
+    path = str(generated_feed(tmp_path, fmt))
+
+    def extract(workers):
+        service = ItemETLService(path, workers=workers)
+        df = pd.concat(list(service.extract()), ignore_index=True)
+        df = df[dated_rows(df)]
+        return service, df.sort_values(["name", "category", "price", "updated_at"], ignore_index=True)
+
+    serial, expected = extract(1)
+    parallel, actual = extract(3)
+    pd.testing.assert_frame_equal(actual, expected)
+    assert parallel.total == serial.total == FEED_ROWS
+    assert parallel.invalid_dates == serial.invalid_dates
+    assert parallel.max_updated_at == serial.max_updated_at
+    assert parallel.timings["parse"] > 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_parallel_extract_keeps_numeric_looking_names(tmp_path, settings, fmt):
+    # Диапазоны из одних «числовых» имён и из обычных: типы не должны угадываться по диапазону
+    settings.ETL_PARSE_PARTITION_BYTES = 2_000
+    records = [
+        {"name": f"{i:05d}" if i < 100 else f"item-{i}", "category": "0042", "price": 1.5,
+         "updated_at": "2024-01-01T00:00:00Z"}
+        for i in range(200)
+    ]
+    path = tmp_path / f"feed.{fmt}"
+    if fmt == "csv":
+        pd.DataFrame(records).to_csv(path, index=False)
+    else:
+        path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+    def extract(workers):
+        df = pd.concat(list(ItemETLService(str(path), workers=workers).extract()), ignore_index=True)
+        # Диапазоны отдаются по мере готовности
+        return df.sort_values("name", ignore_index=True)
+
+    expected, actual = extract(1), extract(3)
+    pd.testing.assert_frame_equal(actual, expected)
+    assert actual["name"].tolist() == sorted(r["name"] for r in records)
+    assert (actual["category"] == "0042").all()
@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Отдельный интерпретатор: в процессе pytest pandas уже импортирован тестами ETL
+SCRIPT = """
+import json, sys
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import items.views, items.async_views
+heavy = ("pandas", "numpy", "drf_yasg.generators", "items.schema")
+startup = [m for m in heavy if m in sys.modules]
+
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+response = Client().get("/swagger.json")
+schema = json.loads(response.content)
+print(json.dumps({
+    "startup": startup,
+    "docs_status": response.status_code,
+    "params": [p["name"] for p in schema["paths"]["/items/"]["get"]["parameters"]],
+}))
+"""
+
+
+def test_web_startup_loads_no_etl_or_docs_modules():
+    env = {**os.environ, "API_DOCS": "1"}
+    env.setdefault("DJANGO_SETTINGS_MODULE", "itemstats.settings")
+    out = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+
+    assert result["startup"] == []
+    # Документация загружается при первом запросе и по-прежнему описывает параметры списка
+    assert result["docs_status"] == 200
+    assert {"search", "ordering", "cursor", "count"} <= set(result["params"])
@@ -1,7 +1,21 @@
 from django.urls import path
-from .views import ItemListView, AvgPriceByCategoryView
+from . import async_views
+from .views import (
+    ItemListView, ItemExportView, AvgPriceByCategoryView, ImportRunDetailView, ImportRunListView, PriceHistoryView,
+    PriceStatsByCategoryView,
+)
 
 urlpatterns = [
     path('items/', ItemListView.as_view(), name='items-list'),
+    path('items/export/', ItemExportView.as_view(), name='items-export'),
     path('stats/avg-price-by-category/', AvgPriceByCategoryView.as_view(), name='stats-avg-price-by-category'),
+    path('stats/prices-by-category/', PriceStatsByCategoryView.as_view(), name='stats-prices-by-category'),
+    path('stats/price-history/', PriceHistoryView.as_view(), name='stats-price-history'),
+    path('imports/', ImportRunListView.as_view(), name='imports-list'),
+    path('imports/<int:pk>/', ImportRunDetailView.as_view(), name='imports-detail'),
+    # Async-версии для ASGI (uvicorn), формат ответов тот же
+    path('async/items/', async_views.items_list, name='async-items-list'),
+    path('async/stats/avg-price-by-category/', async_views.avg_price_by_category,
+         name='async-stats-avg-price-by-category'),
+    path('async/stats/prices-by-category/', async_views.prices_by_category, name='async-stats-prices-by-category'),
 ]
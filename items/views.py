@@ -1,63 +1,266 @@
-from django.core.cache import cache
+import csv
+import io
+import zlib
+from datetime import timedelta
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
 from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_filters import rest_framework as filters
 from rest_framework import generics
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Item
-from .serializers import ItemSerializer
-import pandas as pd
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
+from .models import ImportRun, Item
+from .pagination import ItemCursorPagination, ItemPagination, ordering_fields, wants_cursor
+from .renderers import FastJSONRenderer
+from .serializers import ITEM_COLUMNS, ITEM_FIELDS, ImportRunSerializer, ItemSerializer, item_rows_to_data
+from .services import categories, price_history, replicas, stats, stats_cache
+from .services.search import filter_by_name, order_by_relevance
 
 
 class ItemFilter(filters.FilterSet):
-    category = filters.CharFilter(field_name='category', lookup_expr='iexact')
+    category = filters.CharFilter(method='filter_category')
     price_min = filters.NumberFilter(field_name='price', lookup_expr='gte')
     price_max = filters.NumberFilter(field_name='price', lookup_expr='lte')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Item
-        fields = ['category', 'price_min', 'price_max']
+        fields = ['category', 'price_min', 'price_max', 'search']
 
+    def filter_search(self, queryset, name, value):
+        return filter_by_name(queryset, value)
 
-class ItemListView(generics.ListAPIView):
-    queryset = Item.objects.all().order_by('id')
+    def filter_category(self, queryset, name, value):
+        # Регистр не важен: имя переводится в id по карте категорий, а фильтр по Item —
+        # точное совпадение по индексу (category_id, price). cacheops учитывает только
+        # exact/in, и тогда импорт одной категории не сбрасывает страницы остальных
+        pk = categories.lookup(value)
+        if pk is None:
+            return queryset.none()
+        return queryset.filter(category_id=pk)
+
+
+class ReplicaReadMixin:
+    """Чтения запроса идут в реплику, если она настроена и не было свежего импорта (items.services.replicas)."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with replicas.replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ItemListView(ReplicaReadMixin, generics.ListAPIView):
+    # select_related — для ItemSerializer; values_list (быстрый путь) его игнорирует
+    queryset = Item.objects.select_related('category').order_by('id')
     serializer_class = ItemSerializer
     filterset_class = ItemFilter
 
-    @swagger_auto_schema(
-        operation_description="Получить список товаров с фильтрацией по категории и цене",
-        responses={200: ItemSerializer(many=True)},
-    )
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_queryset(self):
+        return super().get_queryset().order_by(*ordering_fields(self.request))
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # С ?search= и без явного ordering — по релевантности; курсору нужен свой ключ сортировки
+        params = self.request.query_params
+        if params.get('search') and 'ordering' not in params and isinstance(self.paginator, ItemPagination):
+            queryset = order_by_relevance(queryset, params['search'])
+        return queryset
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if wants_cursor(self.request):
+                self._paginator = ItemCursorPagination()
+            else:
+                self._paginator = ItemPagination()
+        return self._paginator
+
+    # Своя get: к ней items.schema привязывает описание для Swagger
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def list(self, request, *args, **kwargs):
+        if not settings.ITEMS_FAST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        # Кортежи вместо моделей и сериализатора; формат ответа тот же
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*ITEM_COLUMNS)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(item_rows_to_data(queryset))
+        return self.get_paginated_response(item_rows_to_data(page))
+
 
-class AvgPriceByCategoryView(APIView):
-    @swagger_auto_schema(
-        operation_description="Средняя цена товаров по категориям",
-        responses={200: openapi.Response(
-            description="Словарь с категориями и средними ценами",
-            examples={"application/json": {"electronics": 150.5, "books": 82.3}}
-        )}
-    )
+class AvgPriceByCategoryView(ReplicaReadMixin, APIView):
     def get(self, request):
-        key = "stats:avg_price_by_category"
-        data = cache.get(key)
-        if data is not None:
-            return Response(data)
-
-        qs = Item.objects.values('category', 'price')
-        if not qs.exists():
-            cache.set(key, {}, settings.STATS_CACHE_TTL)
-            return Response({})
-
-        df = pd.DataFrame(list(qs))
-        # In case of Decimal -> convert to float for JSON serialization
-        df['price'] = pd.to_numeric(df['price'], errors='coerce')
-        grouped = df.groupby('category', dropna=False)['price'].mean().round(2)
-        data = {k if k is not None else "": float(v) for k, v in grouped.to_dict().items()}
-        cache.set(key, data, settings.STATS_CACHE_TTL)
-        return Response(data)
+        return Response(stats_cache.get_or_compute("avg_price_by_category", stats.average_prices))
+
+
+class PriceStatsByCategoryView(APIView):
+    max_bins = 100
+
+    def get(self, request):
+        try:
+            bins = int(request.query_params.get('bins', 10))
+        except ValueError:
+            bins = 0
+        if not 1 <= bins <= self.max_bins:
+            return Response({'bins': [f"Expected an integer from 1 to {self.max_bins}"]}, status=400)
+        category = request.query_params.get('category')
+        if category is not None:
+            return Response(stats.price_distribution(bins, category))
+        return Response(stats_cache.get_or_compute(
+            f"price_distribution:{bins}", lambda: stats.price_distribution(bins)
+        ))
+
+
+class PriceHistoryView(APIView):
+    """
+    Цены по интервалам времени из истории (PriceHistory): min/avg/max и число
+    изменений цены за каждый час/день/неделю. Период ограничен, чтобы запрос
+    читал только его месячные секции.
+    """
+    default_period = timedelta(days=30)
+    max_buckets = 1000
+
+    def get(self, request):
+        params = request.query_params
+        errors = {}
+        bucket = params.get('bucket', 'day')
+        if bucket not in price_history.BUCKETS:
+            errors['bucket'] = [f"Expected one of: {', '.join(price_history.BUCKETS)}"]
+        end = self._datetime(params, 'end', errors) or timezone.now()
+        start = self._datetime(params, 'start', errors) or end - self.default_period
+        item = params.get('item')
+        # isdigit() пропускает и не-ASCII цифры («²»), которые int() не разбирает
+        if item is not None and not (item.isascii() and item.isdigit()):
+            errors['item'] = ["Expected an item id"]
+        if not errors:
+            if start >= end:
+                errors['start'] = ["Expected start before end"]
+            elif (end - start) / price_history.BUCKETS[bucket] > self.max_buckets:
+                errors['bucket'] = [f"Period spans more than {self.max_buckets} buckets, use a larger bucket"]
+        if errors:
+            return Response(errors, status=400)
+
+        category_id = None
+        if 'category' in params:
+            category_id = categories.lookup(params['category'])
+            if category_id is None:
+                return Response([])
+        return Response(price_history.aggregate(
+            bucket, start, end, category_id=category_id, item_id=int(item) if item is not None else None,
+        ))
+
+    @staticmethod
+    def _datetime(params, name, errors):
+        value = params.get(name)
+        if value is None:
+            return None
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            errors[name] = ["Expected an ISO-8601 date or datetime"]
+            return None
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+class ImportRunFilter(filters.FilterSet):
+    class Meta:
+        model = ImportRun
+        fields = ['source', 'status']
+
+
+class ImportRunListView(generics.ListAPIView):
+    """Запуски импорта, свежие первыми: статус, прогресс, строк в секунду, итог."""
+    queryset = ImportRun.objects.order_by('-id')
+    serializer_class = ImportRunSerializer
+    filterset_class = ImportRunFilter
+
+
+class ImportRunDetailView(generics.RetrieveAPIView):
+    queryset = ImportRun.objects.all()
+    serializer_class = ImportRunSerializer
+
+
+class ItemExportView(ReplicaReadMixin, View):
+    """
+    Потоковая выгрузка всего (отфильтрованного) каталога: NDJSON или CSV.
+
+    Строки читаются серверным курсором (iterator(chunk_size=...)) и сразу
+    отдаются клиенту, так что память воркера не зависит от размера выгрузки.
+    Параметры: фильтры ItemFilter, format=ndjson|csv, gzip=1.
+    """
+    formats = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv; charset=utf-8',
+    }
+
+    def get(self, request):
+        fmt = request.GET.get('format', 'ndjson')
+        if fmt not in self.formats:
+            return JsonResponse({'format': [f"Expected one of: {', '.join(self.formats)}"]}, status=400)
+
+        filterset = ItemFilter(request.GET, queryset=Item.objects.order_by('id'))
+        if not filterset.is_valid():
+            return JsonResponse(filterset.errors, status=400)
+        # Тело читается уже после выхода из dispatch, поэтому база выбирается явно
+        rows = (
+            filterset.qs.using(replicas.current_alias()).nocache().values_list(*ITEM_COLUMNS)
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        )
+
+        encode = self._ndjson if fmt == 'ndjson' else self._csv
+        body = encode(rows)
+        filename = f'items.{fmt}'
+        gzipped = request.GET.get('gzip') in ('1', 'true')
+        if gzipped:
+            body = self._gzip(body)
+
+        response = StreamingHttpResponse(body, content_type=self.formats[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+    @staticmethod
+    def _batches(rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= settings.EXPORT_CHUNK_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _ndjson(self, rows):
+        render = FastJSONRenderer().render
+        for batch in self._batches(rows):
+            yield b''.join(render(item) + b'\n' for item in item_rows_to_data(batch))
+
+    def _csv(self, rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(ITEM_FIELDS)
+        for batch in self._batches(rows):
+            writer.writerows(item.values() for item in item_rows_to_data(batch))
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode('utf-8')
+
+    @staticmethod
+    def _gzip(chunks):
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
@@ -0,0 +1,28 @@
+"""
+Swagger/ReDoc. Импортируется из itemstats.urls при первом запросе к документации:
+drf_yasg (генератор схемы, инспекторы) и описания операций (items.schema)
+не загружаются при старте web-процессов.
+"""
+from drf_yasg import openapi
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+import items.schema  # noqa: F401  описания операций для схемы
+
+schema_view = get_schema_view(
+    openapi.Info(
+        title="ItemStats API",
+        default_version='v1',
+        description="Мини-сервис для импорта и статистики товаров",
+        contact=openapi.Contact(email="russianik44@gmail.com"),
+        license=openapi.License(name="MIT License"),
+    ),
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+VIEWS = {
+    'schema': schema_view.without_ui(cache_timeout=0),
+    'swagger': schema_view.with_ui('swagger', cache_timeout=0),
+    'redoc': schema_view.with_ui('redoc', cache_timeout=0),
+}
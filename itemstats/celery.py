@@ -13,8 +13,40 @@ from celery.schedules import crontab
 def _schedule_from_env():
     try:
         minutes = int(os.getenv('IMPORT_INTERVAL_MINUTES', '5'))
-        return {'every_n_minutes': {'task': 'items.tasks.import_items_task', 'schedule': minutes * 60}}
+        task = 'items.tasks.import_items_task'
+        if os.getenv('IMPORT_SOURCES') or os.getenv('IMPORT_MANIFEST'):
+            task = 'items.tasks.import_sources_task'
+        return {'every_n_minutes': {'task': task, 'schedule': minutes * 60}}
     except Exception:
         return {}
 
 app.conf.beat_schedule = _schedule_from_env()
+
+
+# Метрики воркера (items.metrics): HTTP-сервер в главном процессе воркера.
+# С PROMETHEUS_MULTIPROC_DIR дочерние процессы пула пишут значения в общий
+# каталог, а сервер собирает их MultiProcessCollector'ом.
+from celery.signals import worker_init, worker_process_shutdown
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    port = int(os.getenv('WORKER_METRICS_PORT', '0'))
+    if not port:
+        return
+    from prometheus_client import CollectorRegistry, REGISTRY, start_http_server
+    from prometheus_client import multiprocess
+
+    registry = REGISTRY
+    # Каталог создаётся и очищается в entrypoint.sh до первого импорта prometheus_client
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
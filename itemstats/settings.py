@@ -10,6 +10,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
 DEBUG = os.getenv('DEBUG', '0') == '1'
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '*').split(',')
+# Swagger/ReDoc (drf_yasg): по умолчанию только с DEBUG. Даже включённые,
+# генератор схемы и описания операций загружаются при первом запросе к документации
+API_DOCS = os.getenv('API_DOCS', '1' if DEBUG else '0') == '1'
 
 INSTALLED_APPS = [
     'django_prometheus',
@@ -19,12 +22,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # lookup trigram_word_similar для поиска по имени
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'cacheops',
     'items',
-    'drf_yasg'
 ]
+if API_DOCS:
+    INSTALLED_APPS.append('drf_yasg')
 
 MIDDLEWARE = [
     'django_prometheus.middleware.PrometheusBeforeMiddleware',
@@ -67,8 +73,30 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'itempass'),
         'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
         'PORT': int(os.getenv('POSTGRES_PORT', '5432')),
+        # Постоянные соединения: запрос (и задача Celery) не открывает новое соединение
+        # с Postgres; перед повторным использованием соединение проверяется.
+        # Под ASGI должно быть 0 (в compose так и задано для web-asgi)
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        # За PgBouncer в режиме transaction серверные курсоры (iterator() в выгрузке) не работают
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_PGBOUNCER', '0') == '1',
     }
 }
+# Необязательная реплика для чтения (items.services.replicas): список товаров, средние цены, выгрузка.
+# В тестах — зеркало default
+if os.getenv('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('POSTGRES_REPLICA_HOST'),
+        'PORT': int(os.getenv('POSTGRES_REPLICA_PORT', '5432')),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['items.services.replicas.ReplicaRouter']
+# Выключатель чтения из реплики без удаления её из DATABASES (например, при большом отставании)
+REPLICA_READS = os.getenv('REPLICA_READS', '1') == '1'
+# После записи чтения идут в основную базу, пока реплика не проиграет её WAL;
+# это верхняя граница (секунды) — и срок, если отставание реплики не измерить
+REPLICA_READ_AFTER_WRITE_SECONDS = float(os.getenv('REPLICA_READ_AFTER_WRITE_SECONDS', '300'))
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = os.getenv('TIME_ZONE', 'UTC')
@@ -104,8 +132,54 @@ CACHES = {
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/1')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/1')
 
-# Stats cache TTL
+# ETL: на PostgreSQL импорт идёт через COPY в staging-таблицу + INSERT ... ON CONFLICT
+ETL_PG_UPSERT = os.getenv('ETL_PG_UPSERT', '1') == '1'
+
+# Потоковый импорт блоками по ETL_CHUNK_SIZE строк (0 — источник читается целиком)
+ETL_CHUNK_SIZE = int(os.getenv('ETL_CHUNK_SIZE', '0'))
+
+# Скачанный фид держится в памяти до этого размера, дальше — во временном файле
+ETL_SPOOL_MAX_MEMORY = int(os.getenv('ETL_SPOOL_MAX_MEMORY', str(64 * 1024 * 1024)))
+
+# Блокировка импорта источника (секунды): пока идёт импорт, её каждые TTL/3 продлевает
+# фоновый поток, так что TTL ограничивает лишь время, на которое упавший воркер держит источник
+IMPORT_LOCK_TIMEOUT = int(os.getenv('IMPORT_LOCK_TIMEOUT', '1800'))
+# Сколько раз Celery повторяет импорт после временного сбоя (с продолжением с контрольной точки)
+IMPORT_MAX_RETRIES = int(os.getenv('IMPORT_MAX_RETRIES', '3'))
+
+# Разбор большого локального CSV/NDJSON в ETL_WORKERS процессах (1 — последовательно),
+# диапазонами не больше ETL_PARSE_PARTITION_BYTES; в памяти до 2 * ETL_WORKERS диапазонов
+ETL_WORKERS = int(os.getenv('ETL_WORKERS', '1'))
+ETL_PARSE_PARTITION_BYTES = int(os.getenv('ETL_PARSE_PARTITION_BYTES', str(16 * 1024 * 1024)))
+
+# /api/items/: values_list + orjson вместо ModelSerializer (формат ответа тот же)
+ITEMS_FAST_SERIALIZATION = os.getenv('ITEMS_FAST_SERIALIZATION', '1') == '1'
+
+# /api/items/export/: сколько строк читать из серверного курсора за раз
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Импорт нескольких источников (items.tasks.import_sources_task): список через
+# запятую или манифест (файл/URL); промежуточные партиции пишутся в ETL_SPOOL_DIR,
+# который должен быть общим для всех воркеров
+IMPORT_SOURCES = [s.strip() for s in os.getenv('IMPORT_SOURCES', '').split(',') if s.strip()]
+IMPORT_MANIFEST = os.getenv('IMPORT_MANIFEST', '')
+ETL_PARTITIONS = int(os.getenv('ETL_PARTITIONS', '8'))
+ETL_SPOOL_DIR = os.getenv('ETL_SPOOL_DIR', str(BASE_DIR / 'var' / 'etl'))
+
+# Медленные импорты (дольше N секунд) сохраняют профиль cProfile в ETL_PROFILE_DIR
+# (0 — профилирование выключено; включённый профайлер замедляет импорт)
+ETL_PROFILE_SLOW_SECONDS = float(os.getenv('ETL_PROFILE_SLOW_SECONDS', '0'))
+ETL_PROFILE_DIR = os.getenv('ETL_PROFILE_DIR', str(BASE_DIR / 'var' / 'profiles'))
+
+# Stats cache TTL. Ключи статистики версионируются: импорт сбрасывает их сразу,
+# TTL лишь страхует от забытых изменений в обход ETL
 STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', '300'))
+# Сколько хранить предыдущее значение для stale-while-revalidate
+STATS_STALE_TTL = int(os.getenv('STATS_STALE_TTL', '86400'))
+# Блокировка пересчёта при промахе (один пересчитывает, остальные отдают старое)
+STATS_CACHE_LOCK_TIMEOUT = int(os.getenv('STATS_CACHE_LOCK_TIMEOUT', '30'))
+# L1-кэш в памяти процесса, секунды (0 — выключен)
+STATS_L1_CACHE_TTL = float(os.getenv('STATS_L1_CACHE_TTL', '0'))
 
 SWAGGER_SETTINGS = {
    'USE_SESSION_AUTH': False
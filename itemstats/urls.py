@@ -1,27 +1,25 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from django.conf import settings
 from django.conf.urls.static import static
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="ItemStats API",
-        default_version='v1',
-        description="Мини-сервис для импорта и статистики товаров",
-        contact=openapi.Contact(email="russianik44@gmail.com"),
-        license=openapi.License(name="MIT License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+
+def api_docs_view(name):
+    """View документации из itemstats.api_docs, импортируемого при первом запросе."""
+    def view(request, *args, **kwargs):
+        from itemstats import api_docs
+        return api_docs.VIEWS[name](request, *args, **kwargs)
+    return view
+
 
 urlpatterns = [
     path('api/', include('items.urls')),
     path('', include('django_prometheus.urls')),
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+]
+if settings.API_DOCS:
+    urlpatterns += [
+        re_path(r'^swagger(?P<format>\.json|\.yaml)$', api_docs_view('schema'), name='schema-json'),
+        path('swagger/', api_docs_view('swagger'), name='schema-swagger-ui'),
+        path('redoc/', api_docs_view('redoc'), name='schema-redoc'),
+    ]
+urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)